@@ -7,14 +7,15 @@ import time
 import traceback
 from baus import (
     datasources, variables, models, subsidies, ual, slr, earthquake, 
-    utils, preprocessing)
+    utils, preprocessing, checkpoint, unit_blocks, output_writer, snapshots)
 from baus.tests import validation
 
 from baus.summaries import (
     core_summaries, geographic_summaries, affordable_housing_summaries, 
-    hazards_summaries, metrics, travel_model_summaries)
+    hazards_summaries, metrics, travel_model_summaries, summary_frames)
 
 from baus.visualizer import push_model_files
+from baus.profiler import StepProfiler
 import baus.slack
 import baus.debug
 import logging_setup
@@ -43,8 +44,11 @@ parser.add_argument('--run_setup_yaml', default='run_setup.yaml', help='Specify
 parser.add_argument('--mode', action='store', dest='mode', default='simulation', help='which mode to run (see code for mode options)')
 parser.add_argument('-i', action='store_true', dest='interactive', default=False, help='enter interactive mode after imports')
 parser.add_argument('--set-random-seed', action='store_true', dest='set_random_seed', default=False, help='set a random seed for consistent stochastic output')
+parser.add_argument('--random-seed', action='store', dest='random_seed', type=int, default=None, help='seed the random number generator with the given value')
 parser.add_argument('--disable-slack', action='store_true', dest='no_slack', default=False, help='disable slack outputs')
 parser.add_argument('--enable-asana', action='store_true', dest='use_asana', default=False, help='disable Asana task creation')
+parser.add_argument('--resume-from', action='store', dest='resume_from', type=int, default=None, help='resume a simulation from the checkpoint saved at the end of the given year')
+parser.add_argument('--profile', action='store_true', dest='profile', default=False, help='record time, memory and table sizes for each step to step_profile.csv')
 
 options = parser.parse_args()
 
@@ -57,7 +61,7 @@ orca.add_injectable("run_setup_yaml", options.run_setup_yaml)
 MODE = options.mode
 
 # Flip the boolean since it is a disable flag
-SLACK = ~options.no_slack
+SLACK = not options.no_slack
 
 # Get a few orca objects
 run_setup = orca.get_injectable("run_setup")
@@ -92,7 +96,10 @@ if SLACK:
     orca.add_injectable('slack_client',client)
     orca.add_injectable('slack_channel',slack_channel)
 
-if options.set_random_seed:
+if options.random_seed is not None:
+    SET_RANDOM_SEED = True
+    np.random.seed(options.random_seed)
+elif options.set_random_seed:
     SET_RANDOM_SEED = True
     np.random.seed(42)
 else:
@@ -129,6 +136,7 @@ logger.info("Started: %s", time.ctime())
 logger.info("Current Branch: %s", CURRENT_BRANCH)
 logger.info("Current Commit: %s", CURRENT_COMMIT)
 logger.info("Set Random Seed: %s", SET_RANDOM_SEED)
+logger.info("Random Seed: %s", options.random_seed)
 logger.info("Python version: %s", sys.version.split('|')[0])
 logger.info("UrbanSim version: %s", urbansim.__version__)
 logger.info("UrbanSim Defaults version: %s", urbansim_defaults.__version__)
@@ -140,6 +148,8 @@ logger.info("Pandas version: %s", pd.__version__)
 
 logger.info("SLACK: %s", SLACK)
 logger.info("MODE: %s", MODE)
+logger.info("Profile: %s", options.profile)
+logger.info("Resume from: %s", options.resume_from)
 
 
 def run_models(mode):
@@ -417,11 +427,18 @@ def run_models(mode):
             baseyear_models.extend(baseyear_summary_models)
         if run_setup["run_metrics"]:
             baseyear_models.extend(baseyear_metrics_models)
+        if run_setup.get("save_checkpoints", True):
+            baseyear_models.append("checkpoint")
         if SLACK: baseyear_models.append('slack_simulation_status')
 
         # 2010-based setup has a bunch of specialized baseyear models
         # For 2020-based run, we'll stop doing that (if possible)
-        if BASE_YEAR==2010:
+        if options.resume_from is not None:
+            # pick up from the state at the end of the checkpointed year,
+            # the base year models have already been run
+            checkpoint.restore_checkpoint(options.resume_from)
+            years_to_run = range(options.resume_from+EVERY_NTH_YEAR, STOP_YEAR+1, EVERY_NTH_YEAR)
+        elif BASE_YEAR==2010:
             print("Running baseyear_models {} for years {}".format(baseyear_models,BASE_YEAR))
             orca.run(baseyear_models, iter_vars=[BASE_YEAR])
 
@@ -436,6 +453,10 @@ def run_models(mode):
             simulation_models.extend(simulation_metrics_models)
         if run_setup["run_simulation_validation"]:
             simulation_models.extend(simulation_validation_models)
+        if run_setup.get("columnar_ledger", False):
+            simulation_models.append("coffer_ledgers")
+        if run_setup.get("save_checkpoints", True):
+            simulation_models.append("checkpoint")
         if SLACK: simulation_models.append('slack_simulation_status')
 
         print("Running simulation_models {} for years {}".format(simulation_models,years_to_run))
@@ -478,6 +499,12 @@ if ASANA:
         thread_ts=orca.get_injectable('slack_init_response').data['ts'],
         text=asana_msg)
 
+# wrap every registered step so that steps run from within other steps
+# are profiled as well as the ones orca.run calls directly
+if options.profile:
+    profiler = StepProfiler(outputs_dir)
+    profiler.install(orca.list_steps())
+
 # main event: run the models
 try:
     run_models(MODE)
@@ -511,6 +538,20 @@ except Exception as e:
         raise e
     sys.exit(0)
 
+finally:
+    # write the profile even when the run fails partway through
+    if options.profile:
+        logger.info("Writing step profile to {}".format(profiler.write()))
+        profiler.report()
+
+    # finish writing the summaries still waiting on the output writer, and
+    # log the time spent writing them - a failed write is logged rather than
+    # raised so it doesn't replace an error from the run itself
+    try:
+        orca.get_injectable("output_writer").close()
+    except Exception:
+        logger.exception("The output writer failed to write all the summaries")
+
 if SLACK: baus.slack.slack_complete(MODE, host, run_name)
 
 if ASANA:
@@ -0,0 +1,226 @@
+from __future__ import print_function
+
+import time
+import yaml
+
+import numpy as np
+import pandas as pd
+import orca
+from urbansim.models import util
+from urbansim.utils import misc, networks
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# aggregations which are linear in the values at the source nodes, and so
+# can be updated from the change in those values - the others (medians,
+# percentiles, etc.) are always recomputed over the whole network
+LINEAR_AGGREGATIONS = {"sum": "sum", "mean": "mean", "ave": "mean", "avg": "mean",
+                       "average": "mean", "count": "count"}
+
+# the weight pandana gives a source at a distance within the radius
+DECAYS = {
+    "flat": lambda dist, radius: np.ones(len(dist)),
+    "linear": lambda dist, radius: 1 - dist / radius,
+    "exp": lambda dist, radius: np.exp(-dist / radius)
+}
+
+# number of changed nodes whose neighborhoods are queried at once
+SOURCE_CHUNK_SIZE = 2000
+
+
+class IncrementalAccessibility(object):
+    """
+    Computes the network aggregations in an accessibility yaml (e.g.
+    neighborhood_vars.yaml), the same as urbansim.utils.networks.from_yaml,
+    but keeps the per-node source totals and aggregations of each variable
+    between calls.  On later calls only the nodes whose totals changed are
+    propagated to the nodes in range of them, unless more than
+    max_changed_share of the nodes changed, in which case the variable is
+    recomputed over the whole network.
+
+    Parameters
+    ----------
+    net : pandana.Network
+    cfgname : str
+        Accessibility yaml, relative to the configs directory
+    max_changed_share : float, optional
+        Share of the network's nodes that can change before falling back to
+        a full recompute
+    """
+    def __init__(self, net, cfgname, max_changed_share=.2):
+        self.net = net
+        self.cfgname = cfgname
+        self.max_changed_share = max_changed_share
+        with open(misc.config(cfgname)) as f:
+            self.cfg = yaml.safe_load(f)
+        self.state = {}
+
+    def _source_frames(self, variables):
+        # read each table once with the columns needed by all the variables
+        # defined on it, rather than once per variable
+        node_col = self.cfg["node_col"]
+        flds = {}
+        for variable in variables:
+            f = flds.setdefault(variable["dataframe"], [node_col])
+            if variable.get("varname"):
+                f.append(variable["varname"])
+            if "filters" in variable:
+                f += util.columns_in_filters(variable["filters"])
+        return {dfname: orca.get_table(dfname).to_frame(list(dict.fromkeys(f)))
+                for dfname, f in flds.items()}
+
+    def _source(self, frame, variable):
+        node_col = self.cfg["node_col"]
+        vname = variable.get("varname", None)
+        df = frame
+        if "filters" in variable:
+            df = util.apply_filter_query(df, variable["filters"])
+        return df[node_col], df[vname] if vname else None
+
+    def _full(self, node_ids, values, radius, agg, decay):
+        self.net.set(node_ids, variable=values)
+        return self.net.aggregate(radius, type=agg, decay=decay).values
+
+    def _propagate(self, updates, radius):
+        """
+        Add the change at each changed node to every node in range of it,
+        weighted as pandana weights it in the aggregation.  The range query
+        is shared by all the updates at this radius.
+
+        updates is a list of (out, changed, deltas) where deltas maps the
+        keys of out to (change in the source totals, decay).
+        """
+        ext_ids = self.net.node_ids.values
+        changed = np.unique(np.concatenate([u[1] for u in updates]))
+        for i in range(0, len(changed), SOURCE_CHUNK_SIZE):
+            chunk = changed[i:i + SOURCE_CHUNK_SIZE]
+            pairs = self.net.nodes_in_range(ext_ids[chunk], radius)
+            src = self.net.node_idx.loc[pairs.source.values].values
+            dst = self.net.node_idx.loc[pairs.destination.values].values
+            dist = pairs.iloc[:, 2].values
+            weights = {}
+            for out, _, deltas in updates:
+                for k, (d, decay) in deltas.items():
+                    if decay not in weights:
+                        weights[decay] = DECAYS[decay](dist, radius)
+                    out[k] += np.bincount(dst, weights=d[src] * weights[decay], minlength=len(ext_ids))
+        return len(changed)
+
+    def _prepare(self, variable, frame):
+        """
+        Compute a variable in full, or work out the update to the previous
+        year's aggregation which _propagate will apply.  Returns the
+        aggregation type and the dict of arrays it is computed from, and the
+        pending update if there is one.
+        """
+        name = variable["name"]
+        agg = variable.get("aggregation", "sum").lower()
+        decay = variable.get("decay", "linear")
+        radius = variable["radius"]
+
+        node_ids, values = self._source(frame, variable)
+
+        if agg not in LINEAR_AGGREGATIONS or decay not in DECAYS:
+            return agg, {agg: self._full(node_ids, values, radius, agg, decay)}, None
+        agg = LINEAR_AGGREGATIONS[agg]
+
+        # per-node totals of the variable and the number of agents, dropping
+        # agents off the network or with missing values as pandana does
+        n = len(self.net.node_ids)
+        idx = self.net.node_idx.reindex(node_ids.values).values
+        vals = np.ones(len(idx)) if values is None else values.values.astype(float)
+        valid = ~np.isnan(idx) & ~np.isnan(vals)
+        idx = idx[valid].astype(np.int64)
+        src = {"sum": np.bincount(idx, weights=vals[valid], minlength=n),
+               "count": np.bincount(idx, minlength=n).astype(float)}
+
+        prev = self.state.get(name)
+        changed = None
+        if prev is not None:
+            changed = np.flatnonzero((src["sum"] != prev["src"]["sum"]) |
+                                     (src["count"] != prev["src"]["count"]))
+
+        # sums are decayed but pandana doesn't decay the counts, even when
+        # they are the denominator of an average
+        needed = {"sum": {"sum": decay}, "mean": {"sum": decay, "count": "flat"},
+                  "count": {"count": "flat"}}[agg]
+
+        update = None
+        if changed is None or len(changed) > self.max_changed_share * n:
+            logger.info("    full recompute of %s" % name)
+            # the counts are of the agents with a value, as in src
+            counted = None if values is None else \
+                pd.Series(np.where(values.notnull(), 1.0, np.nan), index=values.index)
+            out = {k: self._full(node_ids, values if k == "sum" else counted, radius, k, d)
+                   for k, d in needed.items()}
+        else:
+            logger.info("    updating %s from %d changed nodes" % (name, len(changed)))
+            out = {k: prev["out"][k].copy() for k in needed}
+            if len(changed):
+                update = (out, changed, {k: (src[k] - prev["src"][k], d) for k, d in needed.items()})
+
+        self.state[name] = {"src": src, "out": out}
+        return agg, out, update
+
+    @staticmethod
+    def _finish(agg, out):
+        if agg == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(out["count"] > 0, out["sum"] / out["count"], 0)
+        return out[agg]
+
+    def compute(self):
+        variables = self.cfg["variable_definitions"]
+        t0 = time.time()
+        frames = self._source_frames(variables)
+        t1 = time.time()
+
+        results, updates = {}, {}
+        for variable in variables:
+            logger.info("Computing %s" % variable["name"])
+            agg, out, update = self._prepare(variable, frames[variable["dataframe"]])
+            results[variable["name"]] = (agg, out)
+            if update is not None:
+                updates.setdefault(variable["radius"], []).append(update)
+
+        # the pending updates are applied together for each radius
+        queried = 0
+        for radius, group in updates.items():
+            queried += self._propagate(group, radius)
+        t2 = time.time()
+
+        nodes = pd.DataFrame(index=self.net.node_ids)
+        for variable in variables:
+            nodes[variable["name"]] = self._finish(*results[variable["name"]])
+            if "apply" in variable:
+                nodes[variable["name"]] = nodes[variable["name"]].apply(eval(variable["apply"]))
+
+        logger.info(
+            "%s: %d variables from %d table reads (%.1fs) instead of %d, "
+            "%d batched range queries over %d nodes for %d updated variables (%.1fs)" % (
+                self.cfgname, len(variables), len(frames), t1 - t0, len(variables),
+                len(updates), queried, sum(len(g) for g in updates.values()), t2 - t1))
+        return nodes
+
+
+# engines persist across years, one per network and accessibility yaml
+_ENGINES = {}
+
+
+def from_yaml(net, cfgname):
+    """
+    Drop in for urbansim.utils.networks.from_yaml which reuses the previous
+    year's aggregations when run_setup has incremental_accessibility on.
+    """
+    run_setup = orca.get_injectable("run_setup")
+    if not run_setup.get("incremental_accessibility", False):
+        return networks.from_yaml(net, cfgname)
+
+    key = (id(net), cfgname)
+    if key not in _ENGINES:
+        _ENGINES[key] = IncrementalAccessibility(
+            net, cfgname, run_setup.get("incremental_accessibility_max_changed_share", .2))
+    return _ENGINES[key].compute()
@@ -0,0 +1,171 @@
+from __future__ import print_function
+
+import os
+import pickle
+import pathlib
+import warnings
+
+import numpy as np
+import pandas as pd
+import orca
+from tables import NaturalNameWarning
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# the agent and supply tables are always checkpointed - their local columns
+# are what the models change from year to year
+CHECKPOINT_TABLES = ["parcels", "buildings", "residential_units", "households", "jobs"]
+
+# tables registered from a DataFrame during the run are state too (the
+# summary and metrics tables which are compared against later years), apart
+# from these which are rebuilt from scratch by the step that uses them
+SCRATCH_TABLES = ["feasibility", "own_hh", "own_units", "rent_hh", "rent_units"]
+
+# injectables that are mutated or accumulated over the course of a run
+CHECKPOINT_INJECTABLES = ["coffer", "static_parcels", "unplaced_hh_tot", "unplaced_jobs_tot",
+                          "slr_mitigation"]
+
+# developer settings which are adjusted in place during the run
+CHECKPOINT_DEVELOPER_SETTINGS = ["cap_rate", "original_cap_rate"]
+
+
+def checkpoint_dir():
+    return pathlib.Path(orca.get_injectable("outputs_dir")) / "checkpoints"
+
+
+def checkpoint_paths(year, path=None):
+    # the tables go into an hdf5 file and everything else is pickled
+    # alongside it
+    path = pathlib.Path(path) if path is not None else checkpoint_dir()
+    return (path / "checkpoint_{}.h5".format(year),
+            path / "checkpoint_{}.pkl".format(year))
+
+
+def _checkpoint_table_names():
+    names = [t for t in CHECKPOINT_TABLES if orca.is_table(t)]
+    for name in orca.list_tables():
+        if name in names or name in SCRATCH_TABLES:
+            continue
+        if isinstance(orca.get_raw_table(name), orca.DataFrameWrapper):
+            names.append(name)
+    return names
+
+
+def _added_columns(name):
+    # columns registered on a table as Series with orca.add_column during
+    # the run (e.g. parcels slr_nodev) - computed columns are left alone
+    # since they're rebuilt from the restored tables
+    return [col for table, col in orca.list_columns()
+            if table == name and isinstance(orca.get_raw_column(table, col), orca.orca._SeriesWrapper)]
+
+
+def save_checkpoint(year, path=None):
+    """
+    Save the state of the simulation at the end of a year so that a run
+    can be resumed from there.
+
+    The local columns of the checkpointed tables, and the Series added to
+    them with orca.add_column, are written to a compressed hdf5 file, while the mutable injectables, the adjusted
+    developer settings and the random number generator state are pickled.
+    Both files are written to temporary names first so a crash part way
+    through never leaves a half written checkpoint behind.
+
+    Parameters
+    ----------
+    year : int
+        The simulation year which has just finished
+    path : str or pathlib.Path, optional
+        Directory to write to, defaults to the checkpoints directory in
+        the outputs directory
+
+    Returns
+    -------
+    h5_path, pkl_path : pathlib.Path
+    """
+    h5_path, pkl_path = checkpoint_paths(year, path)
+    h5_path.parent.mkdir(parents=True, exist_ok=True)
+
+    h5_tmp = h5_path.with_suffix(".h5.tmp")
+    with warnings.catch_warnings():
+        # object columns are pickled by pytables and table names with
+        # years in them are not natural names - both are fine here
+        warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+        warnings.simplefilter("ignore", NaturalNameWarning)
+        with pd.HDFStore(h5_tmp, "w", complevel=1, complib="blosc") as store:
+            for name in _checkpoint_table_names():
+                table = orca.get_table(name)
+                store.put(name, table.to_frame(table.local_columns))
+                for col in _added_columns(name):
+                    store.put("added_columns/{}/{}".format(name, col),
+                              orca.get_raw_column(name, col)().to_frame(col))
+
+    developer_settings = orca.get_injectable("developer_settings")
+    state = {
+        "year": year,
+        "injectables": {name: orca.get_injectable(name) for name in CHECKPOINT_INJECTABLES
+                        if orca.is_injectable(name)},
+        "developer_settings": {key: developer_settings[key] for key in CHECKPOINT_DEVELOPER_SETTINGS
+                               if key in developer_settings},
+        "random_state": np.random.get_state()
+    }
+    pkl_tmp = pkl_path.with_suffix(".pkl.tmp")
+    with open(pkl_tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(h5_tmp, h5_path)
+    os.replace(pkl_tmp, pkl_path)
+    logger.info("Saved checkpoint for {} to {}".format(year, h5_path.parent))
+
+    return h5_path, pkl_path
+
+
+def restore_checkpoint(year, path=None):
+    """
+    Rehydrate the state saved by save_checkpoint at the end of the given
+    year, replacing the registered tables and injectables.  The run then
+    continues with the year after.
+    """
+    h5_path, pkl_path = checkpoint_paths(year, path)
+    if not h5_path.exists() or not pkl_path.exists():
+        raise FileNotFoundError("No checkpoint for {} in {}".format(year, h5_path.parent))
+
+    with pd.HDFStore(h5_path, "r") as store:
+        keys = store.keys()
+        for key in keys:
+            if key.startswith("/added_columns/"):
+                continue
+            name = key[1:]
+            logger.info("Restoring table {}".format(name))
+            orca.add_table(name, store[key])
+        # the added columns go on after all the tables are back
+        for key in keys:
+            if key.startswith("/added_columns/"):
+                name, col = key.split("/")[2:]
+                logger.info("Restoring column {}.{}".format(name, col))
+                orca.add_column(name, col, store[key][col])
+
+    with open(pkl_path, "rb") as f:
+        state = pickle.load(f)
+
+    for name, value in state["injectables"].items():
+        logger.info("Restoring injectable {}".format(name))
+        orca.add_injectable(name, value)
+
+    # developer settings are updated in place since other cached
+    # injectables hold on to the same dict
+    orca.get_injectable("developer_settings").update(state["developer_settings"])
+
+    np.random.set_state(state["random_state"])
+    logger.info("Restored checkpoint for {} from {}".format(year, h5_path.parent))
+
+
+@orca.step()
+def checkpoint(run_setup, year):
+
+    if not run_setup.get("save_checkpoints", True):
+        return
+
+    save_checkpoint(year)
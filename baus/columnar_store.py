@@ -0,0 +1,150 @@
+from __future__ import print_function
+
+import pathlib
+
+import pandas as pd
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+STORE_FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+
+
+class ColumnarStore(object):
+    """
+    A directory of per-table Parquet or Feather files which stands in for
+    the HDFStore of base year data.  Tables are memory mapped when read and
+    can be projected to a subset of their columns, so only what the model
+    uses is ever loaded.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Directory holding one file per table
+    fmt : {'parquet', 'feather'}
+        File format of the tables
+    columns : dict, optional
+        Maps table names to the list of columns to read for that table -
+        tables not listed are read in full
+    """
+    def __init__(self, path, fmt="parquet", columns=None):
+        if fmt not in STORE_FORMATS:
+            raise ValueError("Unknown store format {}, expected one of {}".format(
+                fmt, list(STORE_FORMATS)))
+        self.path = pathlib.Path(path)
+        self.fmt = fmt
+        self.columns = columns or {}
+
+    def _table_path(self, key):
+        return self.path / (key.strip("/") + STORE_FORMATS[self.fmt])
+
+    def keys(self):
+        ext = STORE_FORMATS[self.fmt]
+        return sorted("/" + p.relative_to(self.path).as_posix()[:-len(ext)]
+                      for p in self.path.rglob("*" + ext))
+
+    def __contains__(self, key):
+        return self._table_path(key).exists()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def select(self, key, columns=None):
+        """
+        Read a table, optionally only the given columns.  The index is
+        always read.
+        """
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        path = self._table_path(key)
+        if not path.exists():
+            raise KeyError("No object named {} in the store {}".format(key, self.path))
+
+        if self.fmt == "parquet":
+            table = pq.read_table(path, columns=columns, memory_map=True, use_pandas_metadata=True)
+        else:
+            if columns is not None:
+                # feather doesn't add the index columns on its own
+                schema = feather.read_table(path, columns=[], memory_map=True).schema
+                index_cols = [c for c in (schema.pandas_metadata or {}).get("index_columns", [])
+                              if isinstance(c, str)]
+                columns = index_cols + [c for c in columns if c not in index_cols]
+            table = feather.read_table(path, columns=columns, memory_map=True)
+
+        # let arrow release each column as soon as it's been converted
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    def __getitem__(self, key):
+        return self.select(key, self.columns.get(key.strip("/")))
+
+    def __getattr__(self, key):
+        # HDFStore allows store.table_name
+        if key.startswith("_") or key not in self:
+            raise AttributeError(key)
+        return self[key]
+
+    def put(self, key, df):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        path = self._table_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        if self.fmt == "parquet":
+            pq.write_table(table, path)
+        else:
+            feather.write_feather(table, path)
+
+    def __setitem__(self, key, df):
+        self.put(key, df)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "<ColumnarStore {} ({})>".format(self.path, self.fmt)
+
+
+def columnar_store_path(h5_path, fmt):
+    # the converted store sits next to the h5 it came from
+    h5_path = pathlib.Path(h5_path)
+    return h5_path.with_name("{}_{}".format(h5_path.stem, fmt))
+
+
+def convert_h5_store(h5_path, out_path=None, fmt="parquet"):
+    """
+    Convert every table in an HDF5 store to a ColumnarStore.
+
+    Parameters
+    ----------
+    h5_path : str or pathlib.Path
+        The HDF5 store to convert
+    out_path : str or pathlib.Path, optional
+        Directory to write to, defaults to a directory next to the h5
+        named after it and the format
+    fmt : {'parquet', 'feather'}
+
+    Returns
+    -------
+    ColumnarStore
+    """
+    out_path = out_path if out_path is not None else columnar_store_path(h5_path, fmt)
+    out = ColumnarStore(out_path, fmt)
+    with pd.HDFStore(h5_path, mode="r") as store:
+        for key in store.keys():
+            df = store[key]
+            # arrow needs string column names
+            df.columns = [str(c) for c in df.columns]
+            logger.info("Converting {} ({:,} rows)".format(key, len(df)))
+            out.put(key, df)
+    return out
@@ -10,6 +10,7 @@ import orca
 from baus import preprocessing
 from baus.utils import geom_id_to_parcel_id, parcel_id_to_geom_id, pipeline_filtering
 from baus.utils import nearest_neighbor
+from baus.columnar_store import ColumnarStore, columnar_store_path
 import yaml
 import pathlib
 
@@ -229,12 +230,21 @@ def final_year():
 
 
 @orca.injectable(cache=True)
-def store(base_year):
+def store(base_year, run_setup):
     if base_year == 2020:
         h5_path = pathlib.Path(orca.get_injectable("inputs_dir")) / "basis_inputs" / "parcels_buildings_agents" / "2024_10_29_bayarea_2020start.h5"
     else:
         h5_path = pathlib.Path(orca.get_injectable("inputs_dir")) / "basis_inputs" / "parcels_buildings_agents" / "2015_09_01_bayarea_v3.h5"
 
+    # the base year data can also be read from a directory of parquet or feather
+    # tables made from the h5 with scripts/convert_h5_store.py, which only loads
+    # the columns listed in store_columns
+    store_format = run_setup.get('store_format', 'h5')
+    if store_format != 'h5':
+        store_path = columnar_store_path(h5_path, store_format)
+        logger.info("store({}): Reading {} tables from {}".format(base_year, store_format, store_path))
+        return ColumnarStore(store_path, store_format, columns=run_setup.get('store_columns'))
+
     logger.info("store({}): Reading {}".format(base_year, h5_path))
     return pd.HDFStore(h5_path, mode='r')
 
@@ -7,8 +7,7 @@ from urbansim_defaults import utils
 from baus import datasources
 from baus import variables
 
-from operator import itemgetter
-import itertools
+from urbansim.utils import misc
 
 import logging
 
@@ -18,6 +17,109 @@ logger = logging.getLogger(__name__)
 # after slr has inundated some parcels and removed buildings permanently,
 # earthquake model removes further buildings temporarily
 
+# earthquake code components: a building class ("a"), a story class ("b")
+# and a year built group ("c").  story classes are closed intervals of
+# stories, year built groups are closed intervals of years where each group
+# starts the year after the previous one ends
+EQ_STORY_CLASSES = {
+    'SF': [('01', 1, 1), ('2P', 2, np.inf)],
+    'DU': [('01', 1, 1), ('2P', 2, np.inf)],
+    'MF': [('01', 1, 1), ('25', 2, 5), ('5P', 6, np.inf)],
+}
+
+EQ_YEAR_GROUP_BREAKS = {
+    ('SF', '01'): [1940, 1960, 1995, 2015],
+    ('SF', '2P'): [1920, 1940, 1960, 1995, 2015],
+    ('DU', '01'): [1940, 1960, 1995, 2015],
+    ('DU', '2P'): [1920, 1940, 1960, 1977, 1991, 2015],
+    ('MF', '01'): [1920, 1940, 1960, 1995, 2015],
+    ('MF', '25'): [1920, 1940, 1960, 1977, 1991, 2015],
+    ('MF', '5P'): [1950, 1971, 1995, 2006, 2015],
+    ('OT', 'NN'): [1933, 1950, 1972, 1996, 2006, 2015],
+}
+
+EQ_FRAGILITY = {
+    'SF01G1N': 2.5, 'SF01G2N': 1.5, 'SF01G3N': 1.2, 'SF01G4N': 1,
+    'SF2PG1N': 2.5, 'SF2PG2N': 2.25, 'SF2PG3N': 2, 'SF2PG4N': 1.3,
+    'SF2PG5N': 1,
+    'DU01G1N': 2, 'DU01G2N': 1.5, 'DU01G3N': 1.2, 'DU01G4N': 1,
+    'DU2PG1N': 2.5, 'DU2PG2N': 2, 'DU2PG3N': 1.75, 'DU2PG4N': 1.75,
+    'DU2PG5N': 1.2, 'DU2PG6N': 1,
+    'MF01G1N': 2.5, 'MF01G2N': 2, 'MF01G3N': 1.5, 'MF01G4N': 1.2,
+    'MF01G5N': 1,
+    'MF25G1N': 2.5, 'MF25G2N': 3, 'MF25G3N': 3, 'MF25G4N': 3,
+    'MF25G5N': 1.2, 'MF25G6N': 1,
+    'MF5PG1N': 1.4, 'MF5PG2N': 1.5, 'MF5PG3N': 1.3, 'MF5PG4N': 1.2,
+    'MF5PG5N': 1,
+    'OTNNG1N': 2, 'OTNNG2N': 1.4, 'OTNNG3N': 1.5, 'OTNNG4N': 1.3,
+    'OTNNG5N': 1.2, 'OTNNG6N': 1,
+    'NNNNNNN': 0,
+}
+
+
+def building_fragility_codes(buildings):
+    """
+    Assign an earthquake code and fragility coefficient to each building
+    using the rule tables above.
+
+    Buildings that fall through the rules (e.g. a missing year_built or a
+    fractional number of stories) take the code component or fragility of
+    the previous building in the table, which is what the original
+    building-by-building loop did with its carried-over variables.
+
+    Parameters
+    ----------
+    buildings : DataFrame
+        Must have building_type, year_built, stories and residential_units
+
+    Returns
+    -------
+    code : Series
+        Seven character earthquake code, indexed like buildings
+    fragility : Series
+        Fragility coefficient, indexed like buildings
+    """
+    btype = buildings['building_type'].values
+    year_built = buildings['year_built'].values.astype(float)
+    stories = buildings['stories'].values.astype(float)
+    units = buildings['residential_units'].values
+
+    existing = year_built <= 2015
+    new = year_built > 2015
+    sf = existing & (btype == 'HS')
+    multi = existing & ((btype == 'HM') | (btype == 'MR'))
+    du = multi & np.isin(units, [2, 3, 4])
+    mf = multi & ~du
+    ot = existing & ~sf & ~multi
+
+    a = np.select([sf, du, mf, ot, new], ['SF', 'DU', 'MF', 'OT', 'NN'],
+                  default=None).astype(object)
+
+    b = np.full(len(buildings), None, dtype=object)
+    for cls, story_classes in EQ_STORY_CLASSES.items():
+        for label, low, high in story_classes:
+            b[(a == cls) & (stories >= low) & (stories <= high)] = label
+    b[ot | new] = 'NN'
+
+    c = np.full(len(buildings), None, dtype=object)
+    for (cls, story_cls), breaks in EQ_YEAR_GROUP_BREAKS.items():
+        mask = (a == cls) & (b == story_cls)
+        low = -np.inf
+        for i, high in enumerate(breaks):
+            c[mask & (year_built >= low) & (year_built <= high)] = \
+                'G%d' % (i + 1)
+            low = high + 1
+    c[new] = 'NN'
+
+    parts = pd.DataFrame({'a': a, 'b': b, 'c': c}, index=buildings.index)
+    parts = parts.ffill().fillna('NN')
+    code = parts.a + parts.b + parts.c + 'N'
+
+    fragility = code.map(EQ_FRAGILITY).astype(float).ffill().fillna(0)
+
+    return code, fragility
+
+
 @orca.step()
 def eq_code_buildings(buildings, year):
 
@@ -27,214 +129,15 @@ def eq_code_buildings(buildings, year):
         # model stochastisitcy that will change the building stock in 2035
         # this also allows us to change the building codes when retrofitting
         # policies are applied, thus changing fragility coefficients
-        buildings = buildings.to_frame()
-        code = []
-        fragilities = []
-
-        for i in buildings.index:
-            if (buildings['building_type'][i] == 'HS' and
-               buildings['year_built'][i] <= 2015):
-                a = 'SF'
-                if buildings['stories'][i] == 1:
-                    b = '01'
-                    if buildings['year_built'][i] <= 1940:
-                        c = 'G1'
-                    elif (buildings['year_built'][i] >= 1941 and
-                          buildings['year_built'][i] <= 1960):
-                        c = 'G2'
-                    elif (buildings['year_built'][i] >= 1961 and
-                          buildings['year_built'][i] <= 1995):
-                        c = 'G3'
-                    elif (buildings['year_built'][i] >= 1996 and
-                          buildings['year_built'][i] <= 2015):
-                        c = 'G4'
-                elif buildings['stories'][i] >= 2:
-                    b = '2P'
-                    if buildings['year_built'][i] <= 1920:
-                        c = 'G1'
-                    elif (buildings['year_built'][i] >= 1921 and
-                          buildings['year_built'][i] <= 1940):
-                        c = 'G2'
-                    elif (buildings['year_built'][i] >= 1941 and
-                          buildings['year_built'][i] <= 1960):
-                        c = 'G3'
-                    elif (buildings['year_built'][i] >= 1961 and
-                          buildings['year_built'][i] <= 1995):
-                        c = 'G4'
-                    elif (buildings['year_built'][i] >= 1996 and
-                          buildings['year_built'][i] <= 2015):
-                        c = 'G5'
-            elif ((buildings['building_type'][i] == 'HM' or
-                  buildings['building_type'][i] == 'MR') and
-                  buildings['year_built'][i] <= 2015):
-                if (buildings['residential_units'][i] == 2 or
-                   buildings['residential_units'][i] == 3 or
-                   buildings['residential_units'][i] == 4):
-                    a = 'DU'  # 2, 3, & 4 units
-                    # are considered duplex/triplex/quadplex
-                    if buildings['stories'][i] == 1:
-                        b = '01'
-                        if buildings['year_built'][i] <= 1940:
-                            c = 'G1'
-                        elif (buildings['year_built'][i] >= 1941 and
-                              buildings['year_built'][i] <= 1960):
-                            c = 'G2'
-                        elif (buildings['year_built'][i] >= 1961 and
-                              buildings['year_built'][i] <= 1995):
-                            c = 'G3'
-                        elif (buildings['year_built'][i] >= 1996 and
-                              buildings['year_built'][i] <= 2015):
-                            c = 'G4'
-                    if buildings['stories'][i] >= 2:
-                        b = '2P'
-                        if buildings['year_built'][i] <= 1920:
-                            c = 'G1'
-                        elif (buildings['year_built'][i] >= 1921 and
-                              buildings['year_built'][i] <= 1940):
-                            c = 'G2'
-                        elif (buildings['year_built'][i] >= 1941 and
-                              buildings['year_built'][i] <= 1960):
-                            c = 'G3'
-                        elif (buildings['year_built'][i] >= 1961 and
-                              buildings['year_built'][i] <= 1977):
-                            c = 'G4'
-                        elif (buildings['year_built'][i] >= 1978 and
-                              buildings['year_built'][i] <= 1991):
-                            c = 'G5'
-                        elif (buildings['year_built'][i] >= 1992 and
-                              buildings['year_built'][i] <= 2015):
-                            c = 'G6'
-                else:  # this assumes one-unit HM/MR buildings
-                    # are also 5+ units (multifamily split by parcels)
-                    a = 'MF'
-                    if buildings['stories'][i] == 1:
-                        b = '01'
-                        if buildings['year_built'][i] <= 1920:
-                            c = 'G1'
-                        elif (buildings['year_built'][i] >= 1921 and
-                              buildings['year_built'][i] <= 1940):
-                            c = 'G2'
-                        elif (buildings['year_built'][i] >= 1941 and
-                              buildings['year_built'][i] <= 1960):
-                            c = 'G3'
-                        elif (buildings['year_built'][i] >= 1961 and
-                              buildings['year_built'][i] <= 1995):
-                            c = 'G4'
-                        elif (buildings['year_built'][i] >= 1996 and
-                              buildings['year_built'][i] <= 2015):
-                            c = 'G5'
-                    elif (buildings['stories'][i] >= 2 and
-                          buildings['stories'][i] <= 5):
-                        b = '25'
-                        if buildings['year_built'][i] <= 1920:
-                            c = 'G1'
-                        elif (buildings['year_built'][i] >= 1921 and
-                              buildings['year_built'][i] <= 1940):
-                            c = 'G2'
-                        elif (buildings['year_built'][i] >= 1941 and
-                              buildings['year_built'][i] <= 1960):
-                            c = 'G3'
-                        elif (buildings['year_built'][i] >= 1961 and
-                              buildings['year_built'][i] <= 1977):
-                            c = 'G4'
-                        elif (buildings['year_built'][i] >= 1978 and
-                              buildings['year_built'][i] <= 1991):
-                            c = 'G5'
-                        elif (buildings['year_built'][i] >= 1992 and
-                              buildings['year_built'][i] <= 2015):
-                            c = 'G6'
-                    elif buildings['stories'][i] >= 6:
-                        b = '5P'
-                        if buildings['year_built'][i] <= 1950:
-                            c = 'G1'
-                        elif (buildings['year_built'][i] >= 1951 and
-                              buildings['year_built'][i] <= 1971):
-                            c = 'G2'
-                        elif (buildings['year_built'][i] >= 1972 and
-                              buildings['year_built'][i] <= 1995):
-                            c = 'G3'
-                        elif (buildings['year_built'][i] >= 1996 and
-                              buildings['year_built'][i] <= 2006):
-                            c = 'G4'
-                        elif (buildings['year_built'][i] >= 2007 and
-                              buildings['year_built'][i] <= 2015):
-                            c = 'G5'
-            elif buildings['year_built'][i] <= 2015:
-                a = 'OT'
-                b = 'NN'
-                if buildings['year_built'][i] <= 1933:
-                    c = 'G1'
-                elif (buildings['year_built'][i] >= 1934 and
-                      buildings['year_built'][i] <= 1950):
-                    c = 'G2'
-                elif (buildings['year_built'][i] >= 1951 and
-                      buildings['year_built'][i] <= 1972):
-                    c = 'G3'
-                elif (buildings['year_built'][i] >= 1973 and
-                      buildings['year_built'][i] <= 1996):
-                    c = 'G4'
-                elif (buildings['year_built'][i] >= 1997 and
-                      buildings['year_built'][i] <= 2006):
-                    c = 'G5'
-                elif (buildings['year_built'][i] >= 2007 and
-                      buildings['year_built'][i] <= 2015):
-                    c = 'G6'
-            # new buildings built by the developer model
-            elif buildings['year_built'][i] > 2015:
-                a = 'NN'
-                b = 'NN'
-                c = 'NN'
-                # alternative if retrofitted: d = 'R'
-            d = 'N'
-            code_i = a+b+c+d
-            code.append(code_i)
-
-            # assign a fragility coefficient based on building code
-            if (code_i == 'SF01G4N' or code_i == 'SF2PG5N' or
-               code_i == 'DU2PG6N' or code_i == 'MF5PG5N' or
-               code_i == 'DU01G4N' or code_i == 'MF25G6N' or
-               code_i == 'MF01G5N' or code_i == 'OTNNG6N'):
-                fragility = 1
-            elif (code_i == 'SF01G3N' or code_i == 'DU01G3N' or
-                  code_i == 'DU2PG5N' or code_i == 'MF25G5N' or
-                  code_i == 'MF01G4N' or code_i == 'OTNNG5N' or
-                  code_i == 'MF5PG4N'):
-                fragility = 1.2
-            elif (code_i == 'SF2PG4N' or code_i == 'MF5PG3N' or
-                  code_i == 'OTNNG4N'):
-                fragility = 1.3
-            elif (code_i == 'MF5PG1N' or code_i == 'OTNNG2N'):
-                fragility = 1.4
-            elif (code_i == 'MF01G3N' or code_i == 'MF5PG2N' or
-                  code_i == 'SF01G2N' or code_i == 'DU01G2N' or
-                  code_i == 'OTNNG3N'):
-                fragility = 1.5
-            elif (code_i == 'DU2PG3N' or code_i == 'DU2PG4N'):
-                fragility = 1.75
-            elif (code_i == 'SF2PG3N' or code_i == 'DU01G1N' or
-                  code_i == 'DU2PG2N' or code_i == 'MF01G2N' or
-                  code_i == 'OTNNG1N'):
-                fragility = 2
-            elif (code_i == 'SF2PG2N'):
-                fragility = 2.25
-            elif (code_i == 'DU2PG1N' or code_i == 'SF01G1N' or
-                  code_i == 'SF2PG1N' or code_i == 'MF01G1N' or
-                  code_i == 'MF25G1N'):
-                fragility = 2.5
-            elif (code_i == 'MF25G2N' or code_i == 'MF25G3N' or
-                  code_i == 'MF25G4N'):
-                fragility = 3
-            elif (code_i == 'NNNNNNN'):
-                fragility = 0
-            fragilities.append(fragility)
-
-        orca.add_injectable("code", code)
-        orca.add_injectable("fragilities", fragilities)
+        buildings = buildings.to_frame(['building_type', 'year_built',
+                                        'stories', 'residential_units'])
+        code, fragility = building_fragility_codes(buildings)
+
+        orca.add_injectable("code", code.tolist())
+        orca.add_injectable("fragilities", fragility.tolist())
 
         # add codes and fragilities as orca columns
-        code = pd.Series(code, buildings.index)
         orca.add_column('buildings', 'earthquake_code', code)
-        fragility = pd.Series(fragilities, buildings.index)
         orca.add_column('buildings', 'fragility_coef', fragility)
 
         # generate random number, multiply by fragilities
@@ -248,6 +151,29 @@ def eq_code_buildings(buildings, year):
         orca.add_column('buildings', 'fire_destroy', rand_fire)
 
 
+# existing buildings with these codes are candidates for retrofit in
+# "strategies" runs - half of those selected for destruction are spared
+EQ_RETROFIT_CODES = ['DU01G1N', 'DU01G2N', 'MF01G1N', 'MF01G2N',
+                     'MF25G1N', 'MF25G2N', 'MF25G3N', 'MF25G4N',
+                     'SF01G1N', 'SF2PG1N']
+
+# share of new buildings destroyed by the tract's shaking intensity (MMI),
+# MMI below 7 destroys no new buildings and above 9 is treated as 9
+EQ_NEW_BUILDING_PCT = {7: .002, 8: .01, 9: .05}
+
+
+def _select_share_by_tract(df, mask, sort_col, share):
+    # flags the buildings in mask with the highest sort_col values in each
+    # tract, taking round(share * buildings in mask) buildings per tract
+    sub = df.loc[mask, ['tract', sort_col]]
+    sub = sub.sort_values(sort_col, ascending=False, kind='mergesort',
+                          na_position='last')
+    grp = sub.groupby('tract', sort=False)
+    num = np.round(grp[sort_col].transform('size') * share.loc[sub.index])
+    selected = grp.cumcount() < num
+    return selected.reindex(df.index, fill_value=False)
+
+
 @orca.step()
 def earthquake_demolish(run_setup, parcels, buildings,
                         households, jobs, residential_units, year):
@@ -261,117 +187,65 @@ def earthquake_demolish(run_setup, parcels, buildings,
         print("Number of parcels with census tracts is: %d" %
               len(census_tract))
         orca.add_column('parcels', 'tract', census_tract)
-
-        # group parcels by their census tract
-        parcels_tract['parcel_id'] = parcels_tract.index
-        parcels_tract = parcels_tract.to_frame(columns=['parcel_id',
-                                                        'census_tract'])
-        parcels_tract = parcels_tract[['census_tract', 'parcel_id']]
-        tract_parcels_grp = []
-        tracts = []
-        parcels_tract = sorted(parcels_tract.values, key=itemgetter(0))
-        for tract, parcels in itertools.groupby(parcels_tract,
-                                                key=itemgetter(0)):
-            tract_parcels_grp.append(list(parcels))
-            tracts.append(tract)
-        print("Number of census tract groups is: %d" % len(tract_parcels_grp))
+        print("Number of census tract groups is: %d" %
+              census_tract.nunique())
 
         # for the parcels in each tract, destroy X% of parcels in that tract
         tracts_earthquake = orca.get_table("tracts_earthquake").to_frame()
-        tracts_earthquake = tracts_earthquake.sort_values(by=['tract_ba'])
-        tracts_earthquake = tracts_earthquake.reset_index(drop=True)
-
-        buildings = buildings.to_frame()
-        eq_buildings = []
-        existing_buildings = []
-        new_buildings = []
-        fire_buildings = []
-        retrofit_bldgs_tot = pd.DataFrame()
-
-        for i in range(len(tracts)):
-            grp = [x[1] for x in tract_parcels_grp[i]]
-            buildings_i = buildings[buildings['parcel_id'].isin(grp)]
-
-            # existing buildings
-            # select the buildings with highest fragility co-efficient
-            # (and random no.) based on census tract pct to be destroyed
-            existing_pct = tracts_earthquake['prop_eq'][i]
-            build_frag = buildings_i['eq_destroy'].sort_values(ascending=False)
-            top_build_frag = build_frag[: int(round(
-                len(build_frag) * existing_pct))]
-            # in "strategies" runs, exclude some existing buildings
-            # from destruction due to retrofit
-            if run_setup['run_eq_mitigation']:
-                retrofit_codes = ['DU01G1N', 'DU01G2N', 'MF01G1N', 'MF01G2N',
-                                  'MF25G1N', 'MF25G2N', 'MF25G3N', 'MF25G4N',
-                                  'SF01G1N', 'SF2PG1N']
-                top_build_frag_bldgs = buildings[buildings.index.isin
-                                                 (top_build_frag.index)]
-                retrofit_bldgs = top_build_frag_bldgs[top_build_frag_bldgs.
-                                                      earthquake_code.isin
-                                                      (retrofit_codes)]
-                retro_no = int(round(float(len(retrofit_bldgs))/2))
-                retrofit_set = np.random.choice(retrofit_bldgs.index,
-                                                retro_no, replace=False)
-                # update top_build_frag to remove retrofit buildings
-                top_build_frag = top_build_frag[~top_build_frag.index.isin
-                                                (retrofit_set)]
-                # add table of retrofit buildings that weren't destroyed
-                retrofit_bldgs_set = buildings[buildings.index.isin
-                                               (retrofit_set)]
-                retrofit_bldgs_tot = retrofit_bldgs_tot. \
-                    append(retrofit_bldgs_set)
-                orca.add_table("retrofit_bldgs_tot", retrofit_bldgs_tot)
-            # add to a list of buildings to destroy
-            buildings_top = top_build_frag.index
-            existing_buildings.extend(buildings_top)
-            eq_buildings.extend(buildings_top)
-
-            # new buildings
-            # translate MMI to a probability
-            # in-model is also nice if probabilities associated with
-            # new buildings change
-            buildings_new = buildings_i[buildings_i['year_built'] > 2015]
-            if len(buildings_new) > 0:
-                mmi = int(round(tracts_earthquake['shaking'][i]))
-                if mmi < 6:
-                    new_pct = 0
-                elif mmi == 7:
-                    new_pct = .002
-                elif mmi == 8:
-                    new_pct = .01
-                elif mmi == 9:
-                    new_pct = .05
-                # randomly select buildings to be destroyed based on
-                # percentages
-                new_no = int(round(len(buildings_new)*new_pct))
-                buildings_new_rand = np.random.choice(buildings_new.index,
-                                                      new_no, replace=False)
-                # add to a list of buildings to destroy
-                if len(buildings_new_rand) > 0:
-                    new_buildings.extend(buildings_new_rand)
-                    eq_buildings.extend(buildings_new_rand)
-
-            # fire buildings
-            # select buildings to be destroyed by fire by looking only at
-            # remaining buildings
-            fire_pct = tracts_earthquake['prop_fire'][i]
-            buildings_i_remain = buildings_i[~buildings_i.index.isin
-                                             (buildings_top)]
-            if len(buildings_new) > 0:
-                buildings_i_remain = buildings_i_remain[~buildings_i_remain.
-                                                        index.isin
-                                                        (buildings_new_rand)]
-            # select buildings to be destroyed based on random number
-            # and census tract pct
-            fire_buildings_rand = buildings_i_remain['fire_destroy']. \
-                sort_values(ascending=False)
-            top_fire_buildings = fire_buildings_rand[: int(round(
-                len(fire_buildings_rand) * fire_pct))]
-            # add to a list of buildings to destroy
-            buildings_fire = top_fire_buildings.index
-            fire_buildings.extend(buildings_fire)
-            eq_buildings.extend(buildings_fire)
+        tracts_earthquake = tracts_earthquake.set_index('tract_ba')
+
+        # one frame of buildings with their tract's damage probabilities
+        df = buildings.to_frame(['parcel_id', 'year_built', 'earthquake_code',
+                                 'eq_destroy', 'fire_destroy'])
+        df['tract'] = misc.reindex(census_tract, df.parcel_id)
+        df = df.dropna(subset=['tract'])
+        df['tract'] = df.tract.astype(tracts_earthquake.index.dtype)
+        df = df.join(tracts_earthquake[['prop_eq', 'shaking', 'prop_fire']],
+                     on='tract', how='inner')
+
+        # existing buildings
+        # select the buildings with highest fragility co-efficient
+        # (and random no.) based on census tract pct to be destroyed
+        existing = _select_share_by_tract(df, pd.Series(True, df.index),
+                                          'eq_destroy', df.prop_eq)
+
+        # in "strategies" runs, exclude some existing buildings
+        # from destruction due to retrofit
+        if run_setup['run_eq_mitigation']:
+            candidates = existing & df.earthquake_code.isin(EQ_RETROFIT_CODES)
+            df['retrofit_draw'] = np.random.random(len(df))
+            retrofit = _select_share_by_tract(df, candidates, 'retrofit_draw',
+                                              pd.Series(.5, df.index))
+            existing &= ~retrofit
+            # add table of retrofit buildings that weren't destroyed
+            retrofit_bldgs_tot = buildings.to_frame(
+                buildings.local_columns + ['earthquake_code'])
+            retrofit_bldgs_tot = retrofit_bldgs_tot.loc[
+                df.index[retrofit.values]]
+            orca.add_table("retrofit_bldgs_tot", retrofit_bldgs_tot)
+
+        # new buildings
+        # translate MMI to a probability
+        # in-model is also nice if probabilities associated with
+        # new buildings change
+        mmi = np.round(df.shaking).clip(upper=9)
+        new_pct = mmi.map(EQ_NEW_BUILDING_PCT).fillna(0)
+        # randomly select buildings to be destroyed based on percentages
+        df['new_draw'] = np.random.random(len(df))
+        new = _select_share_by_tract(df, df.year_built > 2015, 'new_draw',
+                                     new_pct)
+
+        # fire buildings
+        # select buildings to be destroyed by fire by looking only at
+        # remaining buildings, based on random number and census tract pct
+        fire = _select_share_by_tract(df, ~existing & ~new, 'fire_destroy',
+                                      df.prop_fire)
+
+        # add to a list of buildings to destroy
+        existing_buildings = df.index[existing.values].tolist()
+        new_buildings = df.index[new.values].tolist()
+        fire_buildings = df.index[fire.values].tolist()
+        eq_buildings = existing_buildings + new_buildings + fire_buildings
 
         print("Total number of buildings being destroyed is: %d" %
               len(eq_buildings))
@@ -0,0 +1,366 @@
+from __future__ import print_function
+
+import hashlib
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import orca
+from urbansim.developer import sqftproforma
+from urbansim.models import util
+from urbansim_defaults import utils
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# parcel columns read by the pro forma lookup, when the parcels table has them
+LOOKUP_COLUMNS = ["land_cost", "parcel_size", "max_far", "max_height", "max_dua", "ave_unit_size"]
+
+# lookup inputs which move with the prices every year, and are compared to the
+# previous run within a tolerance (the prices of each use are added to these)
+PRICE_COLUMNS = ["land_cost"]
+
+# parcel columns which mark a parcel as redeveloped
+BUILDING_COLUMNS = ["total_sqft", "total_residential_units"]
+
+# smallest number of parcels worth sending to a worker process
+MIN_CHUNK_SIZE = 20000
+
+
+def _config_key(config):
+    # pro formas built from equal configs give equal results.  the cap rate is
+    # reset every year and only used when parcels are looked up, so it's left
+    # out and compared with the prices instead
+    items = sorted((k, v) for k, v in vars(config).items() if k != "cap_rate")
+    return hashlib.blake2b(pickle.dumps(items), digest_size=16).hexdigest()
+
+
+def _compact(df):
+    """
+    Shrink a feasibility frame for the cache.  Float columns which survive the
+    round trip through float32 exactly (unit counts, sqft, ids, etc.) are
+    stored as float32 and strings as categoricals - the rest are kept as they
+    are, so reading the cache back always gives the values the pro forma
+    computed.
+    """
+    out = {}
+    for col in df.columns:
+        values = df[col].values
+        if values.dtype == np.float64:
+            small = values.astype(np.float32)
+            if np.array_equal(small.astype(np.float64), values, equal_nan=True):
+                values = small
+        elif values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == "string":
+            values = pd.Categorical(values)
+        out[col] = values
+    return pd.DataFrame(out, index=df.index, copy=False)
+
+
+def _simple_zoning_columns(form):
+    # with simple zoning, residential forms are only limited by max_dua and
+    # the others by max_far
+    if form == "residential":
+        # these are new computed in the effective max_dua method
+        return ["max_far", "max_height"]
+    # these are new computed in the effective max_far method
+    return ["max_dua", "max_height"]
+
+
+# the pro forma and parcels shared with the worker processes
+_WORKER_INPUTS = {}
+
+
+def _init_worker(pf, df):
+    # forked workers inherit these without copying or pickling them
+    _WORKER_INPUTS["pf"] = pf
+    _WORKER_INPUTS["df"] = df
+
+
+def _lookup_chunk(form, parcel_ids, simple_zoning, only_built, pass_through):
+    df = _WORKER_INPUTS["df"].loc[parcel_ids]
+    if simple_zoning:
+        df = df.assign(**{col: np.nan for col in _simple_zoning_columns(form)})
+    return _WORKER_INPUTS["pf"].lookup(form, df, only_built=only_built, pass_through=pass_through)
+
+
+def _expand(df, dtypes):
+    # undo _compact, restoring the dtypes the pro forma returned
+    return pd.DataFrame({col: np.asarray(df[col], dtype=dtypes[col]) for col in df.columns},
+                        index=df.index)
+
+
+class FeasibilityEngine(object):
+    """
+    Runs the pro forma the same as urbansim_defaults.utils.run_feasibility,
+    but keeps each form's results between runs so only the parcels whose
+    inputs changed (prices, zoning, land cost, allowed forms, etc.) are passed
+    through the pro forma again.  alt_feasibility is run several times a year
+    as each subsidy account develops and only the developed parcels change.
+
+    Results are kept separately for each named run (e.g. "alt" and
+    "subsidized"), for its latest pro forma configuration.  A change in the
+    cap rate is treated like a change in prices.
+
+    Parameters
+    ----------
+    price_tolerance : float, optional
+        Relative change in a parcel's prices or land cost, since it was last
+        looked up, before it is looked up again.  With 0 the results are the
+        same as a full lookup.
+    full_recompute_every : int, optional
+        Look up all the parcels again after this many years
+    parity_check : bool, optional
+        Also run the full lookup when parcels are reused, and record how far
+        the results are from it in the parity attribute
+    workers : int, optional
+        Number of processes to look up large sets of parcels with, where
+        processes can be forked - elsewhere the lookup runs in this process
+    """
+    def __init__(self, price_tolerance=0.0, full_recompute_every=None, parity_check=False, workers=1):
+        self.price_tolerance = price_tolerance
+        self.full_recompute_every = full_recompute_every
+        self.parity_check = parity_check
+        self.workers = workers
+        self._pool = None
+        self._pool_inputs = None
+        self._simple_zoning = False
+        self.parity = {}
+        self._proformas = {}
+        self._cache = {}
+        self.frames = {}
+
+    def _proforma(self, name, config):
+        # one pro forma per run, rebuilt when its config changes
+        key = _config_key(config) if config else None
+        if name not in self._proformas or self._proformas[name][0] != key:
+            self._proformas[name] = (key, sqftproforma.SqFtProForma(config) if config
+                                     else sqftproforma.SqFtProForma())
+            # results for the old config can't be reused
+            for cache_key in [k for k in self._cache if k[0][0] == name]:
+                del self._cache[cache_key]
+        pf = self._proformas[name][1]
+        if config:
+            pf.config.cap_rate = config.cap_rate
+        return key, pf
+
+    def _parcels(self, parcels, parcel_filter, pass_through):
+        # only read the parcel columns the filter and pro forma use, and the
+        # building columns which mark parcels dirty
+        cols = LOOKUP_COLUMNS + BUILDING_COLUMNS + list(pass_through)
+        if parcel_filter:
+            cols = util.columns_in_filters(parcel_filter) + cols
+        df = parcels.to_frame([c for c in dict.fromkeys(cols) if c in parcels.columns])
+        if parcel_filter:
+            df = df.query(parcel_filter)
+        return df
+
+    def _dirty(self, prev, newdf, hashes, prices):
+        """
+        The parcels which aren't in the previous run or whose buildings or
+        zoning changed, or whose prices moved by more than price_tolerance
+        from the prices they were last looked up with.
+        """
+        prev_hashes = prev["hashes"].reindex(newdf.index, fill_value=0).values
+        ref = prev["prices"].reindex(newdf.index).values
+        moved = ~np.isclose(prices.values, ref, rtol=self.price_tolerance, atol=0, equal_nan=True)
+        return (hashes.values != prev_hashes) | moved.any(axis=1)
+
+    def _lookup(self, key, pf, form, newdf, only_built, pass_through, cap_rate, year):
+        """
+        Look up the dirty parcels again, and reuse the previous rows for the
+        rest with their pass through columns brought up to date.
+        """
+        # buildings and zoning are compared exactly and prices within the
+        # tolerance - the filter columns (building ages, etc.) only decide
+        # which parcels are looked up and the pass through columns are
+        # refreshed, so neither makes a parcel dirty
+        price_cols = [c for c in pf.config.uses + PRICE_COLUMNS if c in newdf.columns]
+        inputs = [c for c in LOOKUP_COLUMNS + BUILDING_COLUMNS
+                  if c in newdf.columns and c not in price_cols]
+        hashes = pd.Series(pd.util.hash_pandas_object(newdf[inputs], index=False).values,
+                           index=newdf.index)
+        prices = newdf[price_cols].astype(float)
+        prices["cap_rate"] = float(pf.config.cap_rate)
+
+        prev = self._cache.get((key, form))
+        if prev is not None and self.full_recompute_every and year is not None and \
+                year - prev["full_year"] >= self.full_recompute_every:
+            logger.info("    %s: full recompute, last one was in %d" % (form, prev["full_year"]))
+            prev = None
+
+        if prev is None:
+            dirty = np.ones(len(newdf), dtype=bool)
+        else:
+            dirty = self._dirty(prev, newdf, hashes, prices)
+
+        def lookup(df):
+            if len(df) == 0:
+                return pd.DataFrame()
+            if self.workers > 1 and len(df) >= 2 * MIN_CHUNK_SIZE:
+                result = self._parallel_lookup(form, df, only_built, pass_through)
+            else:
+                result = pf.lookup(form, df, only_built=only_built, pass_through=pass_through)
+            if cap_rate and "residential" in pass_through and len(result):
+                result["residential"] /= cap_rate
+            return result
+
+        result = lookup(newdf[dirty])
+
+        if prev is not None and not dirty.all():
+            logger.info("    %s: reusing %d of %d parcels" % (form, (~dirty).sum(), len(newdf)))
+            clean = prev["frame"][prev["frame"].index.isin(newdf.index[~dirty])]
+            if len(clean):
+                clean = _expand(clean, prev["dtypes"])
+                for col in pass_through:
+                    if col in newdf.columns:
+                        clean[col] = newdf.loc[clean.index, col].values
+                        if cap_rate and col == "residential":
+                            clean[col] /= cap_rate
+                result = pd.concat([clean, result]) if len(result) else clean
+                # the lookup returns the parcels sorted
+                result = result.sort_index()
+
+            if self.parity_check:
+                self._check_parity(form, result, lookup(newdf))
+
+            # reused parcels keep the prices they were looked up with, so
+            # small moves can't add up past the tolerance
+            prices = prices.where(np.repeat(dirty[:, None], prices.shape[1], axis=1),
+                                  prev["prices"].reindex(newdf.index))
+            full_year = prev["full_year"]
+        else:
+            full_year = year if year is not None else 0
+
+        if len(result):
+            self._cache[(key, form)] = {"hashes": hashes, "prices": prices, "full_year": full_year,
+                                        "frame": _compact(result), "dtypes": result.dtypes.to_dict()}
+        else:
+            self._cache.pop((key, form), None)
+        return result
+
+    def _parallel_lookup(self, form, df, only_built, pass_through):
+        """
+        Split the parcels into sorted chunks for the worker processes - the
+        pro forma looks up each parcel on its own and returns them sorted, so
+        the chunks put back together in order are the same as one lookup.
+        """
+        if self._pool is None:
+            self._start_pool()
+        parcel_ids = np.sort(df.index.values)
+        n = max(min(self.workers * 4, len(parcel_ids) // MIN_CHUNK_SIZE), 1)
+        futures = [self._pool.submit(_lookup_chunk, form, ids, self._simple_zoning, only_built, pass_through)
+                   for ids in np.array_split(parcel_ids, n)]
+        results = [r for r in (f.result() for f in futures) if len(r)]
+        return pd.concat(results) if results else pd.DataFrame()
+
+    def _start_pool(self):
+        # the output writer's thread is left idle first, so the workers aren't
+        # forked while it holds the logging or file locks
+        if orca.is_injectable("output_writer"):
+            orca.get_injectable("output_writer").flush()
+        # forked workers share the parcels
+        ctx = multiprocessing.get_context("fork")
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=ctx,
+                                         initializer=_init_worker, initargs=self._pool_inputs)
+
+    def _check_parity(self, form, result, full):
+        """
+        Log how the results with reused parcels differ from a full lookup.
+        """
+        missing = full.index.symmetric_difference(result.index)
+        both = full.index.intersection(result.index)
+        diff = (result.max_profit.loc[both] - full.max_profit.loc[both]).abs()
+        scale = full.max_profit.loc[both].abs().clip(lower=1)
+        self.parity[form] = {"parcels": len(full), "missing": len(missing),
+                             "max_profit_max_diff": diff.max() if len(diff) else 0.0,
+                             "max_profit_max_rel_diff": (diff / scale).max() if len(diff) else 0.0}
+        logger.info("    %s parity check: %s" % (form, self.parity[form]))
+
+    def run(self, name, parcels, parcel_price_callback, parcel_use_allowed_callback,
+            residential_to_yearly=True, parcel_filter=None, only_built=True,
+            forms_to_test=None, config=None, pass_through=[], simple_zoning=False, year=None):
+        """
+        Execute development feasibility on all parcels and add the
+        feasibility table, with the same arguments as
+        urbansim_defaults.utils.run_feasibility plus the name of the run and
+        the simulation year.
+        """
+        config_key, pf = self._proforma(name, config)
+        df = self._parcels(parcels, parcel_filter, pass_through)
+
+        # add prices for each use
+        for use in pf.config.uses:
+            # assume we can get the 80th percentile price for new development
+            df[use] = parcel_price_callback(use)
+
+        # convert from cost to yearly rent
+        if residential_to_yearly:
+            df["residential"] *= pf.config.cap_rate
+
+        print("Describe of the yearly rent by use")
+        print(df[pf.config.uses].describe())
+
+        if self.workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+            # spawned workers would re-run baus.py and get a pickled copy of
+            # the parcels each, so without fork the lookup stays serial
+            logger.warning("Parallel feasibility lookup disabled, processes can't be forked here")
+            self.workers = 1
+        # the pool is only started if some form has enough parcels to look up
+        self._pool_inputs = (pf, df)
+        self._simple_zoning = simple_zoning
+
+        d = {}
+        forms = forms_to_test or pf.config.forms
+        try:
+            for form in forms:
+                print("Computing feasibility for form %s" % form)
+                allowed = parcel_use_allowed_callback(form).loc[df.index]
+
+                newdf = df[allowed]
+                if simple_zoning:
+                    newdf = newdf.assign(**{col: np.nan for col in _simple_zoning_columns(form)})
+
+                key = (name, config_key, only_built, tuple(pass_through), simple_zoning, residential_to_yearly)
+                d[form] = self._lookup(key, pf, form, newdf, only_built, pass_through,
+                                       pf.config.cap_rate if residential_to_yearly else None, year)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            self._pool_inputs = None
+
+        far_predictions = pd.concat(d.values(), keys=d.keys(), axis=1)
+        self.frames[name] = far_predictions
+
+        orca.add_table("feasibility", far_predictions)
+        return far_predictions
+
+
+# one engine for the whole run, so results carry over between steps and years
+_ENGINE = FeasibilityEngine()
+
+
+def run_feasibility(name, parcels, parcel_price_callback, parcel_use_allowed_callback, **kwargs):
+    """
+    Drop in for urbansim_defaults.utils.run_feasibility which reuses the
+    previous run's results when run_setup has feasibility_cache on.  Returns
+    the feasibility frame which is added as the feasibility table.
+    """
+    run_setup = orca.get_injectable("run_setup")
+    if not run_setup.get("feasibility_cache", True):
+        utils.run_feasibility(parcels, parcel_price_callback, parcel_use_allowed_callback, **kwargs)
+        return orca.get_table("feasibility").to_frame()
+
+    settings = orca.get_injectable("developer_settings").get("incremental_feasibility", {})
+    _ENGINE.price_tolerance = settings.get("price_tolerance", 0.0)
+    _ENGINE.full_recompute_every = settings.get("full_recompute_every")
+    _ENGINE.parity_check = settings.get("parity_check", False)
+    _ENGINE.workers = orca.get_injectable("developer_settings").get("feasibility_workers", 1)
+
+    return _ENGINE.run(name, parcels, parcel_price_callback, parcel_use_allowed_callback,
+                       year=orca.get_injectable("year") if orca.is_injectable("year") else None,
+                       **kwargs)
@@ -0,0 +1,198 @@
+from __future__ import print_function
+
+import numpy as np
+import pandas as pd
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# metadata which every ledger keeps as its own typed column, the rest of the
+# metadata is kept as generic columns in the order it's first seen
+FIXED_COLUMNS = {"year": np.float64, "building_id": np.float64,
+                 "residential_units": np.float64}
+
+# column names that are always present in DataFrames of transactions, the
+# same as urbansim.accounts
+COLS = ["amount", "subaccount"]
+
+
+class Ledger(object):
+    """
+    A drop in for urbansim.accounts.Account which keeps the transactions as
+    columns instead of a list of namedtuples.  Subaccount totals are kept as
+    transactions are added so balances don't rescan the ledger, and batches
+    of transactions can be added as arrays with add_batch.
+
+    Parameters
+    ----------
+    name : str
+        Arbitrary name for this account used in some output.
+    balance : float, optional
+        Starting balance for the account.
+    """
+    def __init__(self, name, balance=0):
+        self.name = name
+        self.balance = balance
+        self._subaccount_totals = {}
+        self._descriptions = {}
+        # transactions added one at a time are buffered as rows and moved to
+        # the columns when the ledger is read
+        self._rows = []
+        self._chunks = []
+
+    def __len__(self):
+        return len(self._rows) + sum(len(c["amount"]) for c in self._chunks)
+
+    def __repr__(self):
+        return "Ledger(%r, %d transactions, balance=%.2f)" % (self.name, len(self), self.balance)
+
+    def _credit(self, subaccount, total):
+        self._subaccount_totals[subaccount] = self._subaccount_totals.get(subaccount, 0) + total
+        self.balance += total
+
+    def _description_code(self, description):
+        return self._descriptions.setdefault(description, len(self._descriptions))
+
+    def add_transaction(self, amount, subaccount=None, metadata=None, logger=None):
+        """
+        Add a new transaction to the account.
+
+        Parameters
+        ----------
+        amount : float
+            Negative for withdrawls, positive for deposits.
+        subaccount : object, optional
+            Any indicator of a subaccount to which this transaction applies.
+        metadata : dict, optional
+            Any extra metadata to record with the transaction.
+            May not contain keys 'amount' or 'subaccount'.
+        logger : logging.Logger, optional
+            Logs the transaction at debug level.
+        """
+        metadata = metadata or {}
+        self._rows.append((amount, subaccount, metadata))
+        self._credit(subaccount, amount)
+        if logger is not None:
+            logger.debug("%s: %.2f to subaccount %s %s" % (self.name, amount, subaccount, metadata))
+
+    def add_transactions(self, transactions):
+        """
+        Add a collection of transactions to the account.
+
+        Parameters
+        ----------
+        transactions : iterable
+            Should be tuples of amount, subaccount, and metadata as would
+            be passed to `add_transaction`.
+        """
+        for t in transactions:
+            self.add_transaction(*t)
+
+    def add_batch(self, amounts, subaccount=None, metadata=None):
+        """
+        Add many transactions to one subaccount at once.
+
+        Parameters
+        ----------
+        amounts : array-like
+            Amount of each transaction.
+        subaccount : object, optional
+            Subaccount all the transactions apply to.
+        metadata : DataFrame or dict, optional
+            One column (or array) per metadata key with a value for each
+            transaction, or scalars which apply to all of them.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        n = len(amounts)
+        chunk = {"amount": amounts, "subaccount": np.full(n, subaccount, dtype=object)}
+        for key, values in dict(metadata if metadata is not None else {}).items():
+            values = np.asarray(values) if np.ndim(values) else np.full(n, values)
+            if key == "description":
+                values = np.array([self._description_code(v) for v in values], dtype=np.int32)
+            elif key in FIXED_COLUMNS:
+                values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=FIXED_COLUMNS[key])
+            chunk[key] = values
+        self._flush()
+        self._chunks.append(chunk)
+        self._credit(subaccount, amounts.sum())
+
+    def _flush(self):
+        # move the buffered rows into a chunk of columns
+        if not self._rows:
+            return
+        amounts, subaccounts, metadata = zip(*self._rows)
+        chunk = {"amount": np.array(amounts, dtype=float),
+                 "subaccount": np.array(subaccounts + (None,), dtype=object)[:-1]}
+        keys = list(dict.fromkeys(k for m in metadata for k in m))
+        for key in keys:
+            values = [m.get(key) for m in metadata]
+            if key == "description":
+                chunk[key] = np.array([self._description_code(v) for v in values], dtype=np.int32)
+            elif key in FIXED_COLUMNS:
+                chunk[key] = np.array([np.nan if v is None else v for v in values], dtype=FIXED_COLUMNS[key])
+            else:
+                chunk[key] = np.array(values + [None], dtype=object)[:-1]
+        self._chunks.append(chunk)
+        self._rows = []
+
+    def total_transactions(self):
+        """
+        Get the sum of all transactions on the account.
+        """
+        return sum(self._subaccount_totals.values())
+
+    def total_transactions_by_subacct(self, subaccount):
+        """
+        Get the sum of all transactions for a given subaccount.
+        """
+        return self._subaccount_totals.get(subaccount, 0)
+
+    def all_subaccounts(self):
+        """
+        Returns an iterator of all subaccounts that have a recorded transaction
+        with the account.
+        """
+        return iter(list(self._subaccount_totals))
+
+    def iter_subaccounts(self):
+        """
+        An iterator over subaccounts yielding subaccount name and
+        the total of transactions for that subaccount.
+        """
+        for sa, total in list(self._subaccount_totals.items()):
+            yield sa, total
+
+    def to_frame(self):
+        """
+        Return transactions as a pandas DataFrame, with the same columns as
+        urbansim.accounts.Account.to_frame.
+        """
+        self._flush()
+        if not self._chunks:
+            return pd.DataFrame(columns=COLS)
+
+        df = pd.concat([pd.DataFrame(c) for c in self._chunks], ignore_index=True, sort=False)
+        if "description" in df:
+            codes = df.description.fillna(-1).astype(int)
+            df["description"] = pd.Categorical.from_codes(codes, list(self._descriptions))
+        return df
+
+    def to_parquet(self, path):
+        """
+        Write the transactions to a Parquet file.  Metadata columns which
+        mix types (e.g. integer and string subaccounts) are written as strings.
+        """
+        df = self.to_frame()
+        for col in df.columns[df.dtypes == object]:
+            if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+                df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+        df.to_parquet(path, index=False)
+
+    def to_csv(self, path):
+        """
+        Write the transactions to a CSV file, for when pyarrow isn't
+        installed.
+        """
+        self.to_frame().to_csv(path, index=False)
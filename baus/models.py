@@ -10,12 +10,12 @@ import orca
 import pandana.network as pdna
 from urbansim.developer import sqftproforma
 from urbansim.developer.developer import Developer as dev
-from urbansim.utils import misc, networks
+from urbansim.utils import misc
 from urbansim_defaults import models, utils
 
-from baus import datasources, subsidies, variables
+from baus import accessibility, datasources, feasibility, network_cache, subsidies, variables
 from baus.utils import \
-    add_buildings, geom_id_to_parcel_id, groupby_random_choice, \
+    add_buildings, developer_columns_callback, geom_id_to_parcel_id, groupby_random_choice, \
     parcel_id_to_geom_id, round_series_match_target
 
 import logging
@@ -526,9 +526,12 @@ def supply_and_demand_multiplier_func(demand, supply):
 
 
 # this if the function for mapping a specific building that we build to a
-# specific building type
+# specific building type - it takes either a single building or a frame of
+# buildings
 @orca.injectable(autocall=False)
 def form_to_btype_func(building):
+    if isinstance(building, pd.DataFrame):
+        return forms_to_btypes(building)
     mapping = orca.get_injectable('mapping')
     form = building.form
     dua = building.residential_units / (building.parcel_size / 43560.0)
@@ -544,6 +547,24 @@ def form_to_btype_func(building):
     return mapping["form_to_btype"][form][0]
 
 
+def forms_to_btypes(df):
+    """
+    The building type of each building, the same as form_to_btype_func
+    gives one building at a time.
+    """
+    form_to_btype = orca.get_injectable('mapping')["form_to_btype"]
+    dua = (df.residential_units / (df.parcel_size / 43560.0)).values
+    # only None counts as residential, like the single building version a
+    # NaN form (or any other form not in the mapping) is a KeyError
+    residential = np.array([form is None or form == "residential" for form in df.form], dtype=bool)
+    unknown = ~residential & ~df.form.isin(list(form_to_btype)).values
+    if unknown.any():
+        raise KeyError(df.form.values[unknown][0])
+    btypes = df.form.map({form: btypes[0] for form, btypes in form_to_btype.items()}).values
+    return pd.Series(np.where(residential, np.select([dua < 16, dua < 32], ["HS", "HT"], "HM"), btypes),
+                     index=df.index)
+
+
 @orca.injectable(autocall=False)
 def add_extra_columns_func(df):
     df['source'] = 'developer_model'
@@ -586,7 +607,7 @@ def add_extra_columns_func(df):
     if orca.is_injectable("form_to_btype_func") and \
             "building_type" not in df:
         form_to_btype_func = orca.get_injectable("form_to_btype_func")
-        df["building_type"] = df.apply(form_to_btype_func, axis=1)
+        df["building_type"] = form_to_btype_func(df)
 
     return df
 
@@ -604,16 +625,17 @@ def alt_feasibility(parcels, developer_settings,
     # use the cap rate from settings.yaml
     config.cap_rate = developer_settings["cap_rate"]
 
-    utils.run_feasibility(parcels,
-                          parcel_sales_price_sqft_func,
-                          parcel_is_allowed_func,
-                          config=config,
-                          **kwargs)
+    f = feasibility.run_feasibility("alt", parcels,
+                                    parcel_sales_price_sqft_func,
+                                    parcel_is_allowed_func,
+                                    config=config,
+                                    **kwargs)
     
-    # save feasibility table state for summaries
-    orca.add_injectable("feasibility_before_policy", orca.get_table("feasibility").to_frame())
+    # save feasibility table state for summaries - the policies modify the
+    # frame in place so they get their own copy
+    orca.add_injectable("feasibility_before_policy", f)
 
-    f = subsidies.policy_modifications_of_profit(orca.get_table('feasibility').to_frame(),parcels)
+    f = subsidies.policy_modifications_of_profit(f.copy(), parcels)
 
     # save feasibility table state for summaries
     orca.add_injectable("feasibility_after_policy", f)
@@ -714,8 +736,8 @@ def residential_developer(feasibility, households, buildings, parcels, year,
             parcels.total_residential_units[parcel_mask],
             feasibility,
             year=year,
-            form_to_btype_callback=form_to_btype_func,
-            add_more_columns_callback=add_extra_columns_func,
+            form_to_btype_callback=None,
+            add_more_columns_callback=developer_columns_callback(form_to_btype_func, add_extra_columns_func),
             num_units_to_build=int(target),
             profit_to_prob_func=subsidies.profit_to_prob_func,
             **kwargs)
@@ -765,6 +787,32 @@ def residential_developer(feasibility, households, buildings, parcels, year,
                     new_buildings.loc[index, col] = val * overshoot_pct
 
 
+def _select_to_target(feasibility, bldgs, target):
+    """
+    Take developments in the order of feasibility until the retail sqft
+    target is met.  Each development takes its new non-residential sqft off
+    the target and gives back the retail sqft it redevelops on its parcel,
+    and the development which meets the target is the last one taken.
+
+    Returns the developments taken and the remaining target (which is
+    positive if the target wasn't met).
+    """
+    # redeveloped retail sqft on each candidate's parcel
+    retail = bldgs.non_residential_sqft[bldgs.general_type == 'Retail']
+    retail = retail.groupby(bldgs.parcel_id[bldgs.general_type == 'Retail']).sum()
+    net_sqft = feasibility.non_residential_sqft.values - \
+        retail.reindex(feasibility.parcel_id.values).fillna(0).values
+
+    # a development is taken if the target was still unmet after all the
+    # ones before it - net sqft can be negative so this isn't just a cutoff
+    # on the running total
+    remaining = target - np.concatenate([[0], np.cumsum(net_sqft)])
+    taken = np.logical_and.accumulate(remaining[:-1] > 0)
+    n = int(taken.sum())
+
+    return feasibility.iloc[:n].copy(), remaining[n]
+
+
 @orca.step()
 def retail_developer(jobs, buildings, parcels, nodes, feasibility,
                      developer_settings, summary, add_extra_columns_func, net, year):
@@ -810,33 +858,15 @@ def retail_developer(jobs, buildings, parcels, nodes, feasibility,
     # order by weighted random sample
     feasibility = feasibility.sample(frac=1.0, weights=p)
 
-    bldgs = buildings.to_frame(buildings.local_columns + ["general_type"])
-
-    devs = []
-
-    for dev_id, d in feasibility.iterrows():
-
-        if target <= 0:
-            break
-
-        # any special logic to filter these devs?
-
-        # remove new dev sqft from target
-        target -= d.non_residential_sqft
-
-        # add redeveloped sqft to target
-        filt = "general_type == 'Retail' and parcel_id == %d" % \
-            d["parcel_id"]
-        target += bldgs.query(filt).non_residential_sqft.sum()
+    bldgs = buildings.to_frame(["parcel_id", "non_residential_sqft", "general_type"])
 
-        devs.append(d)
+    devs, target = _select_to_target(feasibility, bldgs, target)
 
     if len(devs) == 0:
         return
 
     # record keeping - add extra columns to match building dataframe
     # add the buidings and demolish old buildings, and add to debug output
-    devs = pd.DataFrame(devs, columns=feasibility.columns)
 
     print("Building {:,} retail sqft in {:,} projects".format(
         devs.non_residential_sqft.sum(), len(devs)))
@@ -940,8 +970,8 @@ def office_developer(feasibility, jobs, buildings, parcels, year,
                 parcels.total_job_spaces[parcel_mask],
                 feasibility,
                 year=year,
-                form_to_btype_callback=form_to_btype_func,
-                add_more_columns_callback=add_extra_columns_func,
+                form_to_btype_callback=None,
+                add_more_columns_callback=developer_columns_callback(form_to_btype_func, add_extra_columns_func),
                 residential=False,
                 num_units_to_build=int(target),
                 profit_to_prob_func=subsidies.profit_to_prob_func,
@@ -1093,12 +1123,12 @@ def static_parcel_proportional_job_allocation(static_parcels):
 
 
 def make_network(name, weight_col, max_distance):
-    st = pd.HDFStore(os.path.join(orca.get_injectable("inputs_dir"), name), "r")
-    nodes, edges = st.nodes, st.edges
-    net = pdna.Network(nodes["x"], nodes["y"], edges["from"], edges["to"],
-                       edges[[weight_col]])
-    net.precompute(max_distance)
-    return net
+    # networks are read through a cache of bundles keyed on the network file's
+    # path, size and modification time, and built once per process for each
+    # weight and distance
+    return network_cache.make_network(
+        os.path.join(orca.get_injectable("inputs_dir"), name), weight_col,
+        max_distance, network_cache.network_cache_dir())
 
 
 def make_network_from_settings(settings):
@@ -1167,7 +1197,7 @@ def neighborhood_vars(net):
     How pandana works: quickly moves along the network, uses the H5 file has openstreet existing year network to run a mini-travel model
     (focusing on pedestrian level), get job counts, etc. along the network.
     """
-    nodes = networks.from_yaml(net["walk"], "accessibility/neighborhood_vars.yaml")
+    nodes = accessibility.from_yaml(net["walk"], "accessibility/neighborhood_vars.yaml")
     nodes = nodes.replace(-np.inf, np.nan)
     nodes = nodes.replace(np.inf, np.nan)
     nodes = nodes.fillna(0)
@@ -1178,7 +1208,7 @@ def neighborhood_vars(net):
 
 @orca.step()
 def regional_vars(net):
-    nodes = networks.from_yaml(net["drive"], "accessibility/regional_vars.yaml")
+    nodes = accessibility.from_yaml(net["drive"], "accessibility/regional_vars.yaml")
     nodes = nodes.fillna(0)
 
     nodes2 = pd.read_csv(os.path.join(orca.get_injectable("inputs_dir"), "accessibility/pandana/regional_poi_distances_v2.csv"),
@@ -1230,7 +1260,7 @@ def price_vars(net):
     corresponding to the "residential_sales_price_sqft" column.
     
     """
-    nodes2 = networks.from_yaml(net["walk"], "accessibility/price_vars.yaml")
+    nodes2 = accessibility.from_yaml(net["walk"], "accessibility/price_vars.yaml")
     nodes2 = nodes2.fillna(0)
     print(nodes2.describe())
     nodes = orca.get_table('nodes')
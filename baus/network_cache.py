@@ -0,0 +1,120 @@
+from __future__ import print_function
+
+import os
+import hashlib
+import pathlib
+import argparse
+
+import numpy as np
+import pandas as pd
+import pandana as pdna
+import yaml
+import orca
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+USAGE = """
+  Prebuilds the cached network bundles for the networks in accessibility_settings.yaml,
+  so that BAUS runs (and every member of an ensemble) start from them.
+
+    python -m baus.network_cache --inputs_dir "M:/urban_modeling/baus/BAUS Inputs"
+
+"""
+
+# networks built in this process, keyed on the bundle they were built from
+# and the precompute distance - the pois preprocessing steps and the net
+# injectable share them rather than each building their own
+_NETWORKS = {}
+
+
+def network_cache_dir():
+    run_setup = orca.get_injectable("run_setup") if orca.is_injectable("run_setup") else {}
+    return pathlib.Path(run_setup.get("network_cache_dir") or
+                        os.path.join(orca.get_injectable("inputs_dir"), "accessibility", "pandana", "network_cache"))
+
+
+def file_key(path):
+    """
+    A short key for the version of the file at path, from its resolved
+    path, size and modification time, so it can be checked without reading
+    the file.
+    """
+    path = pathlib.Path(path).resolve()
+    st = path.stat()
+    h = hashlib.blake2b("{}|{}|{}".format(path, st.st_size, st.st_mtime_ns).encode("utf-8"), digest_size=16)
+    return h.hexdigest()
+
+
+def network_bundle(path, weight_col, cache_dir):
+    """
+    Read the nodes and edges of a network h5, going through a cache of
+    bundles holding just the arrays pandana needs.  Bundles are named after
+    the weight column and a hash of the h5's path, size and modification
+    time, so a changed network never picks up a stale bundle and finding
+    the bundle doesn't read the h5.
+
+    Returns
+    -------
+    nodes, edges : pandas.DataFrame
+    """
+    path = pathlib.Path(path)
+    cache_dir = pathlib.Path(cache_dir)
+    bundle_path = cache_dir / "{}_{}_{}.npz".format(path.stem, weight_col, file_key(path))
+
+    if bundle_path.exists():
+        logger.info("Reading network bundle {}".format(bundle_path))
+        with np.load(bundle_path, allow_pickle=False) as b:
+            nodes = pd.DataFrame({"x": b["x"], "y": b["y"]}, index=pd.Index(b["node_id"], name=str(b["node_index_name"])))
+            edges = pd.DataFrame({"from": b["from"], "to": b["to"], weight_col: b["weight"]})
+        return nodes, edges
+
+    with pd.HDFStore(path, "r") as st:
+        nodes, edges = st.nodes, st.edges
+    nodes = nodes[["x", "y"]]
+    edges = edges[["from", "to", weight_col]]
+
+    logger.info("Writing network bundle {}".format(bundle_path))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # write to a temporary name so concurrent runs never read a partial file
+    tmp_path = bundle_path.with_suffix(".{}.tmp.npz".format(os.getpid()))
+    np.savez(tmp_path, node_id=nodes.index.values, node_index_name=str(nodes.index.name or "node_id"),
+             x=nodes.x.values, y=nodes.y.values, weight=edges[weight_col].values,
+             **{"from": edges["from"].values, "to": edges["to"].values})
+    os.replace(tmp_path, bundle_path)
+
+    return nodes, edges
+
+
+def make_network(path, weight_col, max_distance, cache_dir):
+    """
+    Build the pandana network for an h5 and precompute it to max_distance,
+    reusing a network already built in this process for the same inputs.
+    """
+    key = (str(pathlib.Path(path).resolve()), weight_col, max_distance)
+    if key not in _NETWORKS:
+        nodes, edges = network_bundle(path, weight_col, cache_dir)
+        net = pdna.Network(nodes["x"], nodes["y"], edges["from"], edges["to"],
+                           edges[[weight_col]])
+        net.precompute(max_distance)
+        _NETWORKS[key] = net
+    return _NETWORKS[key]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs_dir", required=True, help="BAUS inputs directory")
+    parser.add_argument("--accessibility_settings", default="configs/accessibility/accessibility_settings.yaml")
+    parser.add_argument("--cache_dir", default=None, help="defaults to accessibility/pandana/network_cache in the inputs")
+    args = parser.parse_args()
+
+    with open(args.accessibility_settings) as f:
+        build_networks = yaml.safe_load(f)["build_networks"]
+    cache_dir = args.cache_dir or os.path.join(args.inputs_dir, "accessibility", "pandana", "network_cache")
+
+    for key, settings in build_networks.items():
+        print("Bundling {} network {}".format(key, settings["name"]))
+        network_bundle(os.path.join(args.inputs_dir, settings["name"]),
+                       settings.get("weight_col", "weight"), cache_dir)
@@ -0,0 +1,199 @@
+from __future__ import print_function
+
+import time
+import atexit
+import pathlib
+import threading
+import queue
+
+import orca
+import pandas as pd
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# file suffixes for the compression pandas can write
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "bz2": ".bz2", "zip": ".zip", "xz": ".xz", "zstd": ".zst"}
+
+# formats for the disaggregate tables written with write_table
+TABLE_FORMATS = ["csv", "parquet"]
+
+
+def _for_parquet(df):
+    # string columns are stored as dictionaries - arrow can't write object
+    # columns which mix strings with other types, so those become strings too
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+        df[col] = df[col].astype("category")
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+class OutputWriter(object):
+    """
+    Writes summary CSVs on a background thread so the simulation doesn't wait
+    on the disk.  Frames are copied when they're handed over, so the caller
+    is free to change them afterwards, and at most max_pending frames are
+    waiting to be written at once - past that write_csv blocks until one is
+    done, which bounds the memory held by the copies.
+
+    The disaggregate tables go through write_table, which writes them as CSV,
+    optionally compressed, or as zstd compressed Parquet with the string
+    columns dictionary encoded, and are read back with read_table.  Other
+    files keep their .csv names since scripts outside the run read them.
+
+    The first failed write is raised from the next call to write_csv, flush
+    or close.  Anything still waiting is written when the interpreter exits.
+
+    Parameters
+    ----------
+    background : bool, optional
+        If False the frames are written right away on the calling thread
+    compression : str, optional
+        Compression for the disaggregate tables written as CSV, one of
+        COMPRESSION_SUFFIXES, which also gets added to their file names
+    max_pending : int, optional
+        Number of frames which can be waiting to be written
+    table_format : str, optional
+        Format of the tables written with write_table, one of TABLE_FORMATS
+    """
+    def __init__(self, background=True, compression=None, max_pending=4, table_format="csv"):
+        if compression is not None and compression not in COMPRESSION_SUFFIXES:
+            raise ValueError("Unknown output compression {}".format(compression))
+        if table_format not in TABLE_FORMATS:
+            raise ValueError("Unknown table format {}".format(table_format))
+        self.background = background
+        self.compression = compression
+        self.table_format = table_format
+        self.files_written = 0
+        self.write_seconds = 0.
+        self.wait_seconds = 0.
+        self._error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="output_writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def write_csv(self, df, path, **kwargs):
+        """
+        Write df to path with DataFrame.to_csv(**kwargs), in the background
+        when the writer has a background thread.
+        """
+        path = pathlib.Path(path)
+        self._put("to_csv", df, path, kwargs)
+        return path
+
+    def table_path(self, path):
+        """
+        The name a table handed to write_table as path (a .csv name) is
+        written under.
+        """
+        path = pathlib.Path(path)
+        if self.table_format == "parquet":
+            return path.with_suffix(".parquet")
+        if self.compression is not None:
+            return path.with_name(path.name + COMPRESSION_SUFFIXES[self.compression])
+        return path
+
+    def write_table(self, df, path, index=True):
+        """
+        Write a disaggregate table in the writer's table_format.  Parquet
+        files get the index as a column, so they have the same columns as
+        the CSV.
+        """
+        path = self.table_path(path)
+        if self.table_format == "csv":
+            self._put("to_csv", df, path, {"index": index, "compression": self.compression})
+            return path
+
+        df = _for_parquet(df.reset_index() if index else df)
+        self._put("to_parquet", df, path, {"index": False, "compression": "zstd"}, copy=False)
+        return path
+
+    def read_table(self, path, index_col=None):
+        """
+        Read back a table written with write_table, with the same columns
+        and types as reading the CSV.
+        """
+        self.flush()
+        path = self.table_path(path)
+        if self.table_format == "csv":
+            return pd.read_csv(path, index_col=index_col)
+
+        df = pd.read_parquet(path)
+        for col in df.columns[df.dtypes == "category"]:
+            df[col] = df[col].astype(object)
+        return df.set_index(index_col) if index_col is not None else df
+
+    def _put(self, method, df, path, kwargs, copy=True):
+        self._raise_error()
+        if not self.background or not self._thread.is_alive():
+            self._write(method, df, path, kwargs)
+            return
+
+        t0 = time.time()
+        self._queue.put((method, df.copy() if copy else df, path, kwargs))
+        self.wait_seconds += time.time() - t0
+
+    def _write(self, method, df, path, kwargs):
+        t0 = time.time()
+        getattr(df, method)(path, **kwargs)
+        elapsed = time.time() - t0
+        self.files_written += 1
+        self.write_seconds += elapsed
+        logger.info("Wrote {} ({:,} rows) in {:.2f}s".format(path.name, len(df), elapsed))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logger.exception("Writing {} failed".format(item[2]))
+                if self._error is None:
+                    self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def flush(self):
+        """
+        Wait for everything handed to write_csv so far to be written.
+        """
+        if self.background:
+            t0 = time.time()
+            self._queue.join()
+            self.wait_seconds += time.time() - t0
+        self._raise_error()
+
+    def close(self):
+        """
+        Write what's left, stop the background thread and log the time
+        spent writing.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+            self._queue.put(None)
+            self._thread.join()
+            logger.info("Output writer wrote {} files in {:.2f}s, the simulation waited {:.2f}s on it".format(
+                self.files_written, self.write_seconds, self.wait_seconds))
+        self._raise_error()
+
+
+@orca.injectable("output_writer", cache=True)
+def output_writer(run_setup):
+    return OutputWriter(background=run_setup.get("background_output_writer", True),
+                        compression=run_setup.get("output_compression", None),
+                        table_format=run_setup.get("disaggregate_output_format", "csv"))
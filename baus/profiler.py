@@ -0,0 +1,161 @@
+from __future__ import print_function
+
+import sys
+import time
+import pathlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import orca
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# the agent and supply tables whose sizes are tracked around every step
+PROFILED_TABLES = ["households", "jobs", "buildings", "residential_units"]
+
+
+def _peak_rss_mb():
+    # peak resident set size of this process in MB - resource is not
+    # available on Windows, where psutil reports the peak working set
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # linux reports kilobytes, macOS reports bytes
+        return peak / 1024.0 / (1024.0 if sys.platform == "darwin" else 1.0)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        mem = psutil.Process().memory_info()
+        return getattr(mem, "peak_wset", mem.rss) / 1024.0 / 1024.0
+    except ImportError:
+        return np.nan
+
+
+def _loaded_table_len(name):
+    # only count rows of tables that are already in memory, so that the
+    # profiler never triggers (and gets charged for) reading from the store
+    if not orca.is_table(name):
+        return np.nan
+    table = orca.get_table(name)
+    if isinstance(table, orca.DataFrameWrapper) or name in orca.orca._TABLE_CACHE:
+        return len(table)
+    return np.nan
+
+
+class _ProfiledStep(object):
+    """
+    Stands in for an orca step wrapper so that every call to the step,
+    whether from orca.run or orca.eval_step, is recorded by the profiler.
+    """
+    def __init__(self, step, profiler):
+        self._step = step
+        self._profiler = profiler
+
+    def __call__(self):
+        with self._profiler.record(self._step.name):
+            return self._step()
+
+    def __getattr__(self, name):
+        return getattr(self._step, name)
+
+
+class StepProfiler(object):
+    """
+    Records wall time, CPU time, peak memory and the size of the main agent
+    and supply tables around each orca step.
+
+    Parameters
+    ----------
+    outputs_dir : str or pathlib.Path
+        Directory the step timeline is written to
+    tables : list of str, optional
+        Tables whose row counts are recorded before and after each step
+    """
+    def __init__(self, outputs_dir, tables=PROFILED_TABLES):
+        self.outputs_dir = pathlib.Path(outputs_dir)
+        self.tables = tables
+        self.records = []
+        self._depth = 0
+
+    def install(self, step_names):
+        """
+        Wrap the named orca steps so that they are profiled when run.
+        """
+        for name in step_names:
+            step = orca.get_step(name)
+            if not isinstance(step, _ProfiledStep):
+                orca.orca._STEPS[name] = _ProfiledStep(step, self)
+
+    @contextmanager
+    def record(self, step_name):
+        year = orca.get_injectable("iter_var") if orca.is_injectable("iter_var") else None
+        rows_before = {t: _loaded_table_len(t) for t in self.tables}
+        rss_before = _peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        # steps run by other steps (e.g. alt_feasibility via eval_step) are
+        # recorded too - depth tells them apart from the top level steps
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            rec = {
+                "year": year,
+                "step": step_name,
+                "depth": self._depth,
+                "wall_time": time.perf_counter() - wall,
+                "cpu_time": time.process_time() - cpu,
+                "peak_rss_mb": _peak_rss_mb()
+            }
+            rec["peak_rss_delta_mb"] = rec["peak_rss_mb"] - rss_before
+            for t in self.tables:
+                rec[t + "_before"] = rows_before[t]
+                rec[t + "_after"] = _loaded_table_len(t)
+            self.records.append(rec)
+            logger.debug("profile: year={} step={} wall={:.2f}s cpu={:.2f}s peak_rss={:,.0f}MB".format(
+                year, step_name, rec["wall_time"], rec["cpu_time"], rec["peak_rss_mb"]))
+
+    def timeline(self):
+        return pd.DataFrame(self.records)
+
+    def write(self):
+        """
+        Write the timeline of all recorded steps to step_profile.csv in
+        the outputs directory and return its path.
+        """
+        self.outputs_dir.mkdir(parents=True, exist_ok=True)
+        path = self.outputs_dir / "step_profile.csv"
+        self.timeline().to_csv(path, index=False)
+        return path
+
+    def report(self, top=20):
+        """
+        Log the top level steps ranked by their total wall time over all
+        years, along with time per simulation year.
+        """
+        df = self.timeline()
+        if len(df) == 0:
+            return
+        df = df[df.depth == 0]
+
+        by_step = df.groupby("step").agg(
+            calls=("wall_time", "size"),
+            wall_time=("wall_time", "sum"),
+            cpu_time=("cpu_time", "sum"),
+            max_wall_time=("wall_time", "max"),
+            max_peak_rss_delta_mb=("peak_rss_delta_mb", "max"))
+        by_step = by_step.sort_values("wall_time", ascending=False)
+        by_step["pct_wall_time"] = by_step.wall_time / by_step.wall_time.sum() * 100
+
+        logger.info("Hot steps by total wall time:\n{}".format(
+            by_step.head(top).round(2).to_string()))
+        if df.year.notnull().any():
+            logger.info("Wall time by year:\n{}".format(
+                df.groupby("year").wall_time.sum().round(2).to_string()))
+        return by_step
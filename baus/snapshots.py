@@ -0,0 +1,103 @@
+from __future__ import print_function
+
+import pathlib
+
+import orca
+import pandas as pd
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+
+class YearSnapshots(object):
+    """
+    Keeps copies of the summary tables written in the years the growth
+    summaries compare, so the growth steps can diff them without reading
+    back the CSVs the run just wrote.
+
+    The snapshots come back the way pandas.read_csv would return the file
+    written from the frame - with the index as a column, or as the index if
+    index_col names it.  String columns are kept as categoricals while
+    they're held.  With a spill_dir they are kept in Feather files there
+    and memory mapped when they're read, instead of in memory - this needs
+    pyarrow, without it the snapshots stay in memory.
+
+    Parameters
+    ----------
+    years : list
+        The years to keep snapshots for, other years are ignored
+    spill_dir : str or pathlib.Path, optional
+        Directory for spill files
+    """
+    def __init__(self, years, spill_dir=None):
+        self.years = set(years)
+        self.spill_dir = pathlib.Path(spill_dir) if spill_dir is not None else None
+        if self.spill_dir is not None:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logger.warning("pyarrow isn't installed, keeping the year snapshots in memory")
+                self.spill_dir = None
+        self._snapshots = {}
+
+    def _spill_path(self, name, year):
+        return self.spill_dir / "{}_{}.feather".format(name, year)
+
+    def put(self, name, year, df):
+        """
+        Keep a copy of df, the frame written to the CSV for name in year.
+        """
+        if year not in self.years:
+            return
+        # the index is written as a column, named the way read_csv names it
+        unnamed = df.index.name is None
+        df = df.reset_index()
+        if unnamed:
+            df = df.rename(columns={df.columns[0]: "Unnamed: 0"})
+        strings = [c for c in df.columns[df.dtypes == object]
+                   if pd.api.types.infer_dtype(df[c], skipna=True) == "string"]
+        if strings:
+            df[strings] = df[strings].astype("category")
+
+        if self.spill_dir is None:
+            self._snapshots[(name, year)] = (df, strings)
+            return
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        df.columns = [str(c) for c in df.columns]
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), self._spill_path(name, year),
+                              compression="uncompressed")
+        self._snapshots[(name, year)] = (None, strings)
+
+    def get(self, name, year, read=None, index_col=None):
+        """
+        The snapshot of name in year, as a new frame the caller can change.
+        If there's no snapshot (e.g. the run started from a checkpoint after
+        that year) read is called to read the file instead.
+        """
+        if (name, year) not in self._snapshots:
+            if read is None:
+                raise KeyError("No snapshot of {} for {}".format(name, year))
+            logger.info("No snapshot of {} for {}, reading it back".format(name, year))
+            return read()
+
+        df, strings = self._snapshots[(name, year)]
+        if df is None:
+            import pyarrow.feather as feather
+            df = feather.read_table(self._spill_path(name, year), memory_map=True).to_pandas()
+        else:
+            df = df.copy()
+        if strings:
+            df[strings] = df[strings].astype(object)
+        return df.set_index(index_col) if index_col is not None else df
+
+
+@orca.injectable("year_snapshots", cache=True)
+def year_snapshots(run_setup, initial_summary_year, final_year, outputs_dir):
+    years = [initial_summary_year, final_year] if run_setup.get("year_snapshots", True) else []
+    spill_dir = pathlib.Path(outputs_dir) / "snapshots" if run_setup.get("spill_year_snapshots", False) else None
+    return YearSnapshots(years, spill_dir)
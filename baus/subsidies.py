@@ -2,6 +2,7 @@ from __future__ import print_function
 
 import sys
 import time
+import pathlib
 import orca
 import pandas as pd
 import numpy as np
@@ -10,7 +11,8 @@ from urbansim import accounts
 from urbansim_defaults import utils
 from six import StringIO
 from urbansim.utils import misc
-from baus.utils import add_buildings
+from baus import feasibility as baus_feasibility, ledger
+from baus.utils import add_buildings, developer_columns_callback
 from urbansim.developer import sqftproforma
 
 import logging
@@ -41,26 +43,50 @@ def profit_to_prob_func(df):
 
 @orca.injectable(cache=True)
 def coffer(account_strategies, run_setup):
+    # the columnar ledger keeps balances without rescanning the transactions
+    # and can be written out for analysis after the run
+    Account = ledger.Ledger if run_setup.get("columnar_ledger", False) else accounts.Account
+
     d = {
-        "vmt_res_acct":  accounts.Account("vmt_res_acct"),
-        "vmt_com_acct":  accounts.Account("vmt_com_acct")
+        "vmt_res_acct":  Account("vmt_res_acct"),
+        "vmt_com_acct":  Account("vmt_com_acct")
     }
 
     if run_setup["run_housing_bond_strategy"]:
         for key, acct in account_strategies["acct_settings"]["lump_sum_accounts"].items():
-            d[acct["name"]] = accounts.Account(acct["name"])
+            d[acct["name"]] = Account(acct["name"])
 
     if run_setup["run_office_bond_strategy"]:
         for key, acct in account_strategies["acct_settings"]["office_lump_sum_accounts"].items():
-            d[acct["name"]] = accounts.Account(acct["name"])    
+            d[acct["name"]] = Account(acct["name"])    
     
     if run_setup["run_jobs_housing_fee_strategy"]:
         for key, acct in account_strategies["acct_settings"]["jobs_housing_fee_settings"].items():
-            d[acct["name"]] = accounts.Account(acct["name"])
+            d[acct["name"]] = Account(acct["name"])
 
     return d
 
 
+@orca.step()
+def coffer_ledgers(coffer):
+    # write each account's transactions so far, overwriting the previous year's
+    ledger_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "ledgers"
+    ledger_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        import pyarrow  # noqa: F401
+        parquet = True
+    except ImportError:
+        logger.warning("pyarrow isn't installed, writing the ledgers as CSV")
+        parquet = False
+    for name, acct in coffer.items():
+        if not isinstance(acct, ledger.Ledger):
+            continue
+        if parquet:
+            acct.to_parquet(ledger_dir / ("%s.parquet" % name))
+        else:
+            acct.to_csv(ledger_dir / ("%s.csv" % name))
+
+
 @orca.step()
 def preserve_affordable(year, base_year, preservation, residential_units, taz_geography,
                         buildings, parcels_geography, initial_summary_year):
@@ -510,6 +536,37 @@ def calculate_jobs_housing_fees(account_strategies, year, coffer, summary, years
         coffer[acct["name"]].add_transaction(total_fees, subaccount=acct["name"], metadata=metadata, logger=logger)
 
 
+def allocate_in_order(amounts, budget):
+    """
+    Fund the amounts in order, skipping any that can't be afforded from
+    what is left of the budget, and return a boolean array of those funded.
+
+    This is the same as walking the amounts one at a time, but works through
+    runs of affordable amounts at once - every amount up to where the running
+    total first exceeds the budget is funded, then everything after that
+    which no longer fits in what's left is dropped, and the scan continues
+    from there.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    funded = np.zeros(len(amounts), dtype=bool)
+    candidates = np.flatnonzero(amounts <= budget)
+
+    while len(candidates):
+        left = budget - np.cumsum(amounts[candidates])
+        over = left < 0
+        if not over.any():
+            funded[candidates] = True
+            break
+        # every candidate fits in the budget, so at least the first is funded
+        n = np.argmax(over)
+        funded[candidates[:n]] = True
+        budget = left[n - 1]
+        rest = candidates[n + 1:]
+        candidates = rest[amounts[rest] <= budget]
+
+    return funded
+
+
 #@orca.step()
 def subsidized_office_developer(feasibility, coffer, formula, year, add_extra_columns_func, buildings, summary, coffer_acct_name):
 
@@ -538,51 +595,39 @@ def subsidized_office_developer(feasibility, coffer, formula, year, add_extra_co
 
     print("%.0f subsidy with %d developments to choose from" % (total_subsidy, len(feasibility)))
 
-    devs = []
-
-    for dev_id, d in feasibility.iterrows():
-
-        # the logic here is that we allow each dev to have a "normal"
-        # profit per square foot and once it does we guarantee that it
-        # gets build - we assume the planning commission for each city
-        # enables this to happen.  If a project gets enough profit already
-        # we just allow it to compete on the open market - e.g. in the
-        # non-subsidized office developer
-
-        NORMAL_PROFIT_PER_SQFT = 70  # assume price is around $700/sqft
-
-        if d.max_profit_per_sqft >= NORMAL_PROFIT_PER_SQFT:
-            #  competes in open market
-            continue
-        else:
-            amt = (NORMAL_PROFIT_PER_SQFT - d.max_profit_per_sqft) * d.non_residential_sqft
-
-            if amt > total_subsidy:
-                # we don't have enough money to buy yet
-                continue
-
-        metadata = {
-            "description": "Developing subsidized office building",
-            "year": year,
-            "non_residential_sqft": d["non_residential_sqft"],
-            "juris": d["juris"],
-            "tra_id": d["tra_id"],
-            "parcel_id": d["parcel_id"],
-            "index": dev_id
-        }
+    # the logic here is that we allow each dev to have a "normal"
+    # profit per square foot and once it does we guarantee that it
+    # gets build - we assume the planning commission for each city
+    # enables this to happen.  If a project gets enough profit already
+    # we just allow it to compete on the open market - e.g. in the
+    # non-subsidized office developer
 
-        coffer[coffer_acct_name].add_transaction(-1*amt, subaccount="regional", metadata=metadata, logger=logger)
+    NORMAL_PROFIT_PER_SQFT = 70  # assume price is around $700/sqft
 
-        total_subsidy -= amt
+    # competes in open market
+    feasibility = feasibility[feasibility.max_profit_per_sqft < NORMAL_PROFIT_PER_SQFT]
+    amts = ((NORMAL_PROFIT_PER_SQFT - feasibility.max_profit_per_sqft) * feasibility.non_residential_sqft).values
 
-        devs.append(d)
+    funded = allocate_in_order(amts, total_subsidy)
+    devs = feasibility[funded]
+    amts = amts[funded]
 
     if len(devs) == 0:
         return
 
+    metadata = devs[["non_residential_sqft", "juris", "tra_id", "parcel_id"]].assign(
+        description="Developing subsidized office building", year=year, index=devs.index)
+    acct = coffer[coffer_acct_name]
+    if isinstance(acct, ledger.Ledger):
+        acct.add_batch(-1*amts, subaccount="regional", metadata=metadata)
+    else:
+        acct.add_transactions((-1*amt, "regional", m) for amt, m in zip(amts, metadata.to_dict("records")))
+
+    total_subsidy -= amts.sum()
+
     # record keeping - add extra columns to match building dataframe
     # add the buidings and demolish old buildings, and add to debug output
-    devs = pd.DataFrame(devs, columns=feasibility.columns)
+    devs = devs.copy()
 
     print("Building {:,} subsidized office sqft in {:,} projects".format(
         devs.non_residential_sqft.sum(), len(devs)))
@@ -594,6 +639,26 @@ def subsidized_office_developer(feasibility, coffer, formula, year, add_extra_co
     add_buildings(buildings, devs)
 
 
+def subsidized_deed_restricted_units(new_buildings):
+    """
+    The deed restricted units in each subsidized building - the units it
+    already has plus the units its subsidy buys at the building's revenue
+    per unit, capped at its residential units.
+
+    Partial units are carried from building to building so that we always
+    get credit for a partial unit, even if it's not built in the building
+    where it was bought - the whole units bought by a building are the whole
+    units the running total of units bought crosses.
+    """
+    revenue_per_unit = new_buildings.building_revenue / new_buildings.residential_units
+    bought = (new_buildings.max_profit.abs() / revenue_per_unit).cumsum().values
+    whole = np.diff(np.floor(bought), prepend=0)
+
+    subsidized_units = np.minimum(whole + new_buildings.deed_restricted_units.values,
+                                  new_buildings.residential_units.values)
+    return pd.Series(np.round(subsidized_units).astype(int), index=new_buildings.index)
+
+
 def run_subsidized_developer(feasibility, parcels, buildings, households, acct_settings, developer_settings, account, year, form_to_btype_func, 
                              add_extra_columns_func, summary, create_deed_restricted=False, policy_name="Unnamed"):
     """
@@ -732,8 +797,8 @@ def run_subsidized_developer(feasibility, parcels, buildings, households, acct_s
             parcels.total_residential_units,
             orca.DataFrameWrapper("feasibility", df),
             year=year,
-            form_to_btype_callback=form_to_btype_func,
-            add_more_columns_callback=add_extra_columns_func,
+            form_to_btype_callback=None,
+            add_more_columns_callback=developer_columns_callback(form_to_btype_func, add_extra_columns_func),
             profit_to_prob_func=profit_to_prob_func,
             **kwargs)
         buildings = orca.get_table("buildings")
@@ -741,50 +806,26 @@ def run_subsidized_developer(feasibility, parcels, buildings, households, acct_s
         if new_buildings is None:
             continue
 
-        # keep track of partial subsidized untis so that we always get credit
-        # for a partial unit, even if it's not built in this specific building
-        partial_subsidized_units = 0
-
         # step 10
-        for index, new_building in new_buildings.iterrows():
-
-            amt = new_building.max_profit
-            metadata = {
-                "description": "Developing subsidized building",
-                "year": year,
-                "residential_units": new_building.residential_units,
-                "inclusionary_units": new_building.inclusionary_units,
-                "building_id": index
-            }
-
-            if create_deed_restricted:
-
-                revenue_per_unit = new_building.building_revenue / new_building.residential_units
-                total_subsidy = abs(new_building.max_profit)
-                subsidized_units = total_subsidy / revenue_per_unit + partial_subsidized_units
-                # right now there are inclusionary requirements
-                already_subsidized_units = new_building.deed_restricted_units
-
-                # get remainder
-                partial_subsidized_units = subsidized_units % 1
-                # round off for now
-                subsidized_units = int(subsidized_units) + already_subsidized_units
-                # cap at number of residential units
-                subsidized_units = min(subsidized_units, new_building.residential_units)
-
-                buildings.local.loc[index, "deed_restricted_units"] = int(round(subsidized_units))
-
-                buildings.local.loc[index, "subsidized_units"] = buildings.local.loc[index, "deed_restricted_units"] - \
-                    buildings.local.loc[index, "inclusionary_units"]
-
-                # also correct the debug output
-                new_buildings.loc[index, "deed_restricted_units"] = int(round(subsidized_units))
-                new_buildings.loc[index, "subsidized_units"] = new_buildings.loc[index, "deed_restricted_units"] - \
-                    new_buildings.loc[index, "inclusionary_units"]
-
-            metadata['deed_restricted_units'] = new_buildings.loc[index, 'deed_restricted_units']
-            metadata['subsidized_units'] = new_buildings.loc[index, 'subsidized_units']
-            account.add_transaction(amt, subaccount=subacct, metadata=metadata,  logger=logger)
+        if create_deed_restricted:
+            deed_restricted_units = subsidized_deed_restricted_units(new_buildings)
+
+            buildings.local.loc[new_buildings.index, "deed_restricted_units"] = deed_restricted_units.values
+            buildings.local.loc[new_buildings.index, "subsidized_units"] = deed_restricted_units.values - \
+                buildings.local.loc[new_buildings.index, "inclusionary_units"].values
+
+            # also correct the debug output
+            new_buildings["deed_restricted_units"] = deed_restricted_units
+            new_buildings["subsidized_units"] = new_buildings.deed_restricted_units - new_buildings.inclusionary_units
+
+        metadata = new_buildings[["residential_units", "inclusionary_units", "deed_restricted_units",
+                                  "subsidized_units"]].assign(
+            description="Developing subsidized building", year=year, building_id=new_buildings.index)
+        if isinstance(account, ledger.Ledger):
+            account.add_batch(new_buildings.max_profit.values, subaccount=subacct, metadata=metadata)
+        else:
+            account.add_transactions((amt, subacct, m) for amt, m in
+                                     zip(new_buildings.max_profit.values, metadata.to_dict("records")))
 
         # turn off this assertion for the Draft Blueprint affordable housing policy since the number of deed restricted units
         # vs units from development projects looks reasonable
@@ -822,13 +863,11 @@ def subsidized_residential_feasibility(parcels, developer_settings, parcel_sales
     config.cap_rate = developer_settings["cap_rate"]
 
     # step 1
-    utils.run_feasibility(parcels,
-                          parcel_sales_price_sqft_func,
-                          parcel_is_allowed_func,
-                          config=config,
-                          **kwargs)
-
-    feasibility = orca.get_table("feasibility").to_frame()
+    feasibility = baus_feasibility.run_feasibility("subsidized", parcels,
+                                                   parcel_sales_price_sqft_func,
+                                                   parcel_is_allowed_func,
+                                                   config=config,
+                                                   **kwargs)
     # get rid of the multiindex that comes back from feasibility
     feasibility = feasibility.stack(level=0).reset_index(level=1, drop=True)
     # join to parcels_geography for filtering
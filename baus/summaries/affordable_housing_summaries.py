@@ -11,13 +11,13 @@ import logging
 logger = logging.getLogger(__name__)
 
 @orca.step()
-def deed_restricted_units_summary(run_name, parcels, buildings, year, initial_summary_year, final_year, superdistricts_geography):
+def deed_restricted_units_summary(run_name, parcels, buildings, year, initial_summary_year, final_year, superdistricts_geography, summary_frames, year_snapshots):
 
     if year != initial_summary_year and year != final_year:
         return
 
     # get buldings table and geography columns to tally deed restricted (dr) units
-    buildings = orca.merge_tables('buildings', [parcels, buildings],
+    buildings = summary_frames.merge('buildings', [parcels, buildings],
                 columns=['juris', 'superdistrict', 'county', 'residential_units',
                         'deed_restricted_units', 'preserved_units', 'inclusionary_units', 'subsidized_units', 'source'])
     
@@ -94,11 +94,13 @@ def deed_restricted_units_summary(run_name, parcels, buildings, year, initial_su
 
         affhousum_output_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "affordable_housing_summaries"
         affhousum_output_dir.mkdir(parents=True, exist_ok=True)
-        summary_table.fillna(0).to_csv(affhousum_output_dir / f"{geography}_dr_summary_{year}.csv")
+        summary_table = summary_table.fillna(0)
+        summary_table.to_csv(affhousum_output_dir / f"{geography}_dr_summary_{year}.csv")
+        year_snapshots.put(f"{geography}_dr_summary", year, summary_table)
         
 
 @orca.step()
-def deed_restricted_units_growth_summary(year, initial_summary_year, final_year, run_name):
+def deed_restricted_units_growth_summary(year, initial_summary_year, final_year, run_name, year_snapshots):
     
     if year != final_year: 
         return
@@ -109,8 +111,10 @@ def deed_restricted_units_growth_summary(year, initial_summary_year, final_year,
 
         # use 2015 as the base year
         ahs_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "affordable_housing_summaries"
-        year1 = pd.read_csv(ahs_dir / f"{geography}_dr_summary_{initial_summary_year}.csv")
-        year2 = pd.read_csv(ahs_dir / f"{geography}_dr_summary_{final_year}.csv")
+        year1 = year_snapshots.get(f"{geography}_dr_summary", initial_summary_year,
+            read=lambda: pd.read_csv(ahs_dir / f"{geography}_dr_summary_{initial_summary_year}.csv"))
+        year2 = year_snapshots.get(f"{geography}_dr_summary", final_year,
+            read=lambda: pd.read_csv(ahs_dir / f"{geography}_dr_summary_{final_year}.csv"))
 
         dr_growth = year1.merge(year2, on=geography, suffixes=("_"+str(initial_summary_year), "_"+str(final_year)))
         
@@ -11,7 +11,7 @@ logger = logging.getLogger(__name__)
 
 @orca.step()
 def disaggregate_output(parcels, buildings, residential_units, households, jobs, static_parcels,
-                        year, initial_summary_year, final_year, interim_summary_years):
+                        year, initial_summary_year, final_year, interim_summary_years, summary_frames, output_writer, year_snapshots):
     """
     This outputs disaggregate tables at the end of specified simulation years.
     The disaggregate tables output are:
@@ -21,6 +21,8 @@ def disaggregate_output(parcels, buildings, residential_units, households, jobs,
     * household_table_{year}.csv
     * job_table_{year}.csv
     * static_parcels_{year}.csv
+    The first five are written as .parquet files instead when
+    disaggregate_output_format is parquet in run_setup.
     """
     if year not in [initial_summary_year, final_year] + interim_summary_years:
         return
@@ -40,20 +42,21 @@ def disaggregate_output(parcels, buildings, residential_units, households, jobs,
         df[col] = building_df.groupby('parcel_id')[col].sum()
 
     # add households by quartile on each parcel
-    households_df = orca.merge_tables('households', [buildings, households], columns=['parcel_id', 'base_income_quartile'])
+    households_df = summary_frames.merge('households', [buildings, households], columns=['parcel_id', 'base_income_quartile'])
     for i in range(1, 5):
         df['hhq%d' % i] = households_df[households_df.base_income_quartile == i].parcel_id.value_counts()
     df["tothh"] = households_df.groupby('parcel_id').size()
 
     # add jobs by empsix category on each parcel
-    jobs_df = orca.merge_tables('jobs', [buildings, jobs], columns=['parcel_id', 'empsix'])
+    jobs_df = summary_frames.merge('jobs', [buildings, jobs], columns=['parcel_id', 'empsix'])
     for cat in jobs_df.empsix.unique():
         df[cat] = jobs_df[jobs_df.empsix == cat].parcel_id.value_counts()
     df["totemp"] = jobs_df.groupby('parcel_id').size()
 
     df = df.fillna(0)
 
-    df.to_csv(coresum_output_dir / f"parcel_table_{year}.csv")
+    output_writer.write_table(df, coresum_output_dir / f"parcel_table_{year}.csv")
+    year_snapshots.put("parcel_table", year, df)
 
     ####### disaggregate building output
     df = orca.merge_tables('buildings',
@@ -63,7 +66,8 @@ def disaggregate_output(parcels, buildings, residential_units, households, jobs,
                  'preserved_units', 'subsidized_units', 'job_spaces', 'vacant_job_spaces', 'source'])
 
     df = df.fillna(0)
-    df.to_csv(coresum_output_dir / f"building_table_{year}.csv")
+    output_writer.write_table(df, coresum_output_dir / f"building_table_{year}.csv")
+    year_snapshots.put("building_table", year, df)
 
     ####### disaggregate residential_units output
     resunits_df = residential_units.to_frame(columns=[
@@ -73,7 +77,7 @@ def disaggregate_output(parcels, buildings, residential_units, households, jobs,
     resunits_df.index.rename('unit_id', inplace=True)
     resunits_df = resunits_df.reset_index()
 
-    resunits_df.to_csv(coresum_output_dir / f"residential_units_table_{year}.csv", index=False)
+    output_writer.write_table(resunits_df, coresum_output_dir / f"residential_units_table_{year}.csv", index=False)
 
     ####### disaggregate household output
     households_df = households.to_frame(columns=[
@@ -83,13 +87,13 @@ def disaggregate_output(parcels, buildings, residential_units, households, jobs,
     households_df.index.rename('household_id', inplace=True)
     households_df = households_df.reset_index()
 
-    households_df.to_csv(coresum_output_dir / f"household_table_{year}.csv", index=False)
+    output_writer.write_table(households_df, coresum_output_dir / f"household_table_{year}.csv", index=False)
 
     ####### disaggregate jobs output
     jobs_df = jobs.to_frame(columns=['building_id','sector_id','empsix', 'move_in_year'])
     jobs_df.index.rename('job_id', inplace=True)
     jobs_df = jobs_df.reset_index()
-    jobs_df.to_csv(coresum_output_dir / f"job_table_{year}.csv", index=False)
+    output_writer.write_table(jobs_df, coresum_output_dir / f"job_table_{year}.csv", index=False)
 
     ####### static parcels
     # this is either a list or an ndarray depending on when it's called
@@ -97,21 +101,20 @@ def disaggregate_output(parcels, buildings, residential_units, households, jobs,
         type(static_parcels), len(static_parcels)
     ))
     df = pd.DataFrame(data=static_parcels, columns=["parcel_id"])
-    df.to_csv(coresum_output_dir / f"static_parcels_{year}.csv", index=False)
+    output_writer.write_csv(df, coresum_output_dir / f"static_parcels_{year}.csv", index=False)
 
 @orca.step()
-def parcel_growth_summary(year, run_name, initial_summary_year, final_year):
+def parcel_growth_summary(year, run_name, initial_summary_year, final_year, output_writer, year_snapshots):
     
     if year != final_year:
         return
 
     coresum_output_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "core_summaries"
-    initial_parcel_file = coresum_output_dir / f"parcel_table_{initial_summary_year}.csv"
-    print(f"initial_parcel_file resolve:{initial_parcel_file.resolve()} exists:{initial_parcel_file.exists()}")
-
-    df1 = pd.read_csv(initial_parcel_file, index_col="parcel_id")
-    df2 = pd.read_csv(coresum_output_dir / f"parcel_table_{final_year}.csv",
-                      index_col="parcel_id")
+    # the tables are read back only when there's no snapshot of them
+    df1 = year_snapshots.get("parcel_table", initial_summary_year, index_col="parcel_id", read=lambda:
+        output_writer.read_table(coresum_output_dir / f"parcel_table_{initial_summary_year}.csv", index_col="parcel_id"))
+    df2 = year_snapshots.get("parcel_table", final_year, index_col="parcel_id", read=lambda:
+        output_writer.read_table(coresum_output_dir / f"parcel_table_{final_year}.csv", index_col="parcel_id"))
 
     for col in df1.columns:
         if col in ["geom_id", "x", "y","parcel_softsite"]:
@@ -181,7 +184,7 @@ def new_buildings_summary(run_name, parcels, parcels_zoning_calculations, buildi
 
 @orca.step()
 def interim_zone_output(run_name, households, buildings, residential_units, parcels, jobs, zones, year,
-                        parcels_zoning_calculations, initial_summary_year, final_year):
+                        parcels_zoning_calculations, initial_summary_year, final_year, output_writer):
 
     # TODO: currently TAZ, do we want this to be MAZ?
     zones = pd.DataFrame(index=zones.index)
@@ -252,7 +255,7 @@ def interim_zone_output(run_name, households, buildings, residential_units, parc
 
     coresum_output_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "core_summaries"
     coresum_output_dir.mkdir(parents=True, exist_ok=True)
-    zones.to_csv(coresum_output_dir / f"interim_zone_output_{year}.csv")
+    output_writer.write_csv(zones, coresum_output_dir / f"interim_zone_output_{year}.csv")
 
     # now add all interim zone output to a single dataframe
 
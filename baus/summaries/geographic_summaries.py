@@ -1,6 +1,7 @@
 from __future__ import print_function
 
 import pathlib
+import numpy as np
 import orca
 import pandas as pd
 from baus import datasources
@@ -10,7 +11,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 @orca.step()
-def parcel_transitions(parcels, year, initial_summary_year, final_year, run_name):
+def parcel_transitions(parcels, year, initial_summary_year, final_year, run_name, output_writer, year_snapshots):
     """
     This function analyzes changes in building types at the parcel level between two dataframes.
 
@@ -53,16 +54,16 @@ def parcel_transitions(parcels, year, initial_summary_year, final_year, run_name
     
     # if we're already reading disaggregate output files, shouldn't this just be a post-process rather than a model step?
     buildings_start_path = coresum_output_dir / f"building_table_{initial_summary_year}.csv"
-    print(f'Loading {buildings_start_path}')
+    print(f'Loading {output_writer.table_path(buildings_start_path)}')
     
-    buildings_start = pd.read_csv(buildings_start_path, 
-        index_col='building_id')
+    buildings_start = year_snapshots.get("building_table", initial_summary_year, index_col='building_id',
+        read=lambda: output_writer.read_table(buildings_start_path, index_col='building_id'))
     
     buildings_end_path = coresum_output_dir / f"building_table_{final_year}.csv"
-    print(f'Loading {buildings_end_path}')
+    print(f'Loading {output_writer.table_path(buildings_end_path)}')
     
-    buildings_end = pd.read_csv(buildings_end_path, 
-        index_col='building_id')
+    buildings_end = year_snapshots.get("building_table", final_year, index_col='building_id',
+        read=lambda: output_writer.read_table(buildings_end_path, index_col='building_id'))
     
     # assign generalized building type
     buildings_start['building_type_gen'] = buildings_start['building_type'].map(building_type_to_general_type)
@@ -159,21 +160,162 @@ def parcel_transitions(parcels, year, initial_summary_year, final_year, run_name
         out.to_csv(out_path)
 
 
+# the sub-regional summary columns in output order, as (column, table, column
+# to sum or None to count rows, column to pick rows by, values to pick).  a
+# column name with {} makes one column per value of the pick column
+EMPSIX = ['AGREMPN', 'MWTEMPN', 'RETEMPN', 'FPSEMPN', 'HEREMPN', 'OTHEMPN']
+
+GEOGRAPHY_SUMMARY_COLUMNS = (
+    [('tothh', 'households', None, None, None)] +
+    [('hhincq%d' % q, 'households', None, 'base_income_quartile', [q]) for q in [1, 2, 3, 4]] +
+    [('residential_units', 'buildings', 'residential_units', None, None),
+     ('deed_restricted_units', 'buildings', 'deed_restricted_units', None, None),
+     ('sfdu', 'buildings', 'residential_units', 'building_type', ['HS', 'HT']),
+     ('mfdu', 'buildings', 'residential_units', 'building_type', ['HM', 'MR']),
+     ('residential_units_{}', 'buildings', 'residential_units', 'profit_adjustment_tier', None),
+     ('totemp', 'jobs', None, None, None)] +
+    [(empsix, 'jobs', None, 'empsix', [empsix]) for empsix in EMPSIX] +
+    [('transit_hub_jobs', 'jobs', None, 'ec5_cat', ['Transit_Hub']),
+     ('non_residential_sqft', 'buildings', 'non_residential_sqft', None, None),
+     ('non_residential_sqft_office', 'buildings', 'non_residential_sqft', 'building_type', ['OF']),
+     ('job_spaces', 'buildings', 'job_spaces', None, None),
+     ('job_spaces_vacant', 'buildings', 'vacant_job_spaces', None, None),
+     ('job_spaces_office', 'buildings', 'job_spaces', 'building_type', ['OF']),
+     ('job_spaces_office_vacant', 'buildings', 'vacant_job_spaces', 'building_type', ['OF'])])
+
+# sums which are rounded to whole numbers
+GEOGRAPHY_SUMMARY_ROUNDED = ['non_residential_sqft', 'non_residential_sqft_office', 'job_spaces',
+                             'job_spaces_vacant', 'job_spaces_office', 'job_spaces_office_vacant']
+
+
+def _first_seen(codes):
+    # the codes in the order they first show up, the way Series.unique orders
+    # them, and the rows they first show up in
+    seen, first = np.unique(codes, return_index=True)
+    order = np.argsort(first[seen >= 0])
+    return seen[seen >= 0][order], first[seen >= 0][order]
+
+
+def summarize_by_geography(tables, geographies, spec=GEOGRAPHY_SUMMARY_COLUMNS,
+                           rounded=GEOGRAPHY_SUMMARY_ROUNDED):
+    """
+    Compute the columns of spec for each geography.  The geography and pick
+    columns are coded as integers once per table, and every count or sum is a
+    bincount of geography x pick value, so each table is scanned once per
+    geography and sum column rather than once per column.
+
+    The results are the same as grouping the filtered tables one column at a
+    time: rows with a missing geography are dropped from that geography and
+    the ones after it, and geographies with no rows for a column are left out
+    of the column.
+
+    Parameters
+    ----------
+    tables : dict
+        Table name to DataFrame with the geography columns
+    geographies : list
+        The geography columns, in the order they're summarized
+    spec : list, optional
+        (column, table, column to sum or None to count, column to pick rows
+        by, values to pick) for each output column
+
+    Returns
+    -------
+    Generator of (geography, groups, columns) where groups maps each table to
+    the geography values it has rows for and columns is a list of (column
+    name, Series indexed by geography value)
+    """
+    picks = {}
+    for name, table, value, by, values in spec:
+        df = tables[table]
+        if (table, by) not in picks:
+            if by is None:
+                picks[(table, by)] = (np.zeros(len(df), dtype=np.int64), pd.Index([0]))
+            else:
+                # missing values get their own code, after the others
+                codes, uniques = pd.factorize(df[by])
+                uniques = pd.Index(uniques)
+                if (codes < 0).any():
+                    codes = np.where(codes < 0, len(uniques), codes)
+                    uniques = uniques.append(pd.Index([np.nan]))
+                picks[(table, by)] = (codes, uniques)
+
+    valid = {table: np.ones(len(df), dtype=bool) for table, df in tables.items()}
+    for geography in geographies:
+        geo_codes, groups = {}, {}
+        for table, df in tables.items():
+            codes, uniques = pd.factorize(df[geography])
+            valid[table] &= codes >= 0
+            codes = np.where(valid[table], codes, -1)
+            geo_codes[table] = (codes, uniques)
+            groups[table] = pd.Index(uniques[_first_seen(codes)[0]])
+
+        # counts and sums of each table by geography x pick value
+        grids = {}
+
+        def grid(table, by, value):
+            if (table, by, value) not in grids:
+                codes, uniques = geo_codes[table]
+                cats, cat_uniques = picks[(table, by)]
+                ok = codes >= 0
+                key = codes[ok] * len(cat_uniques) + cats[ok]
+                shape = (len(uniques), len(cat_uniques))
+                weights = None
+                if value is not None:
+                    weights = tables[table][value].values[ok].astype(float)
+                    weights = np.where(np.isnan(weights), 0, weights)
+                grids[(table, by, value)] = np.bincount(
+                    key, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+            return grids[(table, by, value)]
+
+        columns = []
+        for name, table, value, by, values in spec:
+            codes, uniques = geo_codes[table]
+            cats, cat_uniques = picks[(table, by)]
+            if by is None:
+                selections = [(name, [0])]
+            elif values is None:
+                # one column per value seen in the rows left for this geography,
+                # a missing value gets a column but never matches any rows
+                seen, first = _first_seen(np.where(codes >= 0, cats, -1))
+                labels = tables[table][by].values[first]
+                selections = [(name.format(label), [] if pd.isna(label) else [i])
+                              for i, label in zip(seen, labels)]
+            else:
+                selections = [(name, np.flatnonzero(cat_uniques.isin(values)))]
+
+            for col, sel in selections:
+                count = grid(table, by, None)[:, sel].sum(axis=1)
+                present = count > 0
+                if value is None:
+                    s = pd.Series(count[present].astype(np.int64), index=uniques[present])
+                else:
+                    total = grid(table, by, value)[:, sel].sum(axis=1)[present]
+                    if np.issubdtype(tables[table][value].dtype, np.integer):
+                        total = total.round().astype(np.int64)
+                    s = pd.Series(total, index=uniques[present])
+                if name in rounded:
+                    s = s.round(0)
+                columns.append((col, s))
+
+        yield geography, groups, columns
+
+
 @orca.step()
 def geographic_summary(parcels, households, jobs, buildings, year, superdistricts_geography,
-                       initial_summary_year, final_year, interim_summary_years, run_name):  
+                       initial_summary_year, final_year, interim_summary_years, run_name, summary_frames, year_snapshots):  
 
     # Commenting this out so we get geographic summaries for all years - DSL 2023-08-31
     # if year not in [initial_summary_year, final_year] + interim_summary_years:
     #      return
 
-    households_df = orca.merge_tables('households', [parcels, buildings, households],
+    households_df = summary_frames.merge('households', [parcels, buildings, households],
         columns=['juris', 'superdistrict', 'county', 'subregion', 'base_income_quartile',])
 
-    jobs_df = orca.merge_tables('jobs', [parcels, buildings, jobs],
+    jobs_df = summary_frames.merge('jobs', [parcels, buildings, jobs],
         columns=['juris', 'superdistrict', 'county', 'subregion', 'empsix', 'ec5_cat'])
 
-    buildings_df = orca.merge_tables('buildings', [parcels, buildings],
+    buildings_df = summary_frames.merge('buildings', [parcels, buildings],
         columns=['juris', 'superdistrict', 'county', 'subregion', 'profit_adjustment_tier','building_type', 
                  'residential_units', 'deed_restricted_units', 'non_residential_sqft','job_spaces',
                  'vacant_job_spaces'])
@@ -210,70 +352,29 @@ def geographic_summary(parcels, households, jobs, buildings, year, superdistrict
     #### summarize by sub-regional geography ####
     geographies = ['juris', 'superdistrict', 'county', 'subregion']
 
-    for geography in geographies:
+    tables = {'households': households_df, 'jobs': jobs_df, 'buildings': buildings_df}
+    for geography, groups, columns in summarize_by_geography(tables, geographies):
 
-        # remove rows with null geography- seen with "county"
-        
-        # TODO: we should start with the raw buildings frame - so we don't
-        # end up increasingly reducing the frame if there are NAs
-        # in an early loop carrying through to later loops.
-
-        buildings_df = buildings_df[~pd.isna(buildings_df[geography])]
-        households_df = households_df[~pd.isna(households_df[geography])]
-        jobs_df = jobs_df[~pd.isna(jobs_df[geography])]
-
-        summary_table = pd.DataFrame(index=buildings_df[geography].unique())
+        summary_table = pd.DataFrame(index=groups['buildings'])
         
         # add superdistrict name 
         if geography == 'superdistrict':
             superdistricts_geography = superdistricts_geography.to_frame()
             summary_table = summary_table.merge(superdistricts_geography[['name']], left_index=True, right_index=True)
 
-        # households
-        summary_table['tothh'] = households_df.groupby(geography).size()
-        for quartile in [1, 2, 3, 4]:
-            summary_table['hhincq'+str(quartile)] = households_df[households_df.base_income_quartile == quartile].groupby(geography).size()
-
-        # residential buildings
-        summary_table['residential_units'] = buildings_df.groupby(geography).residential_units.sum() 
-        summary_table['deed_restricted_units'] = buildings_df.groupby(geography).deed_restricted_units.sum() 
-        summary_table['sfdu'] = buildings_df[(buildings_df.building_type == 'HS') | (buildings_df.building_type == 'HT')].\
-            groupby(geography).residential_units.sum()
-        summary_table['mfdu'] = buildings_df[(buildings_df.building_type == 'HM') | (buildings_df.building_type == 'MR')].\
-            groupby(geography).residential_units.sum()
-        
-        # units by tier
-        for tier_nme in buildings_df.profit_adjustment_tier.unique():
-            summary_table[f'residential_units_{tier_nme}'] = (
-                buildings_df.query(
-                'profit_adjustment_tier==@tier_nme')
-                .groupby(geography)
-                .residential_units.sum()
-            )        
-        
-        # employees by sector
-        summary_table['totemp'] = jobs_df.groupby(geography).size()
-        for empsix in ['AGREMPN', 'MWTEMPN', 'RETEMPN', 'FPSEMPN', 'HEREMPN', 'OTHEMPN']:
-            summary_table[empsix] = jobs_df[jobs_df.empsix == empsix].groupby(geography).size()
-        summary_table['transit_hub_jobs'] = jobs_df.query('ec5_cat=="Transit_Hub" ').groupby(geography).size()
-    
-
-        # non-residential buildings
-        summary_table['non_residential_sqft'] = buildings_df.groupby(geography)['non_residential_sqft'].sum().round(0)
-        summary_table['non_residential_sqft_office'] = buildings_df.query('building_type=="OF"').groupby(geography)['non_residential_sqft'].sum().round(0)
-        
-        summary_table['job_spaces'] = buildings_df.groupby(geography)['job_spaces'].sum().round(0)
-        summary_table['job_spaces_vacant'] = buildings_df.groupby(geography)['vacant_job_spaces'].sum().round(0)
-        
-        summary_table['job_spaces_office'] = buildings_df.query('building_type=="OF"').groupby(geography)['job_spaces'].sum().round(0)
-        summary_table['job_spaces_office_vacant'] = buildings_df.query('building_type=="OF"').groupby(geography)['vacant_job_spaces'].sum().round(0)
+        # households, residential buildings, units by tier, employees by sector
+        # and non-residential buildings
+        for name, values in columns:
+            summary_table[name] = values
         
         summary_table['job_spaces_vacant_pct'] = summary_table['job_spaces_vacant'] / summary_table['job_spaces'].clip(1)
         summary_table['job_spaces_office_vacant_pct']= summary_table['job_spaces_office_vacant'] / summary_table['job_spaces_office'].clip(1)
 
         summary_table.index.name = geography
         summary_table = summary_table.sort_index()
-        summary_table.fillna(0).to_csv(geosum_output_dir / f"{geography}_summary_{year}.csv")
+        summary_table = summary_table.fillna(0)
+        summary_table.to_csv(geosum_output_dir / f"{geography}_summary_{year}.csv")
+        year_snapshots.put(f"{geography}_summary", year, summary_table)
 
 # office vacancy
     # note that the rate is calculated using spaces, not square feet, consistent
@@ -286,7 +387,7 @@ def geographic_summary(parcels, households, jobs, buildings, year, superdistrict
     #                                             )
 
 @orca.step()
-def geographic_growth_summary(year, final_year, initial_summary_year, run_name):
+def geographic_growth_summary(year, final_year, initial_summary_year, run_name, year_snapshots):
     
     if year != final_year: 
         return
@@ -298,8 +399,10 @@ def geographic_growth_summary(year, final_year, initial_summary_year, run_name):
     for geography in geographies:
 
         # use 2015 as the base year
-        year1 = pd.read_csv(geosum_output_dir / f"{geography}_summary_{initial_summary_year}.csv")
-        year2 = pd.read_csv(geosum_output_dir / f"{geography}_summary_{final_year}.csv")
+        year1 = year_snapshots.get(f"{geography}_summary", initial_summary_year,
+            read=lambda: pd.read_csv(geosum_output_dir / f"{geography}_summary_{initial_summary_year}.csv"))
+        year2 = year_snapshots.get(f"{geography}_summary", final_year,
+            read=lambda: pd.read_csv(geosum_output_dir / f"{geography}_summary_{final_year}.csv"))
 
         geog_growth = year1.merge(year2, on=geography, suffixes=("_"+str(initial_summary_year), "_"+str(final_year)))
 
@@ -13,14 +13,14 @@ logger = logging.getLogger(__name__)
 
 @orca.step()
 def growth_geography_metrics(parcels, parcels_geography, buildings, households, jobs, year, 
-                             initial_summary_year, final_year, run_name): 
+                             initial_summary_year, final_year, run_name, summary_frames): 
 
     if year != initial_summary_year and year != final_year:
         return
 
-    households_df = orca.merge_tables('households', [parcels, buildings, households, parcels_geography],
+    households_df = summary_frames.merge('households', [parcels, buildings, households, parcels_geography],
         columns=['income', 'base_income_quartile', 'gg_id', 'pda_id', 'tra_id', 'sesit_id'])
-    jobs_df = orca.merge_tables('jobs', [parcels, buildings, jobs, parcels_geography],
+    jobs_df = summary_frames.merge('jobs', [parcels, buildings, jobs, parcels_geography],
         columns=['empsix', 'gg_id', 'pda_id', 'tra_id', 'sesit_id'])
         
     # intialize growth geographies summary table
@@ -79,12 +79,12 @@ def growth_geography_metrics(parcels, parcels_geography, buildings, households,
 
 
 @orca.step()
-def deed_restricted_units_metrics(parcels, buildings, year, initial_summary_year, final_year, parcels_geography, run_name): 
+def deed_restricted_units_metrics(parcels, buildings, year, initial_summary_year, final_year, parcels_geography, run_name, summary_frames): 
 
     if year != initial_summary_year and year != final_year:
         return
     
-    buildings_df = orca.merge_tables('buildings', [parcels, buildings, parcels_geography],
+    buildings_df = summary_frames.merge('buildings', [parcels, buildings, parcels_geography],
                                      columns=['residential_units', 'deed_restricted_units',
                                               'gg_id', 'pda_id', 'tra_id', 'sesit_id', 'coc_id'])
     
@@ -128,12 +128,12 @@ def deed_restricted_units_metrics(parcels, buildings, year, initial_summary_year
 
 @orca.step()
 def household_income_metrics(year, initial_summary_year, final_year, parcels, buildings, households, 
-                             parcels_geography, run_name):
+                             parcels_geography, run_name, summary_frames):
     
     if year != initial_summary_year and year != final_year:
         return
     
-    hh_df = orca.merge_tables('households', [parcels, buildings, households, parcels_geography], 
+    hh_df = summary_frames.merge('households', [parcels, buildings, households, parcels_geography], 
                               columns=['base_income_quartile', 'gg_id', 'pda_id', 'tra_id', 'sesit_id', 'coc_id'])
     
     ### low income households ###   
@@ -173,12 +173,12 @@ def household_income_metrics(year, initial_summary_year, final_year, parcels, bu
 
 @orca.step()
 def equity_metrics(year, initial_summary_year, final_year, parcels, buildings, households, parcel_tract_crosswalk,
-                   displacement_risk_tracts, run_name): 
+                   displacement_risk_tracts, run_name, summary_frames): 
     
     if year not in [initial_summary_year, 2025, final_year]:
         return
     
-    hh_df = orca.merge_tables('households', [parcels, buildings, households], columns=['base_income_quartile'])
+    hh_df = summary_frames.merge('households', [parcels, buildings, households], columns=['base_income_quartile'])
 
     dis_tracts = displacement_risk_tracts.to_frame()
     dis_tracts = dis_tracts[dis_tracts.dis_id ==  1]
@@ -256,13 +256,13 @@ def equity_metrics(year, initial_summary_year, final_year, parcels, buildings, h
 
 
 @orca.step()
-def jobs_housing_metrics(parcels, buildings, jobs, households, year, initial_summary_year, final_year, run_name):
+def jobs_housing_metrics(parcels, buildings, jobs, households, year, initial_summary_year, final_year, run_name, summary_frames):
 
     if year == initial_summary_year or year == final_year:
         
-        jobs_df = orca.merge_tables('jobs', [parcels, buildings, jobs], columns=['empsix', 'county'])
+        jobs_df = summary_frames.merge('jobs', [parcels, buildings, jobs], columns=['empsix', 'county'])
     
-        households_df = orca.merge_tables('households', [parcels, buildings, households], columns=['base_income_quartile', 'county'])
+        households_df = summary_frames.merge('households', [parcels, buildings, households], columns=['base_income_quartile', 'county'])
 
         jobs_housing_summary = pd.DataFrame(index=['jobs_housing_ratio'])
         # regional jobs-housing ratio
@@ -283,11 +283,11 @@ def jobs_housing_metrics(parcels, buildings, jobs, households, year, initial_sum
 
 
 @orca.step()
-def jobs_metrics(year, parcels, buildings, jobs, parcels_geography, initial_summary_year, final_year, run_name):
+def jobs_metrics(year, parcels, buildings, jobs, parcels_geography, initial_summary_year, final_year, run_name, summary_frames):
     
     if year == initial_summary_year or year == final_year:
 
-        jobs_df = orca.merge_tables('jobs', [parcels, buildings, jobs, parcels_geography], columns=['empsix', 'ppa_id'])
+        jobs_df = summary_frames.merge('jobs', [parcels, buildings, jobs, parcels_geography], columns=['empsix', 'ppa_id'])
 
         jobs_summary = pd.DataFrame(index=['total'])
         jobs_summary['totemp'] = jobs_df.size
@@ -426,7 +426,7 @@ def wildfire_metrics():
 
 
 @orca.step()
-def greenfield_metrics(buildings, parcels, year, initial_summary_year, final_year, run_name):
+def greenfield_metrics(buildings, parcels, year, initial_summary_year, final_year, run_name, summary_frames):
 
     if year != initial_summary_year and year != final_year:
         return
@@ -434,7 +434,7 @@ def greenfield_metrics(buildings, parcels, year, initial_summary_year, final_yea
     # TODO (long-term)- update the urbanized area  used, this uses "Urbanize_Footprint" shapefile joined to parcels
     # most greenfield occurs in the baseyear here since the shapefile is older than the input data
     # so also update the start year for the metric
-    buildings_uf_df = orca.merge_tables('buildings', [parcels, buildings],
+    buildings_uf_df = summary_frames.merge('buildings', [parcels, buildings],
         columns=['urbanized', 'year_built', 'acres', 'residential_units', 'non_residential_sqft'])
     
     # new buildings outside of the urban footprint (or urbanized flag)
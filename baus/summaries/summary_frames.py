@@ -0,0 +1,152 @@
+from __future__ import print_function
+
+import orca
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# the joins the summary and metrics steps ask for, by step.  the first request
+# for a join in a year pulls every column the enabled steps want from it so
+# the rest of the steps get theirs from the same frame
+PBH = ("parcels", "buildings", "households")
+PBJ = ("parcels", "buildings", "jobs")
+PB = ("parcels", "buildings")
+PBHG = PBH + ("parcels_geography",)
+PBJG = PBJ + ("parcels_geography",)
+PBG = PB + ("parcels_geography",)
+
+SUMMARY_STEPS = {
+    "disaggregate_output": [
+        ("households", ("buildings", "households"), ["parcel_id", "base_income_quartile"]),
+        ("jobs", ("buildings", "jobs"), ["parcel_id", "empsix"])],
+    "deed_restricted_units_summary": [
+        ("buildings", PB, ["juris", "superdistrict", "county", "residential_units", "deed_restricted_units",
+                           "preserved_units", "inclusionary_units", "subsidized_units", "source"])],
+    "geographic_summary": [
+        ("households", PBH, ["juris", "superdistrict", "county", "subregion", "base_income_quartile"]),
+        ("jobs", PBJ, ["juris", "superdistrict", "county", "subregion", "empsix", "ec5_cat"]),
+        ("buildings", PB, ["juris", "superdistrict", "county", "subregion", "profit_adjustment_tier",
+                           "building_type", "residential_units", "deed_restricted_units",
+                           "non_residential_sqft", "job_spaces", "vacant_job_spaces"])],
+    "maz_marginals": [
+        ("households", PBH, ["maz_id"])],
+    "maz_summary": [
+        ("households", PBH, ["persons", "base_income_quartile", "maz_id"]),
+        ("jobs", PBJ, ["maz_id", "empsix"]),
+        ("buildings", PB, ["maz_id", "residential_units"])],
+}
+
+METRICS_STEPS = {
+    "growth_geography_metrics": [
+        ("households", PBHG, ["income", "base_income_quartile", "gg_id", "pda_id", "tra_id", "sesit_id"]),
+        ("jobs", PBJG, ["empsix", "gg_id", "pda_id", "tra_id", "sesit_id"])],
+    "deed_restricted_units_metrics": [
+        ("buildings", PBG, ["residential_units", "deed_restricted_units",
+                            "gg_id", "pda_id", "tra_id", "sesit_id", "coc_id"])],
+    "household_income_metrics": [
+        ("households", PBHG, ["base_income_quartile", "gg_id", "pda_id", "tra_id", "sesit_id", "coc_id"])],
+    "equity_metrics": [
+        ("households", PBH, ["base_income_quartile"])],
+    "jobs_housing_metrics": [
+        ("jobs", PBJ, ["empsix", "county"]),
+        ("households", PBH, ["base_income_quartile", "county"])],
+    "jobs_metrics": [
+        ("jobs", PBJG, ["empsix", "ppa_id"])],
+    "greenfield_metrics": [
+        ("buildings", PB, ["urbanized", "year_built", "acres", "residential_units", "non_residential_sqft"])],
+}
+
+
+def _join_key(target, tables):
+    return target, tuple(sorted(tables))
+
+
+def _join_columns(tables):
+    # the key columns orca.merge_tables adds to the columns it's asked for
+    cols = set()
+    for cast, onto in orca.list_broadcasts():
+        if cast in tables and onto in tables:
+            bc = orca.get_broadcast(cast, onto)
+            for on in [bc.onto_on, bc.cast_on]:
+                if on is not None:
+                    cols.update([on] if isinstance(on, str) else on)
+    return cols
+
+
+class SummaryFrames(object):
+    """
+    Hands out the agent x geography joins the summary and metrics steps use,
+    doing each join once a year instead of once per step.
+
+    The first request for a join pulls the columns every enabled step in
+    SUMMARY_STEPS and METRICS_STEPS wants from it, and later requests are
+    column selections of that frame, so they come back with the same rows
+    and columns orca.merge_tables would have given them.  The frames are
+    dropped when the year changes or one of the joined tables is replaced.
+
+    Parameters
+    ----------
+    steps : dict
+        Step name to the (target, tables, columns) joins it uses
+    enabled : bool, optional
+        If False every request goes straight to orca.merge_tables
+    """
+    def __init__(self, steps, enabled=True):
+        self.enabled = enabled
+        self.registry = {}
+        for joins in steps.values():
+            for target, tables, columns in joins:
+                self.registry.setdefault(_join_key(target, tables), set()).update(columns)
+        self._year = None
+        self._frames = {}
+
+    def merge(self, target, tables, columns):
+        """
+        Drop in for orca.merge_tables(target, tables, columns).  The frame
+        returned is the caller's to modify.
+        """
+        tables = [t if isinstance(t, str) else t.name for t in tables]
+        if not self.enabled:
+            return orca.merge_tables(target, tables, columns=columns)
+
+        year = orca.get_injectable("year")
+        if year != self._year:
+            self._year = year
+            self._frames = {}
+
+        key = _join_key(target, tables)
+        # the wrappers are kept with the frame and compared by identity, since
+        # the id of a replaced wrapper could be reused by the new one
+        wrappers = tuple(orca.get_table(t) for t in key[1])
+        cached = self._frames.get(key)
+        if cached is None or any(a is not b for a, b in zip(cached[0], wrappers)) or \
+                not set(columns) <= set(cached[1].columns):
+            cached = (wrappers, self._build(target, tables, columns, cached))
+            self._frames[key] = cached
+
+        keep = set(columns) | _join_columns(tables)
+        df = cached[1]
+        return df[[c for c in df.columns if c in keep]]
+
+    def _build(self, target, tables, columns, cached):
+        available = set()
+        for t in tables:
+            available.update(orca.get_table(t).columns)
+        union = set(columns) | (self.registry.get(_join_key(target, tables), set()) & available)
+        if cached is not None:
+            union |= set(cached[1].columns) & available
+        union = sorted(union)
+        logger.debug("joining %d columns of %s onto %s" % (len(union), tables, target))
+        return orca.merge_tables(target, tables, columns=union)
+
+
+@orca.injectable(cache=True)
+def summary_frames(run_setup):
+    steps = {}
+    if run_setup.get("run_summaries", False):
+        steps.update(SUMMARY_STEPS)
+    if run_setup.get("run_metrics", False):
+        steps.update(METRICS_STEPS)
+    return SummaryFrames(steps, enabled=run_setup.get("summary_frame_cache", True))
@@ -228,7 +228,7 @@ def adjust_hhkids(df, year, rdf, total_hh):
 @orca.step()
 def taz1_summary(parcels, households, jobs, buildings, zones, maz, year, base_year_summary_taz, taz_geography, 
                  tm1_taz1_forecast_inputs, tm1_tm2_maz_forecast_inputs, tm1_tm2_regional_demographic_forecast, 
-                 tm1_tm2_regional_controls, initial_summary_year, final_year, interim_summary_years, run_name):
+                 tm1_tm2_regional_controls, initial_summary_year, final_year, interim_summary_years, run_name, output_writer, year_snapshots):
     
     # Commenting this out so we get taz1 summaries for every year.
     # It's about 90 seconds a pop so not great, not terrible
@@ -361,11 +361,12 @@ def taz1_summary(parcels, households, jobs, buildings, zones, maz, year, base_ye
     taz_df.columns = [x.upper() for x in taz_df.columns]
     tmsum_output_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "travel_model_summaries"
     tmsum_output_dir.mkdir(parents=True, exist_ok=True)
-    taz_df.fillna(0).to_csv(tmsum_output_dir / f"taz1_summary_{year}.csv")
+    output_writer.write_csv(taz_df.fillna(0), tmsum_output_dir / f"taz1_summary_{year}.csv")
+    year_snapshots.put("taz1_summary", year, taz_df.fillna(0))
 
 
 @orca.step()
-def taz1_growth_summary(year, initial_summary_year, final_year, run_name, buildings):
+def taz1_growth_summary(year, initial_summary_year, final_year, run_name, buildings, output_writer, year_snapshots):
 
     if year != final_year: 
         return
@@ -374,8 +375,11 @@ def taz1_growth_summary(year, initial_summary_year, final_year, run_name, buildi
     tmsum_output_dir.mkdir(parents=True, exist_ok=True)
 
     # use 2015 as the base year
-    year1 = pd.read_csv(tmsum_output_dir / f"taz1_summary_{initial_summary_year}.csv")
-    year2 = pd.read_csv(tmsum_output_dir / f"taz1_summary_{final_year}.csv")
+    def read(summary_year):
+        output_writer.flush()
+        return pd.read_csv(tmsum_output_dir / f"taz1_summary_{summary_year}.csv")
+    year1 = year_snapshots.get("taz1_summary", initial_summary_year, read=lambda: read(initial_summary_year))
+    year2 = year_snapshots.get("taz1_summary", final_year, read=lambda: read(final_year))
 
     taz_summary = year1.merge(year2, on='TAZ', suffixes=("_"+str(initial_summary_year), "_"+str(final_year)))
     taz_summary = taz_summary.rename(columns={"SD_"+(str(initial_summary_year)): "SD", "COUNTY_"+(str(initial_summary_year)): "COUNTY",
@@ -411,7 +415,7 @@ def taz1_growth_summary(year, initial_summary_year, final_year, run_name, buildi
 @orca.step()
 def maz_marginals(parcels, households, buildings, maz, year,
                   tm1_tm2_maz_forecast_inputs, tm1_tm2_regional_demographic_forecast, initial_summary_year, 
-                  final_year, interim_summary_years, run_name):
+                  final_year, interim_summary_years, run_name, summary_frames, output_writer):
     
     if year not in [initial_summary_year, final_year] + interim_summary_years:
         return
@@ -420,7 +424,7 @@ def maz_marginals(parcels, households, buildings, maz, year,
     maz_m = maz.to_frame(['TAZ', 'county_name'])
 
     # (2) add households by MAZ
-    hh_df = orca.merge_tables('households', [parcels, buildings, households], columns=['maz_id'])
+    hh_df = summary_frames.merge('households', [parcels, buildings, households], columns=['maz_id'])
     # apply fix to maz_id
     hh_df.maz_id = hh_df.maz_id.fillna(213906)
     maz_m["tothh"] = hh_df.groupby('maz_id').size()
@@ -446,13 +450,13 @@ def maz_marginals(parcels, households, buildings, maz, year,
 
     tmsum_output_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "travel_model_summaries"
     tmsum_output_dir.mkdir(parents=True, exist_ok=True)
-    maz_m.fillna(0).to_csv(tmsum_output_dir / f"maz_marginals_{year}.csv")
+    output_writer.write_csv(maz_m.fillna(0), tmsum_output_dir / f"maz_marginals_{year}.csv")
     orca.add_table("maz_marginals_df", maz_m)
 
 
 @orca.step()
 def maz_summary(parcels, jobs, households, buildings, maz, year, tm2_emp27_employment_shares, 
-                tm1_tm2_regional_controls, initial_summary_year, final_year, interim_summary_years, run_name):
+                tm1_tm2_regional_controls, initial_summary_year, final_year, interim_summary_years, run_name, summary_frames, output_writer, year_snapshots):
     
     if year not in [initial_summary_year, final_year] + interim_summary_years:
         return
@@ -465,7 +469,7 @@ def maz_summary(parcels, jobs, households, buildings, maz, year, tm2_emp27_emplo
     maz_df['tothh'] = maz_marginals_df['tothh']
 
     # (3) summarize household data by MAZ
-    hh_df = orca.merge_tables('households', [parcels, buildings, households],
+    hh_df = summary_frames.merge('households', [parcels, buildings, households],
                                             columns=['persons', 'base_income_quartile', 'maz_id'])
     def gethhcounts(filter):
         return hh_df.query(filter).groupby('maz_id').size()
@@ -475,7 +479,7 @@ def maz_summary(parcels, jobs, households, buildings, maz, year, tm2_emp27_emplo
     maz_df["hhincq4"] = gethhcounts("base_income_quartile == 4")
 
     # (4) summarize jobs by MAZ
-    jobs_df = orca.merge_tables('jobs',
+    jobs_df = summary_frames.merge('jobs',
                                 [parcels, buildings, jobs],
                                 columns=['maz_id', 'empsix'])
 
@@ -530,7 +534,7 @@ def maz_summary(parcels, jobs, households, buildings, maz, year, tm2_emp27_emplo
 
     # (6) add density variables
     pcl_df = parcels.to_frame(['maz_id', 'acres'])
-    bldg_df = orca.merge_tables('buildings', [buildings, parcels], columns=['maz_id', 'residential_units'])
+    bldg_df = summary_frames.merge('buildings', [buildings, parcels], columns=['maz_id', 'residential_units'])
     maz_df['ACRES'] = pcl_df.groupby('maz_id').acres.sum()
     maz_df['residential_units'] = bldg_df.groupby('maz_id').residential_units.sum()
     maz_df['DUDen'] = maz_df.residential_units / maz_df.ACRES
@@ -541,12 +545,13 @@ def maz_summary(parcels, jobs, households, buildings, maz, year, tm2_emp27_emplo
 
     tmsum_output_dir = pathlib.Path(orca.get_injectable("outputs_dir")) / "travel_model_summaries"
     tmsum_output_dir.mkdir(parents=True, exist_ok=True)
-    maz_df.fillna(0).to_csv(tmsum_output_dir / f"maz_summary_{year}.csv")
+    output_writer.write_csv(maz_df.fillna(0), tmsum_output_dir / f"maz_summary_{year}.csv")
+    year_snapshots.put("maz_summary", year, maz_df.fillna(0))
     orca.add_table("maz_summary_df", maz_df)
 
 
 @orca.step()
-def maz_growth_summary(year, initial_summary_year, final_year, run_name):
+def maz_growth_summary(year, initial_summary_year, final_year, run_name, output_writer, year_snapshots):
 
     if year != final_year: 
         return
@@ -555,8 +560,11 @@ def maz_growth_summary(year, initial_summary_year, final_year, run_name):
     tmsum_output_dir.mkdir(parents=True, exist_ok=True)
 
     # use 2015 as the base year
-    year1 = pd.read_csv(tmsum_output_dir / f"maz_summary_{initial_summary_year}.csv")
-    year2 = pd.read_csv(tmsum_output_dir / f"maz_summary_{final_year}.csv")
+    def read(summary_year):
+        output_writer.flush()
+        return pd.read_csv(tmsum_output_dir / f"maz_summary_{summary_year}.csv")
+    year1 = year_snapshots.get("maz_summary", initial_summary_year, read=lambda: read(initial_summary_year))
+    year2 = year_snapshots.get("maz_summary", final_year, read=lambda: read(final_year))
 
     maz_summary = year1.merge(year2, on='MAZ', suffixes=("_"+str(initial_summary_year), "_"+str(final_year)))
     maz_summary = maz_summary.rename(columns={"TAZ_"+(str(initial_summary_year)): "TAZ", "county_name_"+(str(initial_summary_year)): "county_name"})
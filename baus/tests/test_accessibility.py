@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import orca
+import pandana as pdna
+import pytest
+import yaml
+from urbansim.utils import networks
+
+from .. import accessibility
+
+VARIABLES = [
+    {"name": "units_linear", "dataframe": "buildings", "varname": "residential_units",
+     "radius": 300, "decay": "linear"},
+    {"name": "retail_flat", "dataframe": "buildings", "varname": "job_spaces",
+     "filters": ['general_type == "Retail"'], "radius": 250, "decay": "flat",
+     "apply": "np.log1p"},
+    {"name": "ave_price", "dataframe": "buildings", "varname": "price", "radius": 300,
+     "decay": "linear", "aggregation": "ave"},
+    {"name": "buildings_count", "dataframe": "buildings", "radius": 200,
+     "aggregation": "count"},
+    {"name": "price_75pct", "dataframe": "buildings", "varname": "price", "radius": 300,
+     "decay": "flat", "aggregation": "75pct"},
+]
+
+
+@pytest.fixture
+def grid_net():
+    # a 20 x 20 grid of nodes 50 apart
+    xy = np.array([(x, y) for x in range(20) for y in range(20)], dtype=float) * 50
+    ids = np.arange(len(xy)) + 1000
+    node = pd.Series(np.arange(len(xy)), index=[tuple(p) for p in xy / 50])
+    edges = [(ids[i], ids[node[(x + dx, y + dy)]]) for i, (x, y) in enumerate(xy / 50)
+             for dx, dy in [(1, 0), (0, 1)] if (x + dx, y + dy) in node.index]
+    edges = pd.DataFrame(edges, columns=["from", "to"])
+    net = pdna.Network(pd.Series(xy[:, 0], index=ids), pd.Series(xy[:, 1], index=ids),
+                       edges["from"], edges["to"], pd.DataFrame({"weight": np.full(len(edges), 50.)}))
+    net.precompute(300)
+    return net
+
+
+@pytest.fixture
+def configs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "configs").mkdir()
+    with open(tmp_path / "configs" / "test_vars.yaml", "w") as f:
+        yaml.safe_dump({"node_col": "node_id", "variable_definitions": VARIABLES}, f)
+    for name in ["_TABLES", "_COLUMNS", "_INJECTABLES", "_TABLE_CACHE",
+                 "_COLUMN_CACHE", "_INJECTABLE_CACHE"]:
+        monkeypatch.setattr(orca.orca, name, {})
+
+
+def _buildings(net, n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "node_id": rng.choice(net.node_ids.values, n),
+        "residential_units": rng.integers(0, 20, n).astype(float),
+        "job_spaces": rng.integers(0, 50, n).astype(float),
+        "price": rng.random(n) * 1000,
+        "general_type": rng.choice(["Retail", "Office", "Residential"], n)
+    })
+
+
+def test_incremental_accessibility_matches_full(grid_net, configs):
+    buildings = _buildings(grid_net, 500, 0)
+    # pandana leaves buildings without a price out of the averages
+    buildings.loc[buildings.index[::5], "price"] = np.nan
+    engine = accessibility.IncrementalAccessibility(grid_net, "test_vars.yaml", max_changed_share=.5)
+    propagated = []
+    propagate = engine._propagate
+    engine._propagate = lambda updates, radius: propagated.append(propagate(updates, radius)) or propagated[-1]
+
+    for year in range(3):
+        orca.add_table("buildings", buildings)
+        expected = networks.from_yaml(grid_net, "test_vars.yaml")
+        actual = engine.compute()
+        pd.testing.assert_frame_equal(actual, expected, rtol=1e-5)
+
+        # a few buildings are built, demolished and redeveloped each year
+        buildings = pd.concat([buildings.iloc[5:], _buildings(grid_net, 10, year + 1)],
+                              ignore_index=True)
+        buildings.loc[buildings.index[:3], "residential_units"] += 4
+
+    # the later years only updated the changed neighborhoods
+    assert len(propagated) > 0
+    assert max(propagated) < .5 * len(grid_net.node_ids)
+
+
+def test_incremental_accessibility_falls_back(grid_net, configs, monkeypatch):
+    engine = accessibility.IncrementalAccessibility(grid_net, "test_vars.yaml", max_changed_share=.01)
+    orca.add_table("buildings", _buildings(grid_net, 500, 0))
+    engine.compute()
+
+    # everything moves, so the update is abandoned for a full recompute
+    monkeypatch.setattr(engine, "_propagate", None)
+    orca.add_table("buildings", _buildings(grid_net, 500, 1))
+    expected = networks.from_yaml(grid_net, "test_vars.yaml")
+    pd.testing.assert_frame_equal(engine.compute(), expected, rtol=1e-5)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import orca
+import pytest
+from urbansim import accounts
+
+from .. import checkpoint
+
+
+@pytest.fixture
+def empty_orca(monkeypatch):
+    # run against empty registries so the tables registered by the other
+    # baus modules are not read from the store
+    for name in ["_TABLES", "_COLUMNS", "_INJECTABLES", "_TABLE_CACHE",
+                 "_COLUMN_CACHE", "_INJECTABLE_CACHE"]:
+        monkeypatch.setattr(orca.orca, name, {})
+
+
+def test_checkpoint_round_trip(empty_orca, tmp_path):
+    households = pd.DataFrame({"building_id": [1, 2, -1], "income": [1e4, 5e4, 9e4]},
+                              index=pd.Index([10, 11, 12], name="household_id"))
+    buildings = pd.DataFrame({"parcel_id": [5, 6], "building_type": ["HS", "OF"]},
+                             index=pd.Index([1, 2], name="building_id"))
+    orca.add_table("households", households)
+    orca.add_table("buildings", buildings)
+    orca.add_table("jobs_summary_2020", pd.DataFrame({"jobs": [3, 4]}))
+    orca.add_table("feasibility", pd.DataFrame({"max_profit": [1.0]}))
+    orca.add_column("households", "income_k", lambda households: households.income / 1000)
+
+    acct = accounts.Account("vmt_res_acct")
+    acct.add_transaction(100.0, subaccount=1, metadata={"year": 2020})
+    orca.add_injectable("coffer", {"vmt_res_acct": acct})
+    orca.add_injectable("static_parcels", np.array([5, 7]))
+    orca.add_injectable("developer_settings", {"cap_rate": .04, "original_cap_rate": .05})
+
+    np.random.seed(0)
+    checkpoint.save_checkpoint(2020, tmp_path)
+    expected_draw = np.random.random(3)
+
+    # carry on mutating the state as the next year would
+    orca.add_table("households", households.assign(building_id=2))
+    orca.add_table("feasibility", pd.DataFrame())
+    orca.get_injectable("coffer")["vmt_res_acct"].add_transaction(-50.0)
+    orca.add_injectable("static_parcels", np.array([]))
+    orca.get_injectable("developer_settings")["cap_rate"] = .07
+
+    checkpoint.restore_checkpoint(2020, tmp_path)
+
+    pd.testing.assert_frame_equal(orca.get_table("households").local, households)
+    pd.testing.assert_frame_equal(orca.get_table("buildings").local, buildings)
+    assert orca.get_table("jobs_summary_2020").jobs.tolist() == [3, 4]
+    # scratch tables are not checkpointed
+    assert len(orca.get_table("feasibility")) == 0
+    # computed columns keep working on the restored tables
+    assert orca.get_table("households").income_k.tolist() == [10, 50, 90]
+
+    assert orca.get_injectable("coffer")["vmt_res_acct"].balance == 100.0
+    assert orca.get_injectable("static_parcels").tolist() == [5, 7]
+    assert orca.get_injectable("developer_settings")["cap_rate"] == .04
+    np.testing.assert_array_equal(np.random.random(3), expected_draw)
+
+
+def test_restore_missing_checkpoint(empty_orca, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        checkpoint.restore_checkpoint(2035, tmp_path)
+
+
+def test_checkpoint_added_columns(empty_orca, tmp_path):
+    parcels = pd.DataFrame({"acres": [1., 2., 3.]}, index=pd.Index([5, 6, 7], name="parcel_id"))
+    orca.add_table("parcels", parcels)
+    orca.add_column("parcels", "slr_nodev", pd.Series([True, False], index=[6, 7]))
+    orca.add_injectable("developer_settings", {})
+
+    checkpoint.save_checkpoint(2025, tmp_path)
+    orca.add_column("parcels", "slr_nodev", pd.Series(True, index=parcels.index))
+    checkpoint.restore_checkpoint(2025, tmp_path)
+
+    pd.testing.assert_frame_equal(orca.get_table("parcels").local, parcels)
+    assert orca.get_table("parcels").slr_nodev.to_dict() == {6: True, 7: False}
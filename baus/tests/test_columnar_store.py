@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ..columnar_store import ColumnarStore, convert_h5_store
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_convert_h5_store(tmp_path, fmt):
+    parcels = pd.DataFrame({"zone_id": [1, 1, 2], "x": [-122.1, -122.2, -122.3],
+                            "juris": ["oakland", "oakland", "berkeley"]},
+                           index=pd.Index([7, 8, 9], name="parcel_id"))
+    h5_path = tmp_path / "store.h5"
+    with pd.HDFStore(h5_path, "w") as store:
+        store["parcels"] = parcels
+        store["zones"] = pd.DataFrame({"area": [1.0, 2.0]}, index=pd.Index([1, 2], name="zone_id"))
+
+    store = convert_h5_store(h5_path, fmt=fmt)
+    assert store.path == tmp_path / "store_{}".format(fmt)
+    assert store.keys() == ["/parcels", "/zones"]
+    assert "parcels" in store and "/zones" in store and "jobs" not in store
+    pd.testing.assert_frame_equal(store["parcels"], parcels)
+
+    # projected reads keep the index
+    store = ColumnarStore(store.path, fmt, columns={"parcels": ["juris"]})
+    pd.testing.assert_frame_equal(store["parcels"], parcels[["juris"]])
+    assert len(store.zones) == 2
+
+    with pytest.raises(KeyError):
+        store["jobs"]
@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+
+from .. import earthquake
+
+
+def _legacy_fragility_codes(buildings):
+    # the building-by-building loop that eq_code_buildings used before the
+    # rule tables, kept here as the reference for the parity test
+    code = []
+    fragilities = []
+
+    for i in buildings.index:
+        if (buildings['building_type'][i] == 'HS' and
+           buildings['year_built'][i] <= 2015):
+            a = 'SF'
+            if buildings['stories'][i] == 1:
+                b = '01'
+                if buildings['year_built'][i] <= 1940:
+                    c = 'G1'
+                elif (buildings['year_built'][i] >= 1941 and
+                      buildings['year_built'][i] <= 1960):
+                    c = 'G2'
+                elif (buildings['year_built'][i] >= 1961 and
+                      buildings['year_built'][i] <= 1995):
+                    c = 'G3'
+                elif (buildings['year_built'][i] >= 1996 and
+                      buildings['year_built'][i] <= 2015):
+                    c = 'G4'
+            elif buildings['stories'][i] >= 2:
+                b = '2P'
+                if buildings['year_built'][i] <= 1920:
+                    c = 'G1'
+                elif (buildings['year_built'][i] >= 1921 and
+                      buildings['year_built'][i] <= 1940):
+                    c = 'G2'
+                elif (buildings['year_built'][i] >= 1941 and
+                      buildings['year_built'][i] <= 1960):
+                    c = 'G3'
+                elif (buildings['year_built'][i] >= 1961 and
+                      buildings['year_built'][i] <= 1995):
+                    c = 'G4'
+                elif (buildings['year_built'][i] >= 1996 and
+                      buildings['year_built'][i] <= 2015):
+                    c = 'G5'
+        elif ((buildings['building_type'][i] == 'HM' or
+              buildings['building_type'][i] == 'MR') and
+              buildings['year_built'][i] <= 2015):
+            if (buildings['residential_units'][i] == 2 or
+               buildings['residential_units'][i] == 3 or
+               buildings['residential_units'][i] == 4):
+                a = 'DU'  # 2, 3, & 4 units
+                # are considered duplex/triplex/quadplex
+                if buildings['stories'][i] == 1:
+                    b = '01'
+                    if buildings['year_built'][i] <= 1940:
+                        c = 'G1'
+                    elif (buildings['year_built'][i] >= 1941 and
+                          buildings['year_built'][i] <= 1960):
+                        c = 'G2'
+                    elif (buildings['year_built'][i] >= 1961 and
+                          buildings['year_built'][i] <= 1995):
+                        c = 'G3'
+                    elif (buildings['year_built'][i] >= 1996 and
+                          buildings['year_built'][i] <= 2015):
+                        c = 'G4'
+                if buildings['stories'][i] >= 2:
+                    b = '2P'
+                    if buildings['year_built'][i] <= 1920:
+                        c = 'G1'
+                    elif (buildings['year_built'][i] >= 1921 and
+                          buildings['year_built'][i] <= 1940):
+                        c = 'G2'
+                    elif (buildings['year_built'][i] >= 1941 and
+                          buildings['year_built'][i] <= 1960):
+                        c = 'G3'
+                    elif (buildings['year_built'][i] >= 1961 and
+                          buildings['year_built'][i] <= 1977):
+                        c = 'G4'
+                    elif (buildings['year_built'][i] >= 1978 and
+                          buildings['year_built'][i] <= 1991):
+                        c = 'G5'
+                    elif (buildings['year_built'][i] >= 1992 and
+                          buildings['year_built'][i] <= 2015):
+                        c = 'G6'
+            else:  # this assumes one-unit HM/MR buildings
+                # are also 5+ units (multifamily split by parcels)
+                a = 'MF'
+                if buildings['stories'][i] == 1:
+                    b = '01'
+                    if buildings['year_built'][i] <= 1920:
+                        c = 'G1'
+                    elif (buildings['year_built'][i] >= 1921 and
+                          buildings['year_built'][i] <= 1940):
+                        c = 'G2'
+                    elif (buildings['year_built'][i] >= 1941 and
+                          buildings['year_built'][i] <= 1960):
+                        c = 'G3'
+                    elif (buildings['year_built'][i] >= 1961 and
+                          buildings['year_built'][i] <= 1995):
+                        c = 'G4'
+                    elif (buildings['year_built'][i] >= 1996 and
+                          buildings['year_built'][i] <= 2015):
+                        c = 'G5'
+                elif (buildings['stories'][i] >= 2 and
+                      buildings['stories'][i] <= 5):
+                    b = '25'
+                    if buildings['year_built'][i] <= 1920:
+                        c = 'G1'
+                    elif (buildings['year_built'][i] >= 1921 and
+                          buildings['year_built'][i] <= 1940):
+                        c = 'G2'
+                    elif (buildings['year_built'][i] >= 1941 and
+                          buildings['year_built'][i] <= 1960):
+                        c = 'G3'
+                    elif (buildings['year_built'][i] >= 1961 and
+                          buildings['year_built'][i] <= 1977):
+                        c = 'G4'
+                    elif (buildings['year_built'][i] >= 1978 and
+                          buildings['year_built'][i] <= 1991):
+                        c = 'G5'
+                    elif (buildings['year_built'][i] >= 1992 and
+                          buildings['year_built'][i] <= 2015):
+                        c = 'G6'
+                elif buildings['stories'][i] >= 6:
+                    b = '5P'
+                    if buildings['year_built'][i] <= 1950:
+                        c = 'G1'
+                    elif (buildings['year_built'][i] >= 1951 and
+                          buildings['year_built'][i] <= 1971):
+                        c = 'G2'
+                    elif (buildings['year_built'][i] >= 1972 and
+                          buildings['year_built'][i] <= 1995):
+                        c = 'G3'
+                    elif (buildings['year_built'][i] >= 1996 and
+                          buildings['year_built'][i] <= 2006):
+                        c = 'G4'
+                    elif (buildings['year_built'][i] >= 2007 and
+                          buildings['year_built'][i] <= 2015):
+                        c = 'G5'
+        elif buildings['year_built'][i] <= 2015:
+            a = 'OT'
+            b = 'NN'
+            if buildings['year_built'][i] <= 1933:
+                c = 'G1'
+            elif (buildings['year_built'][i] >= 1934 and
+                  buildings['year_built'][i] <= 1950):
+                c = 'G2'
+            elif (buildings['year_built'][i] >= 1951 and
+                  buildings['year_built'][i] <= 1972):
+                c = 'G3'
+            elif (buildings['year_built'][i] >= 1973 and
+                  buildings['year_built'][i] <= 1996):
+                c = 'G4'
+            elif (buildings['year_built'][i] >= 1997 and
+                  buildings['year_built'][i] <= 2006):
+                c = 'G5'
+            elif (buildings['year_built'][i] >= 2007 and
+                  buildings['year_built'][i] <= 2015):
+                c = 'G6'
+        # new buildings built by the developer model
+        elif buildings['year_built'][i] > 2015:
+            a = 'NN'
+            b = 'NN'
+            c = 'NN'
+            # alternative if retrofitted: d = 'R'
+        d = 'N'
+        code_i = a+b+c+d
+        code.append(code_i)
+
+        # assign a fragility coefficient based on building code
+        if (code_i == 'SF01G4N' or code_i == 'SF2PG5N' or
+           code_i == 'DU2PG6N' or code_i == 'MF5PG5N' or
+           code_i == 'DU01G4N' or code_i == 'MF25G6N' or
+           code_i == 'MF01G5N' or code_i == 'OTNNG6N'):
+            fragility = 1
+        elif (code_i == 'SF01G3N' or code_i == 'DU01G3N' or
+              code_i == 'DU2PG5N' or code_i == 'MF25G5N' or
+              code_i == 'MF01G4N' or code_i == 'OTNNG5N' or
+              code_i == 'MF5PG4N'):
+            fragility = 1.2
+        elif (code_i == 'SF2PG4N' or code_i == 'MF5PG3N' or
+              code_i == 'OTNNG4N'):
+            fragility = 1.3
+        elif (code_i == 'MF5PG1N' or code_i == 'OTNNG2N'):
+            fragility = 1.4
+        elif (code_i == 'MF01G3N' or code_i == 'MF5PG2N' or
+              code_i == 'SF01G2N' or code_i == 'DU01G2N' or
+              code_i == 'OTNNG3N'):
+            fragility = 1.5
+        elif (code_i == 'DU2PG3N' or code_i == 'DU2PG4N'):
+            fragility = 1.75
+        elif (code_i == 'SF2PG3N' or code_i == 'DU01G1N' or
+              code_i == 'DU2PG2N' or code_i == 'MF01G2N' or
+              code_i == 'OTNNG1N'):
+            fragility = 2
+        elif (code_i == 'SF2PG2N'):
+            fragility = 2.25
+        elif (code_i == 'DU2PG1N' or code_i == 'SF01G1N' or
+              code_i == 'SF2PG1N' or code_i == 'MF01G1N' or
+              code_i == 'MF25G1N'):
+            fragility = 2.5
+        elif (code_i == 'MF25G2N' or code_i == 'MF25G3N' or
+              code_i == 'MF25G4N'):
+            fragility = 3
+        elif (code_i == 'NNNNNNN'):
+            fragility = 0
+        fragilities.append(fragility)
+
+    return (pd.Series(code, buildings.index),
+            pd.Series(fragilities, buildings.index))
+
+
+def _sample_buildings(n, seed):
+    rs = np.random.RandomState(seed)
+    df = pd.DataFrame({
+        "building_type": rs.choice(["HS", "HT", "HM", "MR", "OF", "RB"], n),
+        "year_built": rs.randint(1880, 2051, n).astype(float),
+        "stories": rs.randint(0, 12, n).astype(float),
+        "residential_units": rs.randint(0, 8, n)
+    }, index=rs.choice(np.arange(10 * n), n, replace=False))
+    # odd values that fall through the rules of the original loop
+    df.iloc[5::97, df.columns.get_loc("year_built")] = np.nan
+    df.iloc[7::89, df.columns.get_loc("stories")] = 1.5
+    df.iloc[11::83, df.columns.get_loc("stories")] = 5.5
+    df.iloc[13::79, df.columns.get_loc("year_built")] = 1940.5
+    # the original loop has no values to carry over into the first row
+    df.iloc[0] = ["HS", 1950.0, 1.0, 1]
+    return df
+
+
+def test_building_fragility_codes_parity():
+    buildings = _sample_buildings(5000, 0)
+
+    code, fragility = earthquake.building_fragility_codes(buildings)
+    legacy_code, legacy_fragility = _legacy_fragility_codes(buildings)
+
+    pd.testing.assert_series_equal(code, legacy_code, check_names=False)
+    pd.testing.assert_series_equal(fragility, legacy_fragility,
+                                   check_names=False)
+
+
+def test_select_share_by_tract():
+    df = pd.DataFrame({
+        "tract": [1, 1, 1, 1, 2, 2, 2],
+        "score": [.1, .9, .5, np.nan, .3, .2, .8]
+    }, index=[10, 11, 12, 13, 20, 21, 22])
+    share = pd.Series([.5] * 4 + [1 / 3.] * 3, df.index)
+
+    selected = earthquake._select_share_by_tract(
+        df, df.index != 22, "score", share)
+
+    # two of four buildings in tract 1, and one of the two buildings left
+    # in tract 2 once building 22 is masked out
+    assert selected[selected].index.tolist() == [11, 12, 20]
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+import orca
+import pytest
+from urbansim.developer import sqftproforma
+from urbansim_defaults import utils
+
+from .. import feasibility
+
+PASS_THROUGH = ["total_sqft", "land_cost", "residential", "juris"]
+
+
+@pytest.fixture
+def parcels(monkeypatch):
+    for name in ["_TABLES", "_COLUMNS", "_INJECTABLES", "_TABLE_CACHE",
+                 "_COLUMN_CACHE", "_INJECTABLE_CACHE"]:
+        monkeypatch.setattr(orca.orca, name, {})
+    orca.add_injectable("run_setup", {})
+
+    rng = np.random.default_rng(0)
+    n = 2000
+    df = pd.DataFrame({
+        "parcel_size": rng.uniform(2000, 80000, n),
+        "land_cost": rng.uniform(1e5, 5e6, n),
+        "max_far": rng.choice([np.nan, 1., 2., 4.], n),
+        "max_height": rng.choice([np.nan, 30., 60., 120.], n),
+        "max_dua": rng.choice([np.nan, 20., 60., 150.], n),
+        "ave_unit_size": rng.uniform(700, 1500, n),
+        "total_sqft": rng.integers(0, 20000, n).astype(float),
+        "juris": rng.choice(["oakland", "berkeley"], n),
+        "oldest_building": rng.integers(1900, 2020, n)
+    }, index=pd.Index(rng.permutation(n) + 1, name="parcel_id"))
+    df["price"] = rng.uniform(200, 900, n)
+    orca.add_table("parcels", df)
+    return df
+
+
+def _callbacks(df):
+    def price(use):
+        return df.price * (2 if use == "residential" else .05)
+
+    def allowed(form):
+        return pd.Series(df.index % (len(form) + 1) != 0, index=df.index)
+    return price, allowed
+
+
+def _config():
+    # the pro forma modifies its config, so each run gets a new one
+    config = sqftproforma.SqFtProFormaConfig()
+    config.cap_rate = .05
+    return config
+
+
+def _run_both(engine, df, only_built, monkeypatch, year=None):
+    kwargs = dict(parcel_filter="oldest_building > 1920", only_built=only_built,
+                  pass_through=PASS_THROUGH, simple_zoning=True)
+    parcels = orca.get_table("parcels")
+    # count the parcels the engine passes through the pro forma
+    looked_up = []
+    lookup = sqftproforma.SqFtProForma.lookup
+    with monkeypatch.context() as m:
+        m.setattr(sqftproforma.SqFtProForma, "lookup",
+                  lambda self, form, df, **kw: looked_up.append(len(df)) or lookup(self, form, df, **kw))
+        actual = engine.run("alt", parcels, *_callbacks(df), config=_config(), year=year, **kwargs)
+    utils.run_feasibility(parcels, *_callbacks(df), config=_config(), **kwargs)
+    return actual, orca.get_table("feasibility").to_frame(), sum(looked_up)
+
+
+@pytest.mark.parametrize("only_built", [True, False])
+def test_feasibility_engine_matches_run_feasibility(parcels, only_built, monkeypatch):
+    engine = feasibility.FeasibilityEngine()
+    df = parcels
+    looked_up = []
+    for year in range(3):
+        actual, expected, n = _run_both(engine, df, only_built, monkeypatch)
+        pd.testing.assert_frame_equal(actual, expected)
+        looked_up.append(n)
+
+        # prices move and some parcels are developed
+        df = df.copy()
+        df.loc[df.index[year::50], "price"] *= 1.2
+        df.loc[df.index[year::70], "total_sqft"] += 5000
+        df.loc[df.index[year::90], "oldest_building"] = 1910
+        orca.add_table("parcels", df)
+
+    # the later runs only looked up the changed parcels
+    assert max(looked_up[1:]) < looked_up[0] / 5
+
+
+def test_feasibility_engine_building_changes(parcels, monkeypatch):
+    # total_sqft marks redeveloped parcels dirty without being passed through
+    engine = feasibility.FeasibilityEngine()
+    kwargs = dict(parcel_filter="oldest_building > 1920", only_built=False, pass_through=["juris"])
+    engine.run("alt", orca.get_table("parcels"), *_callbacks(parcels), config=_config(), **kwargs)
+
+    df = parcels.copy()
+    df.loc[df.index[::100], "total_sqft"] += 5000
+    orca.add_table("parcels", df)
+    looked_up = []
+    lookup = sqftproforma.SqFtProForma.lookup
+    monkeypatch.setattr(sqftproforma.SqFtProForma, "lookup",
+                        lambda self, form, df, **kw: looked_up.append(len(df)) or lookup(self, form, df, **kw))
+    engine.run("alt", orca.get_table("parcels"), *_callbacks(df), config=_config(), **kwargs)
+    assert 0 < sum(looked_up) <= len(df.index[::100]) * len(_config().forms)
+
+
+def test_feasibility_engine_price_tolerance(parcels, monkeypatch):
+    engine = feasibility.FeasibilityEngine(price_tolerance=.05)
+    checked = feasibility.FeasibilityEngine(price_tolerance=.05, parity_check=True)
+    df = parcels
+    looked_up = []
+    for year in range(2020, 2040, 5):
+        actual, expected, n = _run_both(engine, df, False, monkeypatch, year)
+        looked_up.append(n)
+        checked.run("alt", orca.get_table("parcels"), *_callbacks(df), config=_config(), year=year,
+                    parcel_filter="oldest_building > 1920", only_built=False,
+                    pass_through=PASS_THROUGH, simple_zoning=True)
+
+        if n < looked_up[0]:
+            # the reused parcels are only off by the drift since they were
+            # last looked up, and the pass through columns are current
+            assert checked.parity["residential"]["missing"] == 0
+            assert checked.parity["residential"]["max_profit_max_diff"] > 0
+            pd.testing.assert_series_equal(actual[("residential", "residential")],
+                                           expected[("residential", "residential")])
+
+        # prices drift by 2% a year, and a few parcels jump
+        df = df.copy()
+        df["price"] *= 1.02
+        df.loc[df.index[::40], "price"] *= 1.5
+        orca.add_table("parcels", df)
+
+    # only the jumps are looked up until the drift passes the tolerance
+    assert looked_up[1] < looked_up[0] / 5
+    assert looked_up[3] == looked_up[0]
+
+
+def test_feasibility_engine_full_recompute(parcels, monkeypatch):
+    engine = feasibility.FeasibilityEngine(price_tolerance=1., full_recompute_every=10)
+    looked_up = []
+    for year in range(2020, 2040, 5):
+        looked_up.append(_run_both(engine, parcels, False, monkeypatch, year)[2])
+    assert looked_up[0] == looked_up[2] > 0
+    assert looked_up[1] == looked_up[3] == 0
+
+
+def test_feasibility_engine_workers(parcels, monkeypatch):
+    monkeypatch.setattr(feasibility, "MIN_CHUNK_SIZE", 100)
+    kwargs = dict(parcel_filter="oldest_building > 1920", only_built=False,
+                  pass_through=PASS_THROUGH, simple_zoning=True)
+    serial = feasibility.FeasibilityEngine().run(
+        "alt", orca.get_table("parcels"), *_callbacks(parcels), config=_config(), **kwargs)
+    parallel = feasibility.FeasibilityEngine(workers=2).run(
+        "alt", orca.get_table("parcels"), *_callbacks(parcels), config=_config(), **kwargs)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+def test_feasibility_engine_workers_started_lazily(parcels, monkeypatch):
+    monkeypatch.setattr(feasibility, "MIN_CHUNK_SIZE", 100)
+    engine = feasibility.FeasibilityEngine(workers=2)
+    kwargs = dict(parcel_filter="oldest_building > 1920", only_built=False, pass_through=PASS_THROUGH)
+    engine.run("alt", orca.get_table("parcels"), *_callbacks(parcels), config=_config(), **kwargs)
+
+    # nothing changed, so there's nothing to fork workers for
+    monkeypatch.setattr(engine, "_start_pool", None)
+    engine.run("alt", orca.get_table("parcels"), *_callbacks(parcels), config=_config(), **kwargs)
+
+
+def test_feasibility_engine_workers_without_fork(parcels, monkeypatch):
+    monkeypatch.setattr(feasibility.multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    monkeypatch.setattr(feasibility, "ProcessPoolExecutor", None)
+    engine = feasibility.FeasibilityEngine(workers=2)
+    engine.run("alt", orca.get_table("parcels"), *_callbacks(parcels), config=_config(),
+               parcel_filter="oldest_building > 1920", only_built=False, pass_through=PASS_THROUGH)
+    assert engine.workers == 1
+
+
+def test_feasibility_engine_cap_rate(parcels, monkeypatch):
+    # the cap rate is reset every year, which is a change in prices rather
+    # than a new pro forma
+    engine = feasibility.FeasibilityEngine(price_tolerance=.05)
+    exact = feasibility.FeasibilityEngine()
+    kwargs = dict(parcel_filter="oldest_building > 1920", only_built=False, pass_through=PASS_THROUGH)
+    looked_up = []
+    lookup = sqftproforma.SqFtProForma.lookup
+    monkeypatch.setattr(sqftproforma.SqFtProForma, "lookup",
+                        lambda self, form, df, **kw: looked_up.append(len(df)) or lookup(self, form, df, **kw))
+    sizes = []
+    for year, cap_rate in enumerate([.05, .051, .0505, .052]):
+        config = _config()
+        config.cap_rate = cap_rate
+        del looked_up[:]
+        engine.run("alt", orca.get_table("parcels"), *_callbacks(parcels), config=config, year=year, **kwargs)
+        if year:
+            assert sum(looked_up) == 0
+        sizes.append((len(engine._cache), len(engine._proformas)))
+
+        config = _config()
+        config.cap_rate = cap_rate
+        actual = exact.run("alt", orca.get_table("parcels"), *_callbacks(parcels), config=config, **kwargs)
+        config = _config()
+        config.cap_rate = cap_rate
+        utils.run_feasibility(orca.get_table("parcels"), *_callbacks(parcels), config=config, **kwargs)
+        pd.testing.assert_frame_equal(actual, orca.get_table("feasibility").to_frame())
+    assert len(set(sizes)) == 1
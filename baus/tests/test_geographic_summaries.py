@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from ..summaries import geographic_summaries
+
+
+def _frames(seed):
+    rng = np.random.default_rng(seed)
+
+    def geographies(n):
+        juris = rng.choice(["oakland", "berkeley", "alameda", None], n, p=[.4, .3, .29, .01])
+        county = np.where(rng.random(n) < .02, np.nan, rng.integers(1, 4, n).astype(float))
+        return {"juris": juris, "superdistrict": rng.integers(1, 8, n), "county": county,
+                "subregion": rng.choice(["north", "south"], n)}
+
+    households = pd.DataFrame(dict(geographies(3000), base_income_quartile=rng.integers(1, 5, 3000)))
+    jobs = pd.DataFrame(dict(geographies(2000), empsix=rng.choice(geographic_summaries.EMPSIX + ["OTHER"], 2000),
+                             ec5_cat=rng.choice(["Transit_Hub", "Other"], 2000)))
+    buildings = pd.DataFrame(dict(
+        geographies(500),
+        profit_adjustment_tier=rng.choice(["tier1", "tier2", None], 500, p=[.3, .6, .1]),
+        building_type=rng.choice(["HS", "HT", "HM", "MR", "OF", "RS"], 500),
+        residential_units=rng.integers(0, 50, 500),
+        deed_restricted_units=rng.integers(0, 5, 500).astype(float),
+        non_residential_sqft=rng.integers(0, 10000, 500) * 1.5,
+        job_spaces=rng.integers(0, 30, 500).astype(float),
+        vacant_job_spaces=rng.integers(0, 5, 500).astype(float)))
+    return households, jobs, buildings
+
+
+def _legacy_summaries(households_df, jobs_df, buildings_df):
+    # the per column groupbys summarize_by_geography replaced
+    out = {}
+    for geography in ['juris', 'superdistrict', 'county', 'subregion']:
+        buildings_df = buildings_df[~pd.isna(buildings_df[geography])]
+        households_df = households_df[~pd.isna(households_df[geography])]
+        jobs_df = jobs_df[~pd.isna(jobs_df[geography])]
+
+        summary_table = pd.DataFrame(index=buildings_df[geography].unique())
+        summary_table['tothh'] = households_df.groupby(geography).size()
+        for quartile in [1, 2, 3, 4]:
+            summary_table['hhincq'+str(quartile)] = households_df[households_df.base_income_quartile == quartile].groupby(geography).size()
+        summary_table['residential_units'] = buildings_df.groupby(geography).residential_units.sum()
+        summary_table['deed_restricted_units'] = buildings_df.groupby(geography).deed_restricted_units.sum()
+        summary_table['sfdu'] = buildings_df[(buildings_df.building_type == 'HS') | (buildings_df.building_type == 'HT')].\
+            groupby(geography).residential_units.sum()
+        summary_table['mfdu'] = buildings_df[(buildings_df.building_type == 'HM') | (buildings_df.building_type == 'MR')].\
+            groupby(geography).residential_units.sum()
+        for tier_nme in buildings_df.profit_adjustment_tier.unique():
+            summary_table[f'residential_units_{tier_nme}'] = (
+                buildings_df.query('profit_adjustment_tier==@tier_nme').groupby(geography).residential_units.sum())
+        summary_table['totemp'] = jobs_df.groupby(geography).size()
+        for empsix in ['AGREMPN', 'MWTEMPN', 'RETEMPN', 'FPSEMPN', 'HEREMPN', 'OTHEMPN']:
+            summary_table[empsix] = jobs_df[jobs_df.empsix == empsix].groupby(geography).size()
+        summary_table['transit_hub_jobs'] = jobs_df.query('ec5_cat=="Transit_Hub" ').groupby(geography).size()
+        summary_table['non_residential_sqft'] = buildings_df.groupby(geography)['non_residential_sqft'].sum().round(0)
+        summary_table['non_residential_sqft_office'] = buildings_df.query('building_type=="OF"').groupby(geography)['non_residential_sqft'].sum().round(0)
+        summary_table['job_spaces'] = buildings_df.groupby(geography)['job_spaces'].sum().round(0)
+        summary_table['job_spaces_vacant'] = buildings_df.groupby(geography)['vacant_job_spaces'].sum().round(0)
+        summary_table['job_spaces_office'] = buildings_df.query('building_type=="OF"').groupby(geography)['job_spaces'].sum().round(0)
+        summary_table['job_spaces_office_vacant'] = buildings_df.query('building_type=="OF"').groupby(geography)['vacant_job_spaces'].sum().round(0)
+        summary_table.index.name = geography
+        out[geography] = summary_table.sort_index().fillna(0).to_csv()
+    return out
+
+
+def test_summarize_by_geography_matches_groupbys():
+    for seed in range(3):
+        households, jobs, buildings = _frames(seed)
+        expected = _legacy_summaries(households, jobs, buildings)
+
+        tables = {'households': households, 'jobs': jobs, 'buildings': buildings}
+        for geography, groups, columns in geographic_summaries.summarize_by_geography(
+                tables, ['juris', 'superdistrict', 'county', 'subregion']):
+            summary_table = pd.DataFrame(index=groups['buildings'])
+            for name, values in columns:
+                summary_table[name] = values
+            summary_table.index.name = geography
+            assert summary_table.sort_index().fillna(0).to_csv() == expected[geography]
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from urbansim import accounts
+
+from .. import ledger
+
+
+def _post(acct):
+    acct.add_transaction(1000., subaccount=1, metadata={"description": "fees", "year": 2025})
+    acct.add_transaction(-250., subaccount=1, metadata={"description": "Developing subsidized building",
+                                                          "year": 2025, "building_id": 7,
+                                                          "residential_units": 30, "juris": "oakland"})
+    acct.add_transaction(500., subaccount="regional", metadata={"description": "fees", "year": 2030})
+
+
+def test_ledger_matches_account():
+    acct, led = accounts.Account("a"), ledger.Ledger("a")
+    _post(acct)
+    _post(led)
+
+    assert led.balance == acct.balance
+    assert led.total_transactions() == acct.total_transactions()
+    assert list(led.iter_subaccounts()) == list(acct.iter_subaccounts())
+    pd.testing.assert_frame_equal(led.to_frame(), acct.to_frame(), check_dtype=False,
+                                  check_categorical=False)
+
+
+def test_ledger_batches(tmp_path):
+    led = ledger.Ledger("a")
+    _post(led)
+    amounts = -np.arange(1, 1001, dtype=float)
+    led.add_batch(amounts, subaccount="regional",
+                  metadata={"description": "Developing subsidized office building", "year": 2030,
+                            "parcel_id": np.arange(1000)})
+
+    assert len(led) == 1003
+    assert led.total_transactions_by_subacct("regional") == 500 + amounts.sum()
+    assert led.total_transactions_by_subacct(1) == 750
+
+    led.to_parquet(tmp_path / "a.parquet")
+    df = pd.read_parquet(tmp_path / "a.parquet")
+    assert len(df) == 1003
+    assert df.amount.sum() == led.balance
+    assert (df.description == "Developing subsidized office building").sum() == 1000
+    assert sorted(df.subaccount.unique()) == ["1", "regional"]
+
+
+def test_ledger_batch_schema():
+    single, batched = ledger.Ledger("a"), ledger.Ledger("b")
+    for building_id in [3, 4]:
+        single.add_transaction(-10., subaccount=1, metadata={"year": 2030, "building_id": building_id,
+                                                             "residential_units": 5})
+    batched.add_batch([-10., -10.], subaccount=1,
+                      metadata={"year": 2030, "building_id": [3, 4], "residential_units": np.array([5, 5])})
+
+    pd.testing.assert_frame_equal(batched.to_frame(), single.to_frame())
+    assert batched.to_frame().year.dtype == np.float64
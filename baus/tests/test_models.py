@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import orca
+import pytest
+
+from .. import models
+
+
+def _legacy_select_to_target(feasibility, bldgs, target):
+    # the per-candidate loop retail_developer used before the selection was
+    # vectorized
+    devs = []
+    for dev_id, d in feasibility.iterrows():
+        if target <= 0:
+            break
+        target -= d.non_residential_sqft
+        filt = "general_type == 'Retail' and parcel_id == %d" % d["parcel_id"]
+        target += bldgs.query(filt).non_residential_sqft.sum()
+        devs.append(d)
+    return pd.DataFrame(devs, columns=feasibility.columns), target
+
+
+def test_select_to_target_parity():
+    rng = np.random.default_rng(0)
+    bldgs = pd.DataFrame({
+        "parcel_id": rng.integers(0, 100, 400),
+        "non_residential_sqft": rng.integers(0, 30000, 400),
+        "general_type": rng.choice(["Retail", "Office", "Residential"], 400)
+    })
+    feasibility = pd.DataFrame({
+        "parcel_id": rng.permutation(150)[:120],
+        "non_residential_sqft": rng.integers(1000, 40000, 120),
+        "max_profit": rng.random(120)
+    }).sample(frac=1.0, random_state=0)
+
+    # targets met partway, met by the first development, and never met
+    for target in [250000., 1., 1e9, 0.]:
+        devs, remaining = models._select_to_target(feasibility, bldgs, target)
+        legacy, legacy_remaining = _legacy_select_to_target(feasibility, bldgs, target)
+        assert len(devs) == len(legacy)
+        if len(devs):
+            pd.testing.assert_frame_equal(devs, legacy, check_dtype=False)
+        assert remaining == legacy_remaining
+
+
+def test_forms_to_btypes(monkeypatch):
+    for name in ["_INJECTABLES", "_INJECTABLE_CACHE"]:
+        monkeypatch.setattr(orca.orca, name, dict(getattr(orca.orca, name)))
+    orca.add_injectable("mapping", {"form_to_btype": {
+        "residential": ["HS", "HT", "HM"], "industrial": ["IL", "IW", "IH"], "retail": ["RS", "RB"],
+        "office": ["OF"], "mixedresidential": ["MR"], "mixedoffice": ["ME"]}})
+
+    rng = np.random.default_rng(0)
+    n = 1000
+    df = pd.DataFrame({
+        "form": rng.choice(["residential", "industrial", "retail", "office", "mixedresidential",
+                            "mixedoffice", None], n),
+        "residential_units": rng.integers(0, 200, n).astype(float),
+        "parcel_size": rng.uniform(0, 200000, n)
+    }, index=rng.permutation(n))
+    df.loc[df.index[::70], "residential_units"] = np.nan
+
+    func = orca.get_injectable("form_to_btype_func")
+    pd.testing.assert_series_equal(func(df), df.apply(func, axis=1))
+
+    # a NaN form isn't taken as residential the way None is
+    df.loc[df.index[3], "form"] = np.nan
+    with pytest.raises(KeyError):
+        df.apply(func, axis=1)
+    with pytest.raises(KeyError):
+        func(df)
+
+
+def test_developer_columns_callback(monkeypatch):
+    for name in ["_INJECTABLES", "_INJECTABLE_CACHE"]:
+        monkeypatch.setattr(orca.orca, name, dict(getattr(orca.orca, name)))
+    orca.add_injectable("mapping", {"form_to_btype": {"residential": ["HS", "HT", "HM"], "office": ["OF"]}})
+    df = pd.DataFrame({"form": ["residential", "office", None], "residential_units": [1., 0., 100.],
+                       "parcel_size": [43560., 43560., 43560.], "parcel_id": [1, 2, 3]})
+
+    func = orca.get_injectable("form_to_btype_func")
+    callback = models.developer_columns_callback(func, models.add_extra_columns_func)
+    df = callback(df)
+    assert df.building_type_id.tolist() == df.building_type.tolist() == ["HS", "OF", "HM"]
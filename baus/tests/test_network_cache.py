@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+
+from .. import network_cache
+
+
+def _write_network(path, weight=1.0):
+    nodes = pd.DataFrame({"x": [0., 1., 2.], "y": [0., 0., 0.], "osmid": [5, 6, 7]},
+                         index=pd.Index([10, 11, 12], name="node_id"))
+    edges = pd.DataFrame({"from": [10, 11], "to": [11, 12], "weight": [weight, weight],
+                          "CTIMEA": [3., 4.]})
+    with pd.HDFStore(path, "w") as st:
+        st["nodes"] = nodes
+        st["edges"] = edges
+    return nodes, edges
+
+
+def test_network_bundle(tmp_path):
+    nodes, edges = _write_network(tmp_path / "net.h5")
+    cache_dir = tmp_path / "cache"
+
+    for _ in range(2):
+        # the first read writes the bundle, the second reads it back
+        n, e = network_cache.network_bundle(tmp_path / "net.h5", "CTIMEA", cache_dir)
+        pd.testing.assert_frame_equal(n, nodes[["x", "y"]])
+        pd.testing.assert_frame_equal(e, edges[["from", "to", "CTIMEA"]])
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # a changed network gets a bundle of its own
+    _write_network(tmp_path / "net.h5", weight=2.0)
+    st = os.stat(tmp_path / "net.h5")
+    os.utime(tmp_path / "net.h5", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    network_cache.network_bundle(tmp_path / "net.h5", "CTIMEA", cache_dir)
+    assert len(list(cache_dir.iterdir())) == 2
@@ -0,0 +1,95 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from .. import output_writer
+
+
+def _frame(n=1000):
+    return pd.DataFrame({"a": np.arange(n), "b": np.random.default_rng(0).random(n)})
+
+
+def test_output_writer_background(tmp_path):
+    writer = output_writer.OutputWriter()
+    df = _frame()
+    path = writer.write_csv(df, tmp_path / "a.csv", index=False)
+    # the writer has its own copy
+    df["a"] = -1
+    writer.flush()
+    pd.testing.assert_frame_equal(pd.read_csv(path), _frame())
+    writer.close()
+    assert writer.files_written == 1
+
+
+def test_output_writer_compression(tmp_path):
+    writer = output_writer.OutputWriter(compression="gzip")
+    path = writer.write_table(_frame(), tmp_path / "a.csv", index=False)
+    # only the disaggregate tables are compressed
+    assert writer.write_csv(_frame(), tmp_path / "b.csv", index=False) == tmp_path / "b.csv"
+    writer.close()
+    assert path == tmp_path / "a.csv.gz" == writer.table_path(tmp_path / "a.csv")
+    pd.testing.assert_frame_equal(pd.read_csv(path), _frame())
+    pd.testing.assert_frame_equal(writer.read_table(tmp_path / "a.csv"), _frame())
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "b.csv"), _frame())
+
+
+def test_output_writer_bounded(tmp_path, monkeypatch):
+    release = threading.Event()
+    to_csv = pd.DataFrame.to_csv
+
+    def slow_to_csv(self, *args, **kwargs):
+        release.wait()
+        return to_csv(self, *args, **kwargs)
+    monkeypatch.setattr(pd.DataFrame, "to_csv", slow_to_csv)
+
+    writer = output_writer.OutputWriter(max_pending=1)
+    writer.write_csv(_frame(), tmp_path / "a.csv")
+    writer.write_csv(_frame(), tmp_path / "b.csv")
+    # the writer holds one frame and one is waiting, the next has to wait its turn
+    blocked = threading.Thread(target=writer.write_csv, args=(_frame(), tmp_path / "c.csv"))
+    blocked.start()
+    blocked.join(.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join()
+    writer.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.csv", "b.csv", "c.csv"]
+
+
+def test_output_writer_errors(tmp_path):
+    writer = output_writer.OutputWriter()
+    writer.write_csv(_frame(), tmp_path / "missing" / "a.csv")
+    writer.write_csv(_frame(), tmp_path / "b.csv")
+    with pytest.raises(OSError):
+        writer.flush()
+    # the other files are still written
+    assert (tmp_path / "b.csv").exists()
+    writer.close()
+
+
+def _table(n=1000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"building_type": rng.choice(["HS", "HM", "OF"], n),
+                       "source": rng.choice(["cs", 3, None], n),
+                       "residential_units": rng.integers(0, 20, n),
+                       "non_residential_sqft": rng.random(n) * 1000},
+                      index=pd.Index(np.arange(n) + 1, name="building_id"))
+    return df
+
+
+def test_output_writer_parquet_tables(tmp_path):
+    csv = output_writer.OutputWriter()
+    pq = output_writer.OutputWriter(table_format="parquet")
+    for writer in [csv, pq]:
+        writer.write_table(_table(), tmp_path / "building_table_2020.csv")
+    assert pq.table_path(tmp_path / "building_table_2020.csv") == tmp_path / "building_table_2020.parquet"
+
+    expected = csv.read_table(tmp_path / "building_table_2020.csv", index_col="building_id")
+    actual = pq.read_table(tmp_path / "building_table_2020.csv", index_col="building_id")
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    # strings are stored as dictionaries
+    assert pd.read_parquet(tmp_path / "building_table_2020.parquet").building_type.dtype == "category"
+    csv.close()
+    pq.close()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from .. import snapshots
+
+
+def _summary(year):
+    rng = np.random.default_rng(year)
+    df = pd.DataFrame({"name": ["Oakland", "Berkeley", "Alameda"],
+                       "tothh": rng.integers(0, 1000, 3),
+                       "residential_units": rng.random(3) * 1000,
+                       "hhincq1": [1., 2., 0.]},
+                      index=pd.Index([3, 1, 2], name="superdistrict"))
+    return df
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_snapshots_match_csv(tmp_path, spill):
+    snaps = snapshots.YearSnapshots([2020, 2050], tmp_path / "snapshots" if spill else None)
+    for year in [2020, 2035, 2050]:
+        df = _summary(year)
+        df.to_csv(tmp_path / f"summary_{year}.csv")
+        snaps.put("summary", year, df)
+        # an unnamed index comes back the way read_csv names it
+        df.reset_index(drop=True).to_csv(tmp_path / f"unnamed_{year}.csv")
+        snaps.put("unnamed", year, df.reset_index(drop=True))
+
+    assert (tmp_path / "snapshots" / "summary_2050.feather").exists() == spill
+    for year in [2020, 2050]:
+        pd.testing.assert_frame_equal(snaps.get("summary", year),
+                                      pd.read_csv(tmp_path / f"summary_{year}.csv"))
+        pd.testing.assert_frame_equal(snaps.get("summary", year, index_col="superdistrict"),
+                                      pd.read_csv(tmp_path / f"summary_{year}.csv", index_col="superdistrict"))
+        pd.testing.assert_frame_equal(snaps.get("unnamed", year),
+                                      pd.read_csv(tmp_path / f"unnamed_{year}.csv"))
+
+    # the caller gets its own copy
+    snaps.get("summary", 2020)["tothh"] = -1
+    assert (snaps.get("summary", 2020).tothh >= 0).all()
+
+    # years which aren't kept are read back
+    with pytest.raises(KeyError):
+        snaps.get("summary", 2035)
+    df = snaps.get("summary", 2035, read=lambda: pd.read_csv(tmp_path / "summary_2035.csv"))
+    pd.testing.assert_frame_equal(df, _summary(2035).reset_index())
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from .. import subsidies
+
+
+def _legacy_allocate(amounts, budget):
+    # the one at a time walk subsidized_office_developer used before
+    funded = []
+    for amt in amounts:
+        if amt > budget:
+            funded.append(False)
+            continue
+        budget -= amt
+        funded.append(True)
+    return np.array(funded, dtype=bool)
+
+
+def test_allocate_in_order():
+    rng = np.random.default_rng(0)
+    # whole dollars so the running totals are exact
+    amounts = np.round(rng.lognormal(12, 1.5, 5000))
+    for budget in [0., 1e5, 1e7, 1e8, amounts.sum(), 1e12]:
+        np.testing.assert_array_equal(subsidies.allocate_in_order(amounts, budget),
+                                      _legacy_allocate(amounts, budget))
+
+    assert subsidies.allocate_in_order([5., 20., 3., 4.], 10.).tolist() == [True, False, True, False]
+    assert len(subsidies.allocate_in_order([], 10.)) == 0
+
+
+def _legacy_deed_restricted_units(new_buildings):
+    # the per-building loop run_subsidized_developer used before
+    partial_subsidized_units = 0
+    out = {}
+    for index, new_building in new_buildings.iterrows():
+        revenue_per_unit = new_building.building_revenue / new_building.residential_units
+        total_subsidy = abs(new_building.max_profit)
+        subsidized_units = total_subsidy / revenue_per_unit + partial_subsidized_units
+        already_subsidized_units = new_building.deed_restricted_units
+        partial_subsidized_units = subsidized_units % 1
+        subsidized_units = int(subsidized_units) + already_subsidized_units
+        subsidized_units = min(subsidized_units, new_building.residential_units)
+        out[index] = int(round(subsidized_units))
+    return pd.Series(out)
+
+
+def test_subsidized_deed_restricted_units():
+    rng = np.random.default_rng(0)
+    n = 2000
+    residential_units = rng.integers(1, 200, n).astype(float)
+    new_buildings = pd.DataFrame({
+        "residential_units": residential_units,
+        "building_revenue": residential_units * rng.uniform(3e5, 9e5, n),
+        "max_profit": -rng.lognormal(14, 1.5, n),
+        "deed_restricted_units": np.floor(residential_units * rng.random(n) * .2)
+    }, index=rng.permutation(n) + 5000)
+
+    pd.testing.assert_series_equal(subsidies.subsidized_deed_restricted_units(new_buildings),
+                                   _legacy_deed_restricted_units(new_buildings), check_dtype=False)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import orca
+import pytest
+
+from ..summaries import summary_frames
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    for name in ["_TABLES", "_COLUMNS", "_INJECTABLES", "_BROADCASTS", "_TABLE_CACHE",
+                 "_COLUMN_CACHE", "_INJECTABLE_CACHE"]:
+        monkeypatch.setattr(orca.orca, name, {})
+
+    rng = np.random.default_rng(0)
+    parcels = pd.DataFrame({"county": rng.choice(["Alameda", "Marin"], 50),
+                            "zone_id": rng.integers(1, 5, 50)},
+                           index=pd.Index(np.arange(50), name="parcel_id"))
+    parcels_geography = pd.DataFrame({"pda_id": rng.choice(["", "pda1"], 45)},
+                                     index=pd.Index(np.arange(45), name="parcel_id"))
+    buildings = pd.DataFrame({"parcel_id": rng.integers(0, 50, 80),
+                              "zone_id": rng.integers(1, 5, 80),
+                              "residential_units": rng.integers(0, 10, 80)})
+    households = pd.DataFrame({"building_id": rng.integers(0, 80, 300),
+                               "base_income_quartile": rng.integers(1, 5, 300)})
+    for name, df in [("parcels", parcels), ("parcels_geography", parcels_geography),
+                     ("buildings", buildings), ("households", households)]:
+        orca.add_table(name, df)
+    orca.add_column("buildings", "county_units", lambda: buildings.residential_units * 2)
+    orca.broadcast("parcels_geography", "parcels", cast_index=True, onto_index=True)
+    orca.broadcast("parcels", "buildings", cast_index=True, onto_on="parcel_id")
+    orca.broadcast("buildings", "households", cast_index=True, onto_on="building_id")
+    orca.add_injectable("year", 2020)
+
+    calls = []
+    merge_tables = orca.merge_tables
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return merge_tables(*args, **kwargs)
+    monkeypatch.setattr(orca, "merge_tables", counted)
+    return calls
+
+
+REQUESTS = [
+    ("households", ("parcels", "buildings", "households"), ["county", "base_income_quartile"]),
+    ("households", ("parcels", "buildings", "households"), ["zone_id"]),
+    ("households", ("buildings", "households"), ["parcel_id", "base_income_quartile"]),
+    ("households", ("parcels", "buildings", "households", "parcels_geography"), ["pda_id", "county"]),
+    ("buildings", ("buildings", "parcels"), ["residential_units", "county_units", "county"]),
+]
+
+
+def test_summary_frames_match_merge_tables(tables):
+    frames = summary_frames.SummaryFrames({"a": REQUESTS[:2], "b": REQUESTS[2:]})
+    for target, names, columns in REQUESTS + REQUESTS:
+        expected = orca.orca.merge_tables(target, list(names), columns=columns)
+        actual = frames.merge(target, [orca.get_table(t) for t in names], columns=columns)
+        pd.testing.assert_frame_equal(actual[sorted(actual.columns)], expected[sorted(expected.columns)])
+    # one join per distinct set of tables
+    assert len(tables) == 4
+
+
+def test_summary_frames_invalidation(tables):
+    frames = summary_frames.SummaryFrames({"a": REQUESTS[:1]})
+    target, names, columns = REQUESTS[0]
+    frames.merge(target, names, columns)
+    frames.merge(target, names, ["zone_id"])
+    assert len(tables) == 2
+
+    orca.add_injectable("year", 2025)
+    frames.merge(target, names, columns)
+    assert len(tables) == 3
+
+    households = orca.get_table("households").to_frame()
+    orca.add_table("households", households.iloc[:100])
+    assert len(frames.merge(target, names, columns)) == 100
+    assert len(tables) == 4
+
+    frames.enabled = False
+    frames.merge(target, names, columns)
+    frames.merge(target, names, columns)
+    assert len(tables) == 6
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from .. import ual
+
+
+def _legacy_create_empty_units(buildings):
+    # the per-building concatenation _create_empty_units used before it was
+    # vectorized, kept here as the reference for the parity test
+    building_ids = np.repeat(buildings.index.values, buildings.residential_units.fillna(0).values.astype(int))
+    unit_nums = np.tile(np.arange(buildings.residential_units.max().astype(int)), len(buildings.index))[:len(building_ids)]
+
+    deed_restricted_units = buildings.deed_restricted_units.fillna(0).values.astype(int)
+    residential_units = buildings.residential_units.fillna(0).values.astype(int)
+
+    deed_restricted = np.concatenate([
+        np.concatenate([np.ones(dr, dtype=int), np.zeros(ru - dr, dtype=int)])
+        for ru, dr in zip(residential_units, deed_restricted_units)
+    ])
+
+    df = pd.DataFrame({
+        'unit_residential_price': 0.0,
+        'unit_residential_rent': 0.0,
+        'num_units': 1,
+        'building_id': building_ids,
+        'unit_num': unit_nums,
+        'deed_restricted': deed_restricted
+    })
+
+    df = df.sort_values(by=['building_id', 'unit_num']).reset_index(drop=True)
+    df.index.name = 'unit_id'
+    return df
+
+
+def _sample_buildings(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    residential_units = rng.integers(0, 12, n).astype(float)
+    buildings = pd.DataFrame({
+        "residential_units": residential_units,
+        "deed_restricted_units": np.floor(residential_units * rng.random(n))
+    }, index=pd.Index(rng.permutation(n) + 1, name="building_id"))
+    buildings.iloc[::17, 0] = np.nan
+    buildings.iloc[::17, 1] = np.nan
+    buildings.iloc[::13, 1] = np.nan
+    return buildings
+
+
+def test_create_empty_units_parity():
+    buildings = _sample_buildings()
+    units = ual._create_empty_units(buildings)
+    legacy = _legacy_create_empty_units(buildings)
+
+    # the same units with the same ids in the same buildings
+    pd.testing.assert_index_equal(units.index, legacy.index)
+    np.testing.assert_array_equal(units.building_id, legacy.building_id)
+    for col in ["unit_residential_price", "unit_residential_rent", "num_units"]:
+        np.testing.assert_array_equal(units[col], legacy[col])
+    pd.testing.assert_series_equal(units.groupby("building_id").deed_restricted.sum().astype(int),
+                                   legacy.groupby("building_id").deed_restricted.sum())
+
+    # unit_num now counts from zero in every building, and the restricted
+    # units are the first in each building
+    np.testing.assert_array_equal(units.unit_num, units.groupby("building_id").cumcount())
+    dr = buildings.deed_restricted_units.fillna(0).reindex(units.building_id).values
+    np.testing.assert_array_equal(units.deed_restricted, units.unit_num < dr)
+
+
+def test_create_empty_units_matches_households():
+    buildings = _sample_buildings()
+    units = ual._create_empty_units(buildings)
+
+    # fill every building with as many households as it has units
+    households = pd.DataFrame({"building_id": np.append(units.building_id.values, [-1, -1])})
+    households = ual.match_households_to_units(households, units)
+    placed = households[households.building_id != -1]
+    assert placed.unit_id.is_unique
+    np.testing.assert_array_equal(units.loc[placed.unit_id.astype(int), "building_id"].values,
+                                  placed.building_id.values)
+    assert (households[households.building_id == -1].unit_id == -1).all()
+
+
+def _legacy_match_households_to_units(households, residential_units):
+    # the MultiIndex lookup match_households_to_units used before it was
+    # vectorized
+    units = residential_units
+    hh = households
+
+    unit_lookup = units.reset_index().set_index(['building_id', 'unit_num'])
+    hh = hh.sort_values(by=['building_id'], ascending=True)
+
+    building_counts = hh.building_id.value_counts().sort_index()
+    hh['unit_num'] = np.concatenate(
+        [np.arange(i) for i in building_counts.values])
+
+    unplaced = hh[hh.building_id == -1].index
+    placed = hh[hh.building_id != -1].index
+
+    indexes = [tuple(t) for t in
+               hh.loc[placed, ['building_id', 'unit_num']].values]
+
+    hh.loc[placed, 'unit_id'] = unit_lookup.loc[indexes].unit_id.values
+    hh.loc[unplaced, 'unit_id'] = -1
+
+    return hh
+
+
+def test_match_households_to_units_parity():
+    units = ual._create_empty_units(_sample_buildings())
+    rng = np.random.default_rng(1)
+    # fill about half of the units and leave some households unplaced
+    building_id = units.building_id.sample(len(units) // 2, random_state=1).values
+    households = pd.DataFrame({"building_id": np.append(building_id, [-1] * 20),
+                               "persons": rng.integers(1, 5, len(building_id) + 20)},
+                              index=pd.Index(rng.permutation(len(building_id) + 20), name="household_id"))
+
+    matched = ual.match_households_to_units(households, units)
+    legacy = _legacy_match_households_to_units(households, units)
+    pd.testing.assert_frame_equal(matched, legacy, check_dtype=False)
+
+
+def test_match_households_to_units_overfull():
+    units = ual._create_empty_units(pd.DataFrame(
+        {"residential_units": [2, 1], "deed_restricted_units": [0, 0]}, index=[5, 6]))
+    households = pd.DataFrame({"building_id": [5, 5, 5, 6, 7, -1]}, index=range(10, 16))
+
+    # one of the three households in building 5 and the household in the
+    # building with no units are unplaced
+    hh = ual.match_households_to_units(households, units)
+    assert sorted(hh.unit_id) == [-1, -1, -1, 0, 1, 2]
+    assert sorted(hh.building_id) == [-1, -1, -1, 5, 5, 6]
+    assert (hh.building_id == -1).equals(hh.unit_id == -1)
+
+
+def test_match_households_to_units_no_units():
+    units = ual._create_empty_units(pd.DataFrame(
+        {"residential_units": [0], "deed_restricted_units": [0]}, index=[5]))
+    households = pd.DataFrame({"building_id": [5, -1]}, index=[10, 11])
+
+    hh = ual.match_households_to_units(households, units)
+    assert len(units) == 0
+    assert hh.unit_id.tolist() == [-1, -1]
+    assert hh.building_id.tolist() == [-1, -1]
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import orca
+import pytest
+from urbansim.models import RegressionModel
+from urbansim_defaults import utils
+
+from .. import ual, unit_blocks
+
+
+@pytest.fixture
+def units(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ["_TABLES", "_COLUMNS", "_INJECTABLES", "_TABLE_CACHE",
+                 "_COLUMN_CACHE", "_INJECTABLE_CACHE"]:
+        monkeypatch.setattr(orca.orca, name, {})
+    orca.add_table("residential_unit_blocks", unit_blocks.residential_unit_blocks, cache=False)
+    # the config is known to be a regression, yaml_to_class trips on newer pyyaml
+    monkeypatch.setattr(utils, "yaml_to_class", lambda cfg: RegressionModel)
+
+    rng = np.random.default_rng(0)
+    n = 200
+    residential_units = rng.integers(0, 30, n).astype(float)
+    buildings = pd.DataFrame({
+        "residential_units": residential_units,
+        "deed_restricted_units": np.floor(residential_units * rng.random(n) * .3),
+        "sqft_per_unit": rng.uniform(500, 2000, n),
+        "logsum": rng.uniform(-1, 1, n)
+    }, index=pd.Index(np.arange(n) + 1, name="building_id"))
+    orca.add_table("buildings", buildings)
+
+    units = ual._create_empty_units(buildings)
+    units["tenure"] = rng.choice(["own", "rent"], len(units))
+    orca.add_table("residential_units", units)
+    orca.broadcast("buildings", "residential_units", cast_index=True, onto_on="building_id")
+    orca.add_table("households", pd.DataFrame(
+        {"unit_id": np.append(rng.choice(units.index, len(units) // 2, replace=False), [-1, -1])}))
+
+    # a price hedonic on building columns
+    (tmp_path / "configs" / "hedonics").mkdir(parents=True)
+    model = RegressionModel(None, ["logsum > -.5"], "price ~ sqft_per_unit + logsum", name="rsh")
+    model.fit(buildings.assign(price=rng.uniform(100, 1000, n)))
+    model.to_yaml(str_or_buffer=str(tmp_path / "configs" / "hedonics" / "rsh.yaml"))
+    return units
+
+
+def test_units_to_blocks(units):
+    blocks = orca.get_table("residential_unit_blocks").to_frame()
+    buildings = orca.get_table("buildings").to_frame()
+
+    by_building = blocks.groupby("building_id")["count"].sum()
+    pd.testing.assert_series_equal(by_building, buildings.residential_units[buildings.residential_units > 0]
+                                   .astype(int), check_names=False)
+    assert blocks.occupied.sum() == len(units) // 2
+    assert (blocks.vacant_units == blocks["count"] - blocks.occupied).all()
+    # far fewer blocks than units
+    assert len(blocks) <= 4 * len(buildings) < len(units)
+
+
+def test_units_to_blocks_missing_keys():
+    units = pd.DataFrame({"building_id": [1, 1, 1, 2], "num_units": 1,
+                          "tenure": ["own", None, None, "rent"], "deed_restricted": [0, 0, 0, 1]},
+                         index=pd.Index([10, 11, 12, 13], name="unit_id"))
+    blocks, block_id = unit_blocks.units_to_blocks(units, pd.Series([1], index=[11]))
+
+    assert block_id.tolist() == [0, 1, 1, 2]
+    assert blocks.tenure.tolist() == ["own", None, "rent"]
+    assert blocks["count"].tolist() == [1, 2, 1]
+    assert blocks.occupied.tolist() == [0, 1, 0]
+
+
+def test_block_hedonic_simulate(units):
+    buildings = orca.get_table("buildings")
+    units["unit_residential_price"] = -1.0
+    orca.add_table("residential_units", units.copy())
+    unit_blocks.block_hedonic_simulate("hedonics/rsh.yaml", orca.get_table("residential_units"),
+                                       [buildings], "unit_residential_price")
+    actual = orca.get_table("residential_units").unit_residential_price
+
+    orca.add_table("residential_units", units.copy())
+    utils.hedonic_simulate("hedonics/rsh.yaml", orca.get_table("residential_units"),
+                           [buildings], "unit_residential_price")
+    expected = orca.get_table("residential_units").unit_residential_price
+
+    pd.testing.assert_series_equal(actual, expected)
+    # units filtered out of the prediction keep their price
+    assert (actual == -1).any() and (actual > -1).any()
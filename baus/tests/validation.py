@@ -74,6 +74,27 @@ def check_residential_units(residential_units, buildings):
     )
 
 
+def check_residential_unit_blocks(residential_unit_blocks, buildings):
+    print("Check residential unit blocks")
+
+    # the same checks as check_residential_units, on the blocks of units
+    blocks = residential_unit_blocks.to_frame(["building_id", "deed_restricted", "count"])
+    counts = blocks["count"].groupby(blocks.building_id).sum()
+    assert counts.sum() == buildings.residential_units.sum()
+
+    assert_series_equal(
+        buildings.residential_units[
+            buildings.residential_units > 0].sort_index(),
+        counts[counts > 0].sort_index()
+    )
+
+    assert_series_equal(
+        buildings.deed_restricted_units[
+            buildings.residential_units > 0].sort_index(),
+        (blocks["count"] * blocks.deed_restricted).groupby(blocks.building_id).sum()[counts > 0].sort_index()
+    )
+
+
 # make sure everyone gets a house - this might not exist in the real world,
 # but due to the nature of control totals it exists here
 def check_no_unplaced_households(households, year):
@@ -104,13 +125,16 @@ def check_unit_ids_match_building_ids(households, residential_units):
 
 @orca.step()
 def simulation_validation(buildings, households, jobs, residential_units, year,
-                          household_controls, employment_controls, mapping):
+                          household_controls, employment_controls, mapping, run_setup):
 
     check_job_controls(jobs, employment_controls, year, mapping)
 
     check_household_controls(households, household_controls, year)
 
-    check_residential_units(residential_units, buildings)
+    if run_setup.get("block_hedonics", False):
+        check_residential_unit_blocks(orca.get_table("residential_unit_blocks"), buildings)
+    else:
+        check_residential_units(residential_units, buildings)
 
     check_no_unplaced_households(households, year)
 
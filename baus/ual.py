@@ -12,6 +12,7 @@ from urbansim.developer.developer import Developer as dev
 from urbansim.models.relocation import RelocationModel
 from urbansim.utils import misc
 from urbansim_defaults import utils
+from baus import unit_blocks
 
 import logging
 
@@ -45,31 +46,34 @@ def _create_empty_units(buildings):
         Table of units, to be processed within an orca step
     """
 
-    
     assert np.all(buildings.residential_units.fillna(0) >=
                   buildings.deed_restricted_units.fillna(0))
-                  
-    building_ids = np.repeat(buildings.index.values, buildings.residential_units.fillna(0).values.astype(int))
-    unit_nums = np.tile(np.arange(buildings.residential_units.max().astype(int)), len(buildings.index))[:len(building_ids)]
 
-    deed_restricted_units = buildings.deed_restricted_units.fillna(0).values.astype(int)
-    residential_units = buildings.residential_units.fillna(0).values.astype(int)
+    # fan each building out into its units in building_id order, so the
+    # units table comes out sorted by building and unit_num
+    order = np.argsort(buildings.index.values, kind='stable')
+    residential_units = buildings.residential_units.fillna(0).values.astype(int)[order]
+    deed_restricted_units = buildings.deed_restricted_units.fillna(0).values.astype(int)[order]
 
-    deed_restricted = np.concatenate([
-        np.concatenate([np.ones(dr, dtype=int), np.zeros(ru - dr, dtype=int)])
-        for ru, dr in zip(residential_units, deed_restricted_units)
-    ])
+    building_ids = np.repeat(buildings.index.values[order], residential_units)
+
+    # the rank of each unit within its building is its position less the
+    # position of its building's first unit
+    first_unit = np.cumsum(residential_units) - residential_units
+    unit_nums = (np.arange(len(building_ids)) -
+                 np.repeat(first_unit, residential_units)).astype(np.int32)
+
+    # the first deed_restricted_units units of each building are restricted
+    deed_restricted = (unit_nums < np.repeat(deed_restricted_units, residential_units)).astype(np.int8)
 
     df = pd.DataFrame({
         'unit_residential_price': 0.0,
         'unit_residential_rent': 0.0,
-        'num_units': 1,
+        'num_units': np.ones(len(building_ids), dtype=np.int8),
         'building_id': building_ids,
         'unit_num': unit_nums,
         'deed_restricted': deed_restricted
     })
-
-    df = df.sort_values(by=['building_id', 'unit_num']).reset_index(drop=True)
     df.index.name = 'unit_id'
     return df
 
@@ -79,9 +83,8 @@ def match_households_to_units(households, residential_units):
     This initialization step adds a 'unit_id' to the households table and
     populates it based on existing assignments of households to buildings.
     This also allows us to add a 'vacant_units' count to the residential_units
-    table.  FSF note: this won't work if there are more households in a
-    building than there are units in that building - make sure not to have
-    overfull buildings.
+    table.  Households beyond the number of units in an overfull building
+    are logged and left unplaced, with building_id and unit_id of -1.
 
     Data expectations
     -----------------
@@ -101,24 +104,40 @@ def match_households_to_units(households, residential_units):
           'residential_units' table)
     """
     units = residential_units
-    hh = households
-
-    # This code block is from Fletcher
-    unit_lookup = units.reset_index().set_index(['building_id', 'unit_num'])
-    hh = hh.sort_values(by=['building_id'], ascending=True)
-
-    building_counts = hh.building_id.value_counts().sort_index()
-    hh['unit_num'] = np.concatenate(
-        [np.arange(i) for i in building_counts.values])
-
-    unplaced = hh[hh.building_id == -1].index
-    placed = hh[hh.building_id != -1].index
+    hh = households.sort_values(by=['building_id'], ascending=True)
+
+    # number the households within each building, as the units are numbered
+    bldg = hh.building_id.values
+    first_hh = np.flatnonzero(np.r_[True, bldg[1:] != bldg[:-1]])
+    hh['unit_num'] = (np.arange(len(hh)) -
+                      np.repeat(first_hh, np.diff(np.r_[first_hh, len(hh)]))).astype(np.int32)
+
+    # look units up by a single int64 key of building and unit number
+    unit_num_span = int(np.max(np.r_[units.unit_num.values, hh.unit_num.values, 0])) + 1
+    unit_keys = units.building_id.values.astype(np.int64) * unit_num_span + units.unit_num.values
+    order = np.argsort(unit_keys, kind='stable')
+    unit_keys = unit_keys[order]
+
+    hh_keys = bldg.astype(np.int64) * unit_num_span + hh.unit_num.values
+    placed = bldg != -1
+    unit_id = np.full(len(hh), -1, dtype=np.int64)
+    if len(unit_keys) == 0:
+        # no units to match to
+        matched = np.zeros(len(hh), dtype=bool)
+    else:
+        pos = np.minimum(np.searchsorted(unit_keys, hh_keys), len(unit_keys) - 1)
+        matched = placed & (unit_keys[pos] == hh_keys)
+        unit_id[matched] = units.index.values[order][pos[matched]]
 
-    indexes = [tuple(t) for t in
-               hh.loc[placed, ['building_id', 'unit_num']].values]
+    # households in buildings without enough units are left unplaced rather
+    # than failing the lookup
+    overfull = placed & ~matched
+    if overfull.any():
+        logger.warning("match_households_to_units: {:,} households in {:,} overfull buildings are "
+                       "unplaced".format(overfull.sum(), len(np.unique(bldg[overfull]))))
+        hh.loc[overfull, 'building_id'] = -1
 
-    hh.loc[placed, 'unit_id'] = unit_lookup.loc[indexes].unit_id.values
-    hh.loc[unplaced, 'unit_id'] = -1
+    hh['unit_id'] = unit_id
 
     return hh
 
@@ -740,7 +759,7 @@ def _mtc_clip(table, col_name, price_settings, price_scale=1):
 
 
 @orca.step()
-def rsh_simulate(residential_units, aggregations, price_settings):
+def rsh_simulate(residential_units, aggregations, price_settings, run_setup):
     """
     Hedonic model that generates unit-level price predictions using MTC's model specification from rsh.yaml;
     stores the price value in the "unit_residential_price' column of the "residential_units" table.
@@ -750,17 +769,21 @@ def rsh_simulate(residential_units, aggregations, price_settings):
     -----------------
     - tk
     """
-    utils.hedonic_simulate(cfg='hedonics/rsh.yaml',
-                           tbl=residential_units,
-                           join_tbls=aggregations,
-                           out_fname='unit_residential_price')
+    # with unit blocks the price is predicted once for each block of
+    # identical units
+    hedonic_simulate = unit_blocks.block_hedonic_simulate if run_setup.get("block_hedonics", False) \
+        else utils.hedonic_simulate
+    hedonic_simulate(cfg='hedonics/rsh.yaml',
+                     tbl=residential_units,
+                     join_tbls=aggregations,
+                     out_fname='unit_residential_price')
 
     _mtc_clip(residential_units, 'unit_residential_price', price_settings)
     return
 
 
 @orca.step()
-def rrh_simulate(residential_units, aggregations, price_settings):
+def rrh_simulate(residential_units, aggregations, price_settings, run_setup):
     """
     Hedonic model that generages unit-level rent predictions using MTC's model specification from rrh.yaml;
     stores the price value in the "unit_residential_rent' column of the "residential_units" table.
@@ -770,10 +793,14 @@ def rrh_simulate(residential_units, aggregations, price_settings):
     -----------------
     - tk
     """
-    utils.hedonic_simulate(cfg='hedonics/rrh.yaml',
-                           tbl=residential_units,
-                           join_tbls=aggregations,
-                           out_fname='unit_residential_rent')
+    # with unit blocks the price is predicted once for each block of
+    # identical units
+    hedonic_simulate = unit_blocks.block_hedonic_simulate if run_setup.get("block_hedonics", False) \
+        else utils.hedonic_simulate
+    hedonic_simulate(cfg='hedonics/rrh.yaml',
+                     tbl=residential_units,
+                     join_tbls=aggregations,
+                     out_fname='unit_residential_rent')
 
     _mtc_clip(residential_units, 'unit_residential_rent', price_settings, price_scale=0.05/12)  
     return
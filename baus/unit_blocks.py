@@ -0,0 +1,97 @@
+from __future__ import print_function
+
+import numpy as np
+import pandas as pd
+import orca
+from urbansim.utils import misc
+from urbansim_defaults import utils
+
+import logging
+
+# Get a logger specific to this module
+logger = logging.getLogger(__name__)
+
+# units which share these are interchangeable, apart from who lives in them.
+# with block_hedonics in run_setup the hedonics and validation run on blocks,
+# which saves time but not memory - the location choice models still choose
+# (and take their supply and vacancies) from residential_units since
+# households are placed in units by unit_id
+BLOCK_KEYS = ["building_id", "tenure", "deed_restricted"]
+
+
+def units_to_blocks(units, occupied=None):
+    """
+    Collapse the residential units into blocks of identical units.
+
+    Parameters
+    ----------
+    units : DataFrame
+        The residential units, with building_id and num_units and, if they've
+        been assigned yet, tenure and deed_restricted
+    occupied : Series, optional
+        Number of households in each unit, indexed by unit_id
+
+    Returns
+    -------
+    blocks : DataFrame
+        One row per block, indexed by block_id, with the block keys, the
+        number of units (count), the occupied units and the vacant units
+    block_id : Series
+        The block of each unit, indexed by unit_id
+    """
+    keys = [k for k in BLOCK_KEYS if k in units.columns]
+    # groupby drops missing keys, so they're filled with a value which sorts
+    # after the others - the blocks keep the unfilled values
+    filled = pd.DataFrame({k: units[k].fillna(np.inf if pd.api.types.is_numeric_dtype(units[k]) else u"\uffff")
+                           for k in keys})
+    block_id = filled.groupby(keys, sort=True).ngroup().values
+
+    blocks = units[keys].iloc[np.unique(block_id, return_index=True)[1]].reset_index(drop=True)
+    blocks.index.name = "block_id"
+    blocks["count"] = np.bincount(block_id, weights=units.num_units.values).astype(int)
+    if occupied is None:
+        occupied = np.zeros(len(units))
+    else:
+        occupied = occupied.reindex(units.index, fill_value=0).values
+    blocks["occupied"] = np.bincount(block_id, weights=occupied, minlength=len(blocks)).astype(int)
+    blocks["vacant_units"] = blocks["count"] - blocks.occupied
+
+    return blocks, pd.Series(block_id, index=units.index)
+
+
+@orca.table(cache=False)
+def residential_unit_blocks(residential_units, households):
+    units = residential_units.to_frame(["num_units"] + [k for k in BLOCK_KEYS if k in residential_units.columns])
+    unit_id = households.unit_id
+    return units_to_blocks(units, unit_id[unit_id != -1].value_counts())[0]
+
+
+orca.broadcast('buildings', 'residential_unit_blocks', cast_index=True, onto_on='building_id')
+orca.broadcast('buildings', 'hedonic_unit_blocks', cast_index=True, onto_on='building_id')
+
+
+def block_hedonic_simulate(cfg, tbl, join_tbls, out_fname):
+    """
+    Drop in for urbansim_defaults.utils.hedonic_simulate on the
+    residential_units table (tbl) which predicts one price per block and gives it to all the units in
+    the block.  The hedonics only use building and neighborhood columns so
+    the units in a block get the same price either way - if a model uses
+    columns of the units themselves the units are predicted one by one.
+    """
+    cfg_path = misc.config(cfg)
+    model = utils.yaml_to_class(cfg_path).from_yaml(str_or_buffer=cfg_path)
+    unit_cols = set(misc.column_list([tbl], model.columns_used())) - set(BLOCK_KEYS)
+    if unit_cols:
+        logger.info("%s uses unit columns %s, predicting every unit" % (cfg, sorted(unit_cols)))
+        return utils.hedonic_simulate(cfg, tbl, join_tbls, out_fname)
+
+    units = tbl.to_frame(["num_units"] + [k for k in BLOCK_KEYS if k in tbl.columns])
+    blocks, block_id = units_to_blocks(units)
+    orca.add_table("hedonic_unit_blocks", blocks)
+    df = utils.to_frame(orca.get_table("hedonic_unit_blocks"), join_tbls, cfg_path)
+    price, _ = utils.yaml_to_class(cfg_path).predict_from_cfg(df, cfg_path)
+    logger.info("%s: predicted %d blocks for %d units" % (cfg, len(blocks), len(units)))
+
+    # the units in the blocks which pass the predict filters
+    price = misc.reindex(price, block_id)
+    tbl.update_col_from_series(out_fname, price[price.notnull()])
@@ -81,6 +81,19 @@ def add_buildings(buildings, new_buildings,
     orca.add_table("buildings", all_buildings)
 
 
+# the add_more_columns_callback for urbansim_defaults' run_developer, which
+# also adds the building_type_id its form_to_btype_callback would - for all
+# the new buildings at once instead of with a row by row apply, so run_developer
+# is called with form_to_btype_callback=None
+def developer_columns_callback(form_to_btype_func, add_extra_columns_func):
+
+    def add_columns(df):
+        df["building_type_id"] = form_to_btype_func(df)
+        return add_extra_columns_func(df)
+
+    return add_columns
+
+
 # assume df1 and df2 each have 2 float columns specifying x and y
 # in the same order and coordinate system and no nans.  returns the indexes
 # from df1 that are closest to each row in df2
@@ -1,16 +1,192 @@
 import argparse
+import datetime
+import glob
 import os
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import yaml
+
+USAGE = """
+  Runs an ensemble of seeded BAUS simulations in parallel and averages their summaries.
+
+  Each run gets its own copy of the run_setup yaml with the run name suffixed by the
+  seed, so its outputs go to their own directory, and is launched with
+  python baus.py --random-seed SEED.  As runs finish their summaries are folded into a
+  running mean and variance, written to <outputs_dir>/<run_name>_ensemble/, along with
+  ensemble_status.csv which tracks the state of every run.
+
+    python multiple_runs.py --run_counts 20 --run_setup_yaml run_setup.yaml
+
+"""
+
+# summaries folded into the ensemble statistics, relative to each run's
+# outputs directory - {year} is filled in with the summary year
+SUMMARIES = [
+    "travel_model_summaries/taz1_summary_{year}.csv",
+    "geographic_summaries/*_summary_{year}.csv"
+]
+
+
+class RunningStats(object):
+    """
+    Streaming mean and variance of a set of same-shaped DataFrames, using
+    Welford's algorithm so that runs can be added one at a time as they
+    finish without holding them all in memory.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = None
+        self.m2 = None
+
+    def update(self, df):
+        df = df.select_dtypes(include=[np.number]).astype(float)
+        if self.mean is None:
+            self.n = 1
+            self.mean = df
+            self.m2 = df * 0
+            return
+        # zones or columns missing from a run count as zeros
+        self.mean, df = self.mean.align(df, fill_value=0)
+        self.m2 = self.m2.reindex_like(self.mean).fillna(0)
+        self.n += 1
+        delta = df - self.mean
+        self.mean = self.mean + delta / self.n
+        self.m2 = self.m2 + delta * (df - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else self.m2 * np.nan
+
+    @property
+    def std(self):
+        return self.variance ** .5
+
+
+def available_memory_gb():
+    try:
+        import psutil
+        return psutil.virtual_memory().available / 1024.0 ** 3
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024.0 ** 3
+    except (ValueError, AttributeError, OSError):
+        return None
+
+
+def default_workers(mem_per_run_gb):
+    # one run per core, unless memory runs out first
+    workers = os.cpu_count() or 1
+    mem = available_memory_gb()
+    if mem is not None:
+        workers = min(workers, int(mem // mem_per_run_gb))
+    return max(workers, 1)
+
+
+class Ensemble(object):
+
+    def __init__(self, run_setup_yaml, seeds, summary_year, summaries=SUMMARIES):
+        with open(run_setup_yaml) as f:
+            self.run_setup = yaml.safe_load(f)
+        self.seeds = seeds
+        self.summary_year = summary_year
+        self.summaries = summaries
+
+        self.run_name = self.run_setup["run_name"]
+        self.ensemble_dir = pathlib.Path(self.run_setup["outputs_dir"]) / "{}_ensemble".format(self.run_name)
+        self.ensemble_dir.mkdir(parents=True, exist_ok=True)
+
+        self.stats = {}
+        self.status = pd.DataFrame({"seed": seeds, "status": "queued", "returncode": np.nan,
+                                    "started": None, "finished": None, "elapsed": np.nan}).set_index("seed")
+        self.lock = threading.Lock()
+
+    def run_outputs_dir(self, seed):
+        return pathlib.Path(self.run_setup["outputs_dir"]) / "{}_seed{}".format(self.run_name, seed)
+
+    def write_run_setup(self, seed):
+        # each run's outputs directory is named after its run name
+        run_setup = dict(self.run_setup, run_name="{}_seed{}".format(self.run_name, seed))
+        path = self.ensemble_dir / "run_setup_seed{}.yaml".format(seed)
+        with open(path, "w") as f:
+            yaml.safe_dump(run_setup, f, default_flow_style=False)
+        return path
+
+    def set_status(self, seed, **kwargs):
+        with self.lock:
+            for k, v in kwargs.items():
+                self.status.loc[seed, k] = v
+            self.status.to_csv(self.ensemble_dir / "ensemble_status.csv")
+
+    def run(self, seed):
+        yaml_path = self.write_run_setup(seed)
+        log_path = self.ensemble_dir / "baus_seed{}.log".format(seed)
+        cmd = [sys.executable, "baus.py", "--run_setup_yaml", str(yaml_path),
+               "--random-seed", str(seed), "--disable-slack"]
+
+        start = time.time()
+        self.set_status(seed, status="running", started=datetime.datetime.now().isoformat(timespec="seconds"))
+        with open(log_path, "w") as log:
+            returncode = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT)
+        # baus.py exits with 0 on a handled model error, so check that the
+        # summaries were actually written too
+        failed = returncode != 0 or not self.summary_files(seed)
+        self.set_status(seed, status="failed" if failed else "done", returncode=returncode,
+                        finished=datetime.datetime.now().isoformat(timespec="seconds"),
+                        elapsed=round(time.time() - start))
+        return seed, not failed
+
+    def summary_files(self, seed):
+        files = []
+        for pattern in self.summaries:
+            files.extend(glob.glob(str(self.run_outputs_dir(seed) / pattern.format(year=self.summary_year))))
+        return sorted(files)
+
+    def aggregate(self, seed):
+        for path in self.summary_files(seed):
+            name = pathlib.Path(path).stem
+            df = pd.read_csv(path, index_col=0)
+            self.stats.setdefault(name, RunningStats()).update(df)
+
+        for name, stats in self.stats.items():
+            stats.mean.to_csv(self.ensemble_dir / "{}_mean.csv".format(name))
+            stats.std.to_csv(self.ensemble_dir / "{}_std.csv".format(name))
+            pd.Series({"runs": stats.n}).to_csv(self.ensemble_dir / "{}_runs.csv".format(name), header=False)
+
+    def launch(self, workers):
+        print("Running {} seeds with {} workers, writing to {}".format(len(self.seeds), workers, self.ensemble_dir))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.run, seed) for seed in self.seeds]
+            for future in as_completed(futures):
+                seed, ok = future.result()
+                print("seed {} {}".format(seed, "finished" if ok else "FAILED"))
+                # aggregation happens on this thread only, as runs finish
+                if ok:
+                    self.aggregate(seed)
+        return self.status
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--run_counts', type=int, help='How many times to run the model?')
+    parser = argparse.ArgumentParser(description=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--run_counts', type=int, required=True, help='How many times to run the model?')
+    parser.add_argument('--run_setup_yaml', default='run_setup.yaml', help='run_setup.yaml file to base the runs on')
+    parser.add_argument('--first-seed', type=int, default=1, help='seed of the first run, the others follow on')
+    parser.add_argument('--workers', type=int, default=None, help='number of runs at once, defaults to what the cores and memory allow')
+    parser.add_argument('--mem-per-run-gb', type=float, default=24, help='memory one BAUS run needs, used to size the pool')
+    parser.add_argument('--summary-year', type=int, default=None, help='year of the summaries to average, defaults to the final year')
     args = parser.parse_args()
 
-    if args.run_counts is None:
-        print("Please provide the --run_counts argument.")
-    else:
-        run_counts = args.run_counts
-        
-        for i in range(run_counts):
-            os.system("python baus.py")
\ No newline at end of file
+    seeds = list(range(args.first_seed, args.first_seed + args.run_counts))
+    ensemble = Ensemble(args.run_setup_yaml, seeds, args.summary_year)
+    if ensemble.summary_year is None:
+        ensemble.summary_year = ensemble.run_setup.get("stop_year", ensemble.run_setup.get("final_year"))
+
+    status = ensemble.launch(args.workers or default_workers(args.mem_per_run_gb))
+    print(status.status.value_counts().to_string())
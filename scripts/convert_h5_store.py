@@ -0,0 +1,39 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+from baus.columnar_store import convert_h5_store  # noqa: E402
+
+USAGE = """
+  Converts the base year HDF5 store to a directory of per-table parquet
+  (or feather) files next to it, e.g.
+  2024_10_29_bayarea_2020start.h5 -> 2024_10_29_bayarea_2020start_parquet/
+
+  Set store_format: parquet in run_setup.yaml to have BAUS read the
+  converted store. Optionally list the columns to load for each table
+  under store_columns, e.g.
+
+  store_columns:
+    parcels: [x, y, zone_id, ...]
+
+"""
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description=USAGE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,)
+    parser.add_argument("h5_path", metavar="store.h5",
+                        help="HDF5 store to convert")
+    parser.add_argument("--out", help="Output directory, defaults to a "
+                        "directory next to the h5")
+    parser.add_argument("--format", choices=["parquet", "feather"],
+                        default="parquet")
+
+    args = parser.parse_args()
+
+    out = convert_h5_store(args.h5_path, args.out, args.format)
+    for key in out.keys():
+        print("wrote {}".format(key))
@@ -69,6 +69,43 @@ if USERNAME.lower() in ['lzorn']:
 else:
     BOX_DIR = HOME_DIR / 'Box'
 
+def read_run_table(file_pattern: str, run_directory_path: pathlib.Path, usecols: list = None,
+                   parquet_pattern: str = None):
+    """
+    Reads a BAUS output table matching the given .csv glob pattern. If the run wrote its
+    disaggregate tables as Parquet (disaggregate_output_format: parquet in run_setup),
+    the .parquet file is read instead, loading only the requested columns. The Parquet
+    tables keep the name BAUS writes them under (e.g. core_summaries/parcel_table_2050.parquet),
+    so pass that as parquet_pattern when the .csv has been renamed after the run. Compressed
+    CSVs (output_compression in run_setup, e.g. .csv.gz) are matched too.
+
+    Parameters:
+    - file_pattern (str): glob pattern for the CSV, relative to run_directory_path
+    - run_directory_path (pathlib.Path): path for model run output files
+    - usecols (list): columns to read; all columns if None
+    - parquet_pattern (str): glob pattern for the Parquet file; file_pattern with .parquet if None
+
+    Returns:
+    - tuple of (the file read, DataFrame)
+    """
+    if parquet_pattern is None:
+        parquet_pattern = file_pattern.replace(".csv", ".parquet")
+    parquet_files = sorted(run_directory_path.glob(parquet_pattern))
+    if len(parquet_files) > 0:
+        file = parquet_files[0]
+        df = pd.read_parquet(file, columns=usecols)
+        # string columns are stored as categoricals, read_csv gives objects
+        for col in df.columns[df.dtypes == "category"]:
+            df[col] = df[col].astype(object)
+        return file, df
+
+    csv_files = sorted(run_directory_path.glob(file_pattern + "*"))
+    if len(csv_files) == 0:
+        raise FileNotFoundError("No file matching {} or {} in {}".format(
+            file_pattern, parquet_pattern, run_directory_path))
+    file = csv_files[0]
+    return file, pd.read_csv(file, usecols=usecols)
+
 # --------------------------------------
 # Data Loading Based on Model Run Plan
 # --------------------------------------
@@ -565,14 +602,16 @@ def load_data_for_runs(
             modified_parcel_pattern = parcel_pattern
 
         logging.debug("Looking for parcel data matching {}".format(modified_parcel_pattern.format(year)))
-        file = next(run_directory_path.glob(modified_parcel_pattern.format(year)))
-        logging.debug(f"Found {file}")
         # non_residential_sqft is not available in the RTP2021 parcel table
         usecols = ['parcel_id','deed_restricted_units','preserved_units','subsidized_units','residential_units','inclusionary_units',
                     'hhq1','hhq2','hhq3','hhq4','tothh','totemp', "RETEMPN", "MWTEMPN", "OTHEMPN","HEREMPN","FPSEMPN"]
         if rtp == "RTP2025":
             usecols.append('non_residential_sqft')
-        parcel_df = pd.read_csv(file, usecols=usecols)
+        # the parcel summaries are parcel_table_{year} as BAUS writes them, and are renamed
+        # after the run - only the CSV is renamed, so the Parquet keeps the BAUS name
+        file, parcel_df = read_run_table(modified_parcel_pattern.format(year), run_directory_path, usecols=usecols,
+                                         parquet_pattern="core_summaries/*parcel_table_{}.parquet".format(year))
+        logging.debug(f"Found {file}")
         logging.info("  Read {:,} rows from parcel file {}".format(len(parcel_df), file))
         logging.debug("Head:\n{}".format(parcel_df.head()))
         logging.debug("preserved_units.value_counts():\n{}".format(parcel_df['preserved_units'].value_counts(dropna=False)))